@@ -18,4 +18,11 @@ STANDING_WORKER_MAX_IDLE_TIME_MSECS = int(os.environ['STANDING_WORKER_MAX_IDLE_T
 WORKER_MAX_IDLE_TIME_MSECS = 30 * 1000
 HAIL_SHOULD_CHECK_INVARIANTS = os.environ.get('HAIL_SHOULD_CHECK_INVARIANTS') is not None
 
+# a running job of a batch with speculative execution is a straggler once it
+# has run longer than SPECULATION_MIN_RUNTIME_SECS, and longer than is usual
+# for the at least SPECULATION_MIN_COMPLETED_JOBS completed jobs like it
+SPECULATION_INTERVAL_SECS = int(os.environ.get('SPECULATION_INTERVAL_SECS', 60))
+SPECULATION_MIN_RUNTIME_MSECS = int(os.environ.get('SPECULATION_MIN_RUNTIME_SECS', 5 * 60)) * 1000
+SPECULATION_MIN_COMPLETED_JOBS = int(os.environ.get('SPECULATION_MIN_COMPLETED_JOBS', 10))
+
 MACHINE_NAME_PREFIX = f'batch-worker-{DEFAULT_NAMESPACE}-'
@@ -1,3 +1,5 @@
+from typing import Dict, List
+import collections
 import logging
 import asyncio
 
@@ -12,7 +14,7 @@ from hailtop.utils import (
 from hailtop import aiotools
 from gear import Database
 
-from .job import unschedule_job, mark_job_complete
+from .job import unschedule_job, unschedule_jobs, mark_job_complete, cancel_ready_jobs
 from .instance_collection import InstanceCollectionManager
 from ..utils import Box
 
@@ -92,71 +94,29 @@ HAVING n_cancelled_ready_jobs > 0;
             for user, user_n_jobs in user_n_cancelled_ready_jobs.items()
         }
 
-        async def user_cancelled_ready_jobs(user, remaining):
+        async def cancel_with_error_handling(app, batch_id, limit):
+            try:
+                return await cancel_ready_jobs(app, batch_id, limit)
+            except Exception:
+                log.info(f'error while cancelling ready jobs in batch {batch_id}', exc_info=True)
+                return 0
+
+        should_wait = True
+        for user, share in user_share.items():
+            remaining = share
             async for batch in self.db.select_and_fetchall(
                 '''
-SELECT batches.id, batches_cancelled.id IS NOT NULL AS cancelled
+SELECT batches.id
 FROM batches
-LEFT JOIN batches_cancelled
-       ON batches.id = batches_cancelled.id
 WHERE user = %s AND `state` = 'running';
 ''',
                 (user,),
             ):
-                if batch['cancelled']:
-                    async for record in self.db.select_and_fetchall(
-                        '''
-SELECT jobs.job_id
-FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
-WHERE batch_id = %s AND state = 'Ready' AND always_run = 0
-LIMIT %s;
-''',
-                        (batch['id'], remaining.value),
-                    ):
-                        record['batch_id'] = batch['id']
-                        yield record
-                else:
-                    async for record in self.db.select_and_fetchall(
-                        '''
-SELECT jobs.job_id
-FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
-WHERE batch_id = %s AND state = 'Ready' AND always_run = 0 AND cancelled = 1
-LIMIT %s;
-''',
-                        (batch['id'], remaining.value),
-                    ):
-                        record['batch_id'] = batch['id']
-                        yield record
-
-        waitable_pool = WaitableSharedPool(self.async_worker_pool)
-
-        should_wait = True
-        for user, share in user_share.items():
-            remaining = Box(share)
-            async for record in user_cancelled_ready_jobs(user, remaining):
-                batch_id = record['batch_id']
-                job_id = record['job_id']
-                id = (batch_id, job_id)
-                log.info(f'cancelling job {id}')
-
-                async def cancel_with_error_handling(app, batch_id, job_id, id):
-                    try:
-                        resources = []
-                        await mark_job_complete(
-                            app, batch_id, job_id, None, None, 'Cancelled', None, None, None, 'cancelled', resources
-                        )
-                    except Exception:
-                        log.info(f'error while cancelling job {id}', exc_info=True)
-
-                await waitable_pool.call(cancel_with_error_handling, self.app, batch_id, job_id, id)
-
-                remaining.value -= 1
-                if remaining.value <= 0:
+                remaining -= await cancel_with_error_handling(self.app, batch['id'], remaining)
+                if remaining <= 0:
                     should_wait = False
                     break
 
-        await waitable_pool.wait()
-
         return should_wait
 
     async def cancel_cancelled_creating_jobs_loop_body(self):
@@ -304,29 +264,30 @@ LIMIT %s;
                     record['batch_id'] = batch['id']
                     yield record
 
-        waitable_pool = WaitableSharedPool(self.async_worker_pool)
-
         should_wait = True
+        instance_records: Dict[str, List[dict]] = collections.defaultdict(list)
         for user, share in user_share.items():
             remaining = Box(share)
             async for record in user_cancelled_running_jobs(user, remaining):
-                batch_id = record['batch_id']
-                job_id = record['job_id']
-                id = (batch_id, job_id)
-
-                async def unschedule_with_error_handling(app, record, instance_name, id):
-                    try:
-                        await unschedule_job(app, record)
-                    except Exception:
-                        log.info(f'unscheduling job {id} on instance {instance_name}', exc_info=True)
-
-                await waitable_pool.call(unschedule_with_error_handling, self.app, record, record['instance_name'], id)
+                instance_records[record['instance_name']].append(record)
 
                 remaining.value -= 1
                 if remaining.value <= 0:
                     should_wait = False
                     break
 
+        waitable_pool = WaitableSharedPool(self.async_worker_pool)
+
+        for instance_name, records in instance_records.items():
+
+            async def unschedule_with_error_handling(app, instance_name, records):
+                try:
+                    await unschedule_jobs(app, instance_name, records)
+                except Exception:
+                    log.info(f'unscheduling {len(records)} jobs on instance {instance_name}', exc_info=True)
+
+            await waitable_pool.call(unschedule_with_error_handling, self.app, instance_name, records)
+
         await waitable_pool.wait()
 
         return should_wait
@@ -343,9 +304,13 @@ SELECT attempts.*
 FROM attempts
 INNER JOIN jobs ON attempts.batch_id = jobs.batch_id AND attempts.job_id = jobs.job_id
 LEFT JOIN instances ON attempts.instance_name = instances.name
+LEFT JOIN speculative_attempts
+  ON attempts.batch_id = speculative_attempts.batch_id AND attempts.job_id = speculative_attempts.job_id AND
+     attempts.attempt_id = speculative_attempts.attempt_id
 WHERE attempts.start_time IS NOT NULL
   AND attempts.end_time IS NULL
-  AND ((jobs.state != 'Running' AND jobs.state != 'Creating') OR jobs.attempt_id != attempts.attempt_id)
+  AND ((jobs.state != 'Running' AND jobs.state != 'Creating')
+       OR (jobs.attempt_id != attempts.attempt_id AND speculative_attempts.attempt_id IS NULL))
   AND instances.`state` = 'active'
 ORDER BY attempts.start_time ASC
 LIMIT 300;
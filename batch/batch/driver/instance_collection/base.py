@@ -19,6 +19,10 @@ from ..resource_manager import CloudResourceManager, VMStateCreating, VMStateRun
 
 log = logging.getLogger('inst_coll_manager')
 
+# how long schedulers allocate from the user resources they keep in memory
+# before reading them from the database again
+USER_RESOURCES_RECONCILIATION_INTERVAL_MSECS = 2 * 1000
+
 
 class InstanceCollectionManager:
     def __init__(
@@ -123,6 +127,10 @@ class InstanceCollection:
         self.live_free_cores_mcpu = 0
         self.live_total_cores_mcpu = 0
 
+        # images recently run on this collection that any worker may pull,
+        # least recently used first
+        self.recent_images: 'collections.OrderedDict[str, int]' = collections.OrderedDict()
+
         task_manager.ensure_future(self.monitor_instances_loop())
         self.inst_coll_manager.register_instance_collection(self)
 
@@ -133,6 +141,23 @@ class InstanceCollection:
     def choose_location(self, cores: int, local_ssd_data_disk: bool, data_disk_size_gb: int) -> str:
         return self.inst_coll_manager.choose_location(cores, local_ssd_data_disk, data_disk_size_gb)
 
+    MAX_RECENT_IMAGES = 32
+
+    def image_used(self, image: str):
+        self.recent_images.pop(image, None)
+        self.recent_images[image] = time_msecs()
+        if len(self.recent_images) > InstanceCollection.MAX_RECENT_IMAGES:
+            self.recent_images.popitem(last=False)
+
+    def prewarm_images(self, n: int) -> List[str]:
+        return list(reversed(self.recent_images))[:n]
+
+    def record_job_locality(self, instance: Instance, batch_id: int, images: List[str]):
+        """Record that `instance` ran a job of batch `batch_id` using `images`."""
+
+    def record_cached_images(self, instance: Instance, images: List[str]):
+        """Record the images `instance` has cached."""
+
     def generate_machine_name(self) -> str:
         while True:
             # 36 ** 5 = ~60M
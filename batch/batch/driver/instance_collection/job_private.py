@@ -1,9 +1,8 @@
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import random
 import json
 import logging
 import asyncio
-import sortedcontainers
 
 from gear import Database
 from hailtop import aiotools
@@ -20,14 +19,14 @@ from hailtop.utils import (
 
 from ...batch_format_version import BatchFormatVersion
 from ...inst_coll_config import JobPrivateInstanceManagerConfig
-from ...utils import Box, ExceededSharesCounter
+from ...utils import Box, ExceededSharesCounter, FairShare
 from ...instance_config import QuantifiedResource
 
 from ..instance import Instance
 from ..job import mark_job_creating, schedule_job
 from ..resource_manager import CloudResourceManager
 
-from .base import InstanceCollectionManager, InstanceCollection
+from .base import InstanceCollectionManager, InstanceCollection, USER_RESOURCES_RECONCILIATION_INTERVAL_MSECS
 
 log = logging.getLogger('job_private_inst_coll')
 
@@ -93,6 +92,13 @@ WHERE removed = 0 AND inst_coll = %s;
         self.async_worker_pool: AsyncWorkerPool = app['async_worker_pool']
         self.exceeded_shares_counter = ExceededSharesCounter()
 
+        # the ready, creating and running jobs of each user with any, as of
+        # the last reconciliation with the database plus the jobs whose
+        # instances were created since
+        self.user_resources: Dict[str, dict] = {}
+        self.user_resources_reconciled_at: Optional[int] = None
+        self.fair_share = FairShare()
+
         self.boot_disk_size_gb = config.boot_disk_size_gb
 
         task_manager.ensure_future(
@@ -198,16 +204,7 @@ LIMIT 300;
             300,
         )
 
-    async def compute_fair_share(self):
-        n_jobs_to_allocate = self.max_instances_to_create()
-
-        user_live_jobs = {}
-        user_total_jobs = {}
-        result = {}
-
-        pending_users_by_live_jobs = sortedcontainers.SortedSet(key=lambda user: user_live_jobs[user])
-        allocating_users_by_total_jobs = sortedcontainers.SortedSet(key=lambda user: user_total_jobs[user])
-
+    async def reconcile_user_resources(self):
         records = self.db.execute_and_fetchall(
             '''
 SELECT user,
@@ -221,56 +218,51 @@ HAVING n_ready_jobs + n_creating_jobs + n_running_jobs > 0;
 ''',
             (self.name,),
         )
+        user_resources = {record['user']: record async for record in records}
+
+        n_drifted = 0
+        for user in self.user_resources.keys() - user_resources.keys():
+            self.fair_share.remove(user)
+        for user, record in user_resources.items():
+            old_record = self.user_resources.get(user)
+            if old_record is not None and any(
+                old_record[field] != record[field] for field in ('n_ready_jobs', 'n_creating_jobs', 'n_running_jobs')
+            ):
+                n_drifted += 1
+            self._set_fair_share(user, record)
+        if n_drifted > 0:
+            log.info(f'reconciled user resources for {self}: {n_drifted} users changed since last reconciled')
+
+        self.user_resources = user_resources
+        self.user_resources_reconciled_at = time_msecs()
+
+    def _set_fair_share(self, user, record):
+        n_live_jobs = record['n_creating_jobs'] + record['n_running_jobs']
+        self.fair_share.set(user, n_live_jobs, n_live_jobs + record['n_ready_jobs'])
+
+    def job_creating(self, user):
+        record = self.user_resources.get(user)
+        if record is None:
+            return
+        record['n_ready_jobs'] -= 1
+        record['n_creating_jobs'] += 1
+        self._set_fair_share(user, record)
+
+    def user_resources_stale(self) -> bool:
+        return (
+            self.user_resources_reconciled_at is None
+            or time_msecs() - self.user_resources_reconciled_at >= USER_RESOURCES_RECONCILIATION_INTERVAL_MSECS
+        )
 
-        async for record in records:
-            user = record['user']
-            user_live_jobs[user] = record['n_creating_jobs'] + record['n_running_jobs']
-            user_total_jobs[user] = record['n_ready_jobs'] + record['n_creating_jobs'] + record['n_running_jobs']
-            pending_users_by_live_jobs.add(user)
-            record['n_allocated_jobs'] = 0
-            result[user] = record
-
-        def allocate_jobs(user, mark):
-            result[user]['n_allocated_jobs'] = mark - user_live_jobs[user]
-
-        mark = 0
-        while n_jobs_to_allocate > 0 and (pending_users_by_live_jobs or allocating_users_by_total_jobs):
-            lowest_running = None
-            lowest_total = None
-
-            if pending_users_by_live_jobs:
-                lowest_running_user = pending_users_by_live_jobs[0]
-                lowest_running = user_live_jobs[lowest_running_user]
-                if lowest_running == mark:
-                    pending_users_by_live_jobs.remove(lowest_running_user)
-                    allocating_users_by_total_jobs.add(lowest_running_user)
-                    continue
-
-            if allocating_users_by_total_jobs:
-                lowest_total_user = allocating_users_by_total_jobs[0]
-                lowest_total = user_total_jobs[lowest_total_user]
-                if lowest_total == mark:
-                    allocating_users_by_total_jobs.remove(lowest_total_user)
-                    allocate_jobs(lowest_total_user, mark)
-                    continue
-
-            allocation = min([c for c in [lowest_running, lowest_total] if c is not None])
-
-            n_allocating_users = len(allocating_users_by_total_jobs)
-            jobs_to_allocate = n_allocating_users * (allocation - mark)
-
-            if jobs_to_allocate > n_jobs_to_allocate:
-                mark += int(n_jobs_to_allocate / n_allocating_users + 0.5)
-                n_jobs_to_allocate = 0
-                break
-
-            mark = allocation
-            n_jobs_to_allocate -= jobs_to_allocate
+    async def compute_fair_share(self):
+        if self.user_resources_stale():
+            await self.reconcile_user_resources()
 
-        for user in allocating_users_by_total_jobs:
-            allocate_jobs(user, mark)
+        allocation = self.fair_share.allocate(self.max_instances_to_create())
+        for user, record in self.user_resources.items():
+            record['n_allocated_jobs'] = allocation.get(user, 0)
 
-        return result
+        return self.user_resources
 
     async def create_instance(self, machine_spec: dict) -> Tuple[Instance, List[QuantifiedResource]]:
         machine_type = machine_spec['machine_type']
@@ -301,11 +293,18 @@ HAVING n_ready_jobs + n_creating_jobs + n_running_jobs > 0;
         start = time_msecs()
         n_instances_created = 0
 
+        reconciled = self.user_resources_stale()
         user_resources = await self.compute_fair_share()
 
         total = sum(resources['n_allocated_jobs'] for resources in user_resources.values())
         if not total:
             log.info(f'create_instances {self}: no allocated jobs')
+            if not reconciled:
+                # the user resources in memory may be missing jobs that
+                # became ready since they were reconciled
+                asyncio.get_event_loop().call_later(
+                    USER_RESOURCES_RECONCILIATION_INTERVAL_MSECS / 1000, self.create_instances_state_changed.set
+                )
             should_wait = True
             return should_wait
         user_share = {
@@ -396,6 +395,7 @@ LIMIT %s;
                 n_instances_created += 1
                 n_user_instances_created += 1
                 should_wait = False
+                self.job_creating(user)
 
                 log.info(f'creating job private instance for job {id}')
 
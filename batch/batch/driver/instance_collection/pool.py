@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional, Set, Tuple
 import sortedcontainers
 import logging
 import asyncio
@@ -18,17 +18,35 @@ from hailtop.utils import (
     periodically_call,
 )
 
-from ...batch_configuration import STANDING_WORKER_MAX_IDLE_TIME_MSECS
+from ...batch_configuration import (
+    STANDING_WORKER_MAX_IDLE_TIME_MSECS,
+    SPECULATION_INTERVAL_SECS,
+    SPECULATION_MIN_RUNTIME_MSECS,
+    SPECULATION_MIN_COMPLETED_JOBS,
+)
 from ...inst_coll_config import PoolConfig
-from ...utils import Box, ExceededSharesCounter
+from ...utils import Box, ExceededSharesCounter, FairShare
 from ..instance import Instance
 from ..resource_manager import CloudResourceManager
 from ..job import schedule_job
 
-from .base import InstanceCollectionManager, InstanceCollection
+from .base import InstanceCollectionManager, InstanceCollection, USER_RESOURCES_RECONCILIATION_INTERVAL_MSECS
 
 log = logging.getLogger('pool')
 
+# a running job is a straggler once it has run longer than both of these
+# multiples of the mean and the standard deviation of the runtimes of
+# completed jobs of the same batch and shape, and at least the minimum
+SPECULATION_MEAN_RUNTIME_MULTIPLIER = 2
+SPECULATION_STDDEV_RUNTIME_MULTIPLIER = 3
+MAX_SPECULATIVE_ATTEMPTS_PER_LOOP = 50
+
+# how long a job waits for a free instance that ran jobs of its batch or has
+# its batch's images cached before it is scheduled on any instance
+LOCALITY_DELAY_MSECS = 5 * 1000
+MAX_RECENT_BATCHES_PER_INSTANCE = 20
+MAX_RECENT_BATCH_IMAGES = 1000
+
 
 class Pool(InstanceCollection):
     @staticmethod
@@ -92,6 +110,14 @@ WHERE removed = 0 AND inst_coll = %s;
 
         self.healthy_instances_by_free_cores = sortedcontainers.SortedSet(key=lambda instance: instance.free_cores_mcpu)
 
+        # locality hints: the batches each instance recently ran jobs of, the
+        # images each instance has cached, and the images of recent batches
+        self.instance_recent_batches: Dict[Instance, 'collections.OrderedDict[int, None]'] = {}
+        self.instances_by_batch: Dict[int, Set[Instance]] = collections.defaultdict(set)
+        self.instance_cached_images: Dict[Instance, Set[str]] = {}
+        self.instances_by_image: Dict[str, Set[Instance]] = collections.defaultdict(set)
+        self.batch_images: 'collections.OrderedDict[int, Set[str]]' = collections.OrderedDict()
+
         self.worker_type = config.worker_type
         self.worker_cores = config.worker_cores
         self.worker_local_ssd_data_disk = config.worker_local_ssd_data_disk
@@ -151,12 +177,66 @@ WHERE removed = 0 AND inst_coll = %s;
         if instance.state == 'active' and instance.failed_request_count <= 1:
             self.healthy_instances_by_free_cores.add(instance)
 
-    def get_instance(self, user, cores_mcpu):
+    async def remove_instance(self, instance: Instance, reason: str, timestamp: Optional[int] = None):
+        await super().remove_instance(instance, reason, timestamp)
+        for batch_id in self.instance_recent_batches.pop(instance, {}):
+            _discard(self.instances_by_batch, batch_id, instance)
+        for image in self.instance_cached_images.pop(instance, set()):
+            _discard(self.instances_by_image, image, instance)
+
+    def record_job_locality(self, instance: Instance, batch_id: int, images: List[str]):
+        recent_batches = self.instance_recent_batches.setdefault(instance, collections.OrderedDict())
+        recent_batches.pop(batch_id, None)
+        recent_batches[batch_id] = None
+        self.instances_by_batch[batch_id].add(instance)
+        if len(recent_batches) > MAX_RECENT_BATCHES_PER_INSTANCE:
+            old_batch_id, _ = recent_batches.popitem(last=False)
+            _discard(self.instances_by_batch, old_batch_id, instance)
+
+        if images:
+            batch_images = self.batch_images.pop(batch_id, set())
+            batch_images.update(images)
+            self.batch_images[batch_id] = batch_images
+            if len(self.batch_images) > MAX_RECENT_BATCH_IMAGES:
+                self.batch_images.popitem(last=False)
+
+    def record_cached_images(self, instance: Instance, images: List[str]):
+        old_images = self.instance_cached_images.get(instance, set())
+        new_images = set(images)
+        for image in old_images - new_images:
+            _discard(self.instances_by_image, image, instance)
+        for image in new_images - old_images:
+            self.instances_by_image[image].add(instance)
+        self.instance_cached_images[instance] = new_images
+
+    def local_instances(self, batch_id: int) -> Set[Instance]:
+        """Instances that recently ran jobs of the batch or have cached an
+        image its jobs use."""
+        instances = set(self.instances_by_batch.get(batch_id, ()))
+        for image in self.batch_images.get(batch_id, ()):
+            instances.update(self.instances_by_image.get(image, ()))
+        return instances
+
+    def get_instance(self, user, cores_mcpu, excluded_instance_name=None, local_instances=None):
+        if local_instances:
+            viable_local_instances = [
+                instance
+                for instance in local_instances
+                if instance in self.healthy_instances_by_free_cores
+                and instance.free_cores_mcpu >= cores_mcpu
+                and instance.name != excluded_instance_name
+                and (user != 'ci' or instance.location == self._default_location())
+            ]
+            if viable_local_instances:
+                return min(viable_local_instances, key=lambda instance: instance.free_cores_mcpu)
+
         i = self.healthy_instances_by_free_cores.bisect_key_left(cores_mcpu)
         while i < len(self.healthy_instances_by_free_cores):
             instance = self.healthy_instances_by_free_cores[i]
             assert cores_mcpu <= instance.free_cores_mcpu
-            if user != 'ci' or (user == 'ci' and instance.location == self._default_location()):
+            if instance.name != excluded_instance_name and (
+                user != 'ci' or (user == 'ci' and instance.location == self._default_location())
+            ):
                 return instance
             i += 1
         histogram = collections.defaultdict(int)
@@ -275,6 +355,14 @@ GROUP BY user;
         return f'pool {self.name}'
 
 
+def _discard(index: Dict, key, instance: Instance):
+    instances = index.get(key)
+    if instances is not None:
+        instances.discard(instance)
+        if not instances:
+            del index[key]
+
+
 class PoolScheduler:
     def __init__(
         self,
@@ -289,20 +377,20 @@ class PoolScheduler:
         self.pool = pool
         self.async_worker_pool = async_worker_pool
         self.exceeded_shares_counter = ExceededSharesCounter()
+        # when each job deferred to wait for a local instance was first deferred
+        self.locality_wait_start: Dict[Tuple[int, int], int] = {}
+        # the ready and running jobs and cores of each user with any, as of
+        # the last reconciliation with the database plus the jobs scheduled
+        # since
+        self.user_resources: Dict[str, dict] = {}
+        self.user_resources_reconciled_at: Optional[int] = None
+        self.fair_share = FairShare()
         task_manager.ensure_future(
             retry_long_running('schedule_loop', run_if_changed, self.scheduler_state_changed, self.schedule_loop_body)
         )
+        task_manager.ensure_future(periodically_call(SPECULATION_INTERVAL_SECS, self.speculate_stragglers))
 
-    async def compute_fair_share(self):
-        free_cores_mcpu = sum([worker.free_cores_mcpu for worker in self.pool.healthy_instances_by_free_cores])
-
-        user_running_cores_mcpu = {}
-        user_total_cores_mcpu = {}
-        result = {}
-
-        pending_users_by_running_cores = sortedcontainers.SortedSet(key=lambda user: user_running_cores_mcpu[user])
-        allocating_users_by_total_cores = sortedcontainers.SortedSet(key=lambda user: user_total_cores_mcpu[user])
-
+    async def reconcile_user_resources(self):
         records = self.db.execute_and_fetchall(
             '''
 SELECT user,
@@ -317,56 +405,62 @@ HAVING n_ready_jobs + n_running_jobs > 0;
 ''',
             (self.pool.name,),
         )
+        user_resources = {record['user']: record async for record in records}
+
+        n_drifted = 0
+        for user in self.user_resources.keys() - user_resources.keys():
+            self.fair_share.remove(user)
+        for user, record in user_resources.items():
+            old_record = self.user_resources.get(user)
+            if old_record is not None and (
+                old_record['ready_cores_mcpu'] != record['ready_cores_mcpu']
+                or old_record['running_cores_mcpu'] != record['running_cores_mcpu']
+            ):
+                n_drifted += 1
+            self.fair_share.set(
+                user, record['running_cores_mcpu'], record['running_cores_mcpu'] + record['ready_cores_mcpu']
+            )
+        if n_drifted > 0:
+            log.info(f'reconciled user resources for {self.pool}: {n_drifted} users changed since last reconciled')
 
-        async for record in records:
-            user = record['user']
-            user_running_cores_mcpu[user] = record['running_cores_mcpu']
-            user_total_cores_mcpu[user] = record['running_cores_mcpu'] + record['ready_cores_mcpu']
-            pending_users_by_running_cores.add(user)
-            record['allocated_cores_mcpu'] = 0
-            result[user] = record
-
-        def allocate_cores(user, mark):
-            result[user]['allocated_cores_mcpu'] = int(mark - user_running_cores_mcpu[user] + 0.5)
-
-        mark = 0
-        while free_cores_mcpu > 0 and (pending_users_by_running_cores or allocating_users_by_total_cores):
-            lowest_running = None
-            lowest_total = None
-
-            if pending_users_by_running_cores:
-                lowest_running_user = pending_users_by_running_cores[0]
-                lowest_running = user_running_cores_mcpu[lowest_running_user]
-                if lowest_running == mark:
-                    pending_users_by_running_cores.remove(lowest_running_user)
-                    allocating_users_by_total_cores.add(lowest_running_user)
-                    continue
-
-            if allocating_users_by_total_cores:
-                lowest_total_user = allocating_users_by_total_cores[0]
-                lowest_total = user_total_cores_mcpu[lowest_total_user]
-                if lowest_total == mark:
-                    allocating_users_by_total_cores.remove(lowest_total_user)
-                    allocate_cores(lowest_total_user, mark)
-                    continue
+        self.user_resources = user_resources
+        self.user_resources_reconciled_at = time_msecs()
 
-            allocation = min([c for c in [lowest_running, lowest_total] if c is not None])
+    def job_scheduled(self, user, cores_mcpu):
+        record = self.user_resources.get(user)
+        if record is None:
+            return
+        record['n_ready_jobs'] -= 1
+        record['ready_cores_mcpu'] -= cores_mcpu
+        record['n_running_jobs'] += 1
+        record['running_cores_mcpu'] += cores_mcpu
+        self.fair_share.set(
+            user, record['running_cores_mcpu'], record['running_cores_mcpu'] + record['ready_cores_mcpu']
+        )
 
-            n_allocating_users = len(allocating_users_by_total_cores)
-            cores_to_allocate = n_allocating_users * (allocation - mark)
+    def user_resources_stale(self) -> bool:
+        return (
+            self.user_resources_reconciled_at is None
+            or time_msecs() - self.user_resources_reconciled_at >= USER_RESOURCES_RECONCILIATION_INTERVAL_MSECS
+        )
 
-            if cores_to_allocate > free_cores_mcpu:
-                mark += int(free_cores_mcpu / n_allocating_users + 0.5)
-                free_cores_mcpu = 0
-                break
+    def retry_after_reconciliation_interval(self):
+        # the user resources in memory may be missing jobs that became ready
+        # since they were reconciled
+        asyncio.get_event_loop().call_later(
+            USER_RESOURCES_RECONCILIATION_INTERVAL_MSECS / 1000, self.scheduler_state_changed.set
+        )
 
-            mark = allocation
-            free_cores_mcpu -= cores_to_allocate
+    async def compute_fair_share(self):
+        if self.user_resources_stale():
+            await self.reconcile_user_resources()
 
-        for user in allocating_users_by_total_cores:
-            allocate_cores(user, mark)
+        free_cores_mcpu = sum([worker.free_cores_mcpu for worker in self.pool.healthy_instances_by_free_cores])
+        allocation = self.fair_share.allocate(free_cores_mcpu)
+        for user, record in self.user_resources.items():
+            record['allocated_cores_mcpu'] = allocation.get(user, 0)
 
-        return result
+        return self.user_resources
 
     async def schedule_loop_body(self):
         if self.app['frozen']:
@@ -377,11 +471,14 @@ HAVING n_ready_jobs + n_running_jobs > 0;
         start = time_msecs()
         n_scheduled = 0
 
+        reconciled = self.user_resources_stale()
         user_resources = await self.compute_fair_share()
 
         total = sum(resources['allocated_cores_mcpu'] for resources in user_resources.values())
         if not total:
             log.info(f'schedule {self.pool}: no allocated cores')
+            if not reconciled:
+                self.retry_after_reconciliation_interval()
             should_wait = True
             return should_wait
         user_share = {
@@ -432,6 +529,14 @@ LIMIT %s;
 
         waitable_pool = WaitableSharedPool(self.async_worker_pool)
 
+        self.locality_wait_start = {
+            id: wait_start
+            for id, wait_start in self.locality_wait_start.items()
+            if start - wait_start <= 2 * LOCALITY_DELAY_MSECS
+        }
+        batch_local_instances: Dict[int, Set[Instance]] = {}
+        n_deferred = 0
+
         should_wait = True
         for user, resources in user_resources.items():
             allocated_cores_mcpu = resources['allocated_cores_mcpu']
@@ -458,9 +563,22 @@ LIMIT %s;
                         break
                     self.exceeded_shares_counter.push(False)
 
-                instance = self.pool.get_instance(user, record['cores_mcpu'])
+                if batch_id not in batch_local_instances:
+                    batch_local_instances[batch_id] = self.pool.local_instances(batch_id)
+                local_instances = batch_local_instances[batch_id]
+
+                instance = self.pool.get_instance(user, record['cores_mcpu'], local_instances=local_instances)
+                if instance and local_instances and instance not in local_instances:
+                    # a local instance may free up soon
+                    wait_start = self.locality_wait_start.setdefault(id, start)
+                    if start - wait_start < LOCALITY_DELAY_MSECS:
+                        instance = None
+                        n_deferred += 1
+
                 if instance:
+                    self.locality_wait_start.pop(id, None)
                     instance.adjust_free_cores_in_memory(-record['cores_mcpu'])
+                    self.job_scheduled(user, record['cores_mcpu'])
                     scheduled_cores_mcpu += record['cores_mcpu']
                     n_scheduled += 1
                     should_wait = False
@@ -479,7 +597,120 @@ LIMIT %s;
 
         await waitable_pool.wait()
 
+        if n_deferred > 0:
+            # try the deferred jobs again once their wait is over
+            asyncio.get_event_loop().call_later(LOCALITY_DELAY_MSECS / 1000, self.scheduler_state_changed.set)
+        if should_wait and not reconciled:
+            self.retry_after_reconciliation_interval()
+
         end = time_msecs()
-        log.info(f'schedule: scheduled {n_scheduled} jobs in {end - start}ms for {self.pool}')
+        log.info(
+            f'schedule: scheduled {n_scheduled} jobs in {end - start}ms for {self.pool},'
+            f' deferred {n_deferred} jobs for locality'
+        )
 
         return should_wait
+
+    async def speculate_stragglers(self):
+        """Schedule a second attempt, on another instance, of each running job
+        of a batch with speculative execution that is much slower than the
+        completed jobs of the same batch requesting the same cores. Each job
+        is attempted speculatively at most once."""
+        if self.app['frozen']:
+            log.info(f'not speculating any jobs for {self.pool}; batch is frozen')
+            return
+
+        now = time_msecs()
+        remaining = Box(MAX_SPECULATIVE_ATTEMPTS_PER_LOOP)
+        waitable_pool = WaitableSharedPool(self.async_worker_pool)
+
+        async def schedule_with_error_handling(app, record, id, instance):
+            try:
+                await schedule_job(app, record, instance, speculative=True)
+            except Exception:
+                log.info(f'speculatively scheduling job {id} on {instance} for {self.pool}', exc_info=True)
+
+        async for batch in self.db.select_and_fetchall(
+            '''
+SELECT batches.id, userdata, user, format_version
+FROM batches
+LEFT JOIN batches_cancelled
+       ON batches.id = batches_cancelled.id
+WHERE `state` = 'running' AND speculative_execution = 1 AND batches_cancelled.id IS NULL;
+''',
+        ):
+            thresholds = {}
+            async for record in self.db.select_and_fetchall(
+                '''
+SELECT jobs.cores_mcpu,
+  COUNT(*) AS n_completed,
+  AVG(attempts.end_time - attempts.start_time) AS mean_runtime_msecs,
+  STDDEV_POP(attempts.end_time - attempts.start_time) AS stddev_runtime_msecs
+FROM jobs
+INNER JOIN attempts
+  ON jobs.batch_id = attempts.batch_id AND jobs.job_id = attempts.job_id AND jobs.attempt_id = attempts.attempt_id
+WHERE jobs.batch_id = %s AND jobs.state = 'Success' AND jobs.inst_coll = %s
+  AND attempts.start_time IS NOT NULL AND attempts.end_time IS NOT NULL
+GROUP BY jobs.cores_mcpu;
+''',
+                (batch['id'], self.pool.name),
+            ):
+                if record['n_completed'] < SPECULATION_MIN_COMPLETED_JOBS:
+                    continue
+                mean = float(record['mean_runtime_msecs'])
+                stddev = float(record['stddev_runtime_msecs'])
+                thresholds[record['cores_mcpu']] = max(
+                    SPECULATION_MEAN_RUNTIME_MULTIPLIER * mean,
+                    mean + SPECULATION_STDDEV_RUNTIME_MULTIPLIER * stddev,
+                    SPECULATION_MIN_RUNTIME_MSECS,
+                )
+            if not thresholds:
+                continue
+
+            async for record in self.db.select_and_fetchall(
+                '''
+SELECT jobs.job_id, jobs.spec, jobs.cores_mcpu, attempts.instance_name, attempts.start_time
+FROM jobs
+INNER JOIN attempts
+  ON jobs.batch_id = attempts.batch_id AND jobs.job_id = attempts.job_id AND jobs.attempt_id = attempts.attempt_id
+LEFT JOIN speculative_attempts
+  ON jobs.batch_id = speculative_attempts.batch_id AND jobs.job_id = speculative_attempts.job_id
+WHERE jobs.batch_id = %s AND jobs.state = 'Running' AND jobs.inst_coll = %s AND jobs.cancelled = 0
+  AND attempts.start_time IS NOT NULL AND speculative_attempts.job_id IS NULL
+ORDER BY attempts.start_time ASC
+LIMIT %s;
+''',
+                (batch['id'], self.pool.name, remaining.value),
+            ):
+                threshold = thresholds.get(record['cores_mcpu'])
+                if threshold is None or now - record['start_time'] <= threshold:
+                    continue
+
+                instance = self.pool.get_instance(
+                    batch['user'], record['cores_mcpu'], excluded_instance_name=record['instance_name']
+                )
+                if instance is None:
+                    continue
+
+                record['batch_id'] = batch['id']
+                record['userdata'] = batch['userdata']
+                record['user'] = batch['user']
+                record['format_version'] = batch['format_version']
+                record['attempt_id'] = secret_alnum_string(6)
+                id = (batch['id'], record['job_id'])
+
+                log.info(
+                    f'speculating job {id} on {instance}: running for {now - record["start_time"]}ms'
+                    f' on {record["instance_name"]}, threshold {int(threshold)}ms'
+                )
+                instance.adjust_free_cores_in_memory(-record['cores_mcpu'])
+                await waitable_pool.call(schedule_with_error_handling, self.app, record, id, instance)
+
+                remaining.value -= 1
+                if remaining.value <= 0:
+                    break
+
+            if remaining.value <= 0:
+                break
+
+        await waitable_pool.wait()
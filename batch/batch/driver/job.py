@@ -12,7 +12,7 @@ from hailtop import httpx
 from gear import Database
 
 from ..batch import batch_record_to_dict
-from ..globals import complete_states, tasks, STATUS_FORMAT_VERSION
+from ..globals import complete_states, tasks, STATUS_FORMAT_VERSION, BULK_DELETE_INSTANCE_VERSION
 from ..batch_configuration import KUBERNETES_SERVER_URL
 from ..batch_format_version import BatchFormatVersion
 from ..spec_writer import SpecWriter
@@ -155,6 +155,23 @@ async def mark_job_complete(
 
     log.info(f'job {id} changed state: {rv["old_state"]} => {new_state}')
 
+    if rv['racing_attempt_id'] is not None:
+        # this attempt won the race with another attempt of the job
+        loser = {
+            'batch_id': batch_id,
+            'job_id': job_id,
+            'attempt_id': rv['racing_attempt_id'],
+            'instance_name': rv['racing_instance_name'],
+        }
+
+        async def unschedule_with_error_handling():
+            try:
+                await unschedule_job(app, loser)
+            except Exception:
+                log.info(f'unscheduling losing attempt {loser["attempt_id"]} of job {id}', exc_info=True)
+
+        task_manager.ensure_future(unschedule_with_error_handling())
+
     await notify_batch_job_complete(db, client_session, batch_id)
 
     if instance and not instance.inst_coll.is_pool and instance.state == 'active':
@@ -262,13 +279,20 @@ async def unschedule_job(app, record):
         scheduler_state_changed.notify()
         log.info(f'unschedule job {id}, attempt {attempt_id}: updated {instance} free cores')
 
-    url = f'http://{instance.ip_address}:5000/api/v1alpha/batches/{batch_id}/jobs/{job_id}/delete'
+    await delete_jobs_on_instance(client_session, instance, [(batch_id, job_id)])
 
-    async def make_request():
+    if not instance.inst_coll.is_pool:
+        await instance.kill()
+
+    log.info(f'unschedule job {id}, attempt {attempt_id}: called delete job')
+
+
+async def delete_jobs_on_instance(client_session: httpx.ClientSession, instance: Instance, ids):
+    async def make_request(method, url, **kwargs):
         if instance.state in ('inactive', 'deleted'):
             return
         try:
-            await client_session.delete(url)
+            await client_session.request(method, url, **kwargs)
             await instance.mark_healthy()
         except asyncio.TimeoutError:
             await instance.incr_failed_request_count()
@@ -280,12 +304,99 @@ async def unschedule_job(app, record):
             await instance.incr_failed_request_count()
             raise
 
-    await retry_transient_errors(make_request)
+    if instance.version < BULK_DELETE_INSTANCE_VERSION:
+        for batch_id, job_id in ids:
+            url = f'http://{instance.ip_address}:5000/api/v1alpha/batches/{batch_id}/jobs/{job_id}/delete'
+            await retry_transient_errors(make_request, 'DELETE', url)
+    else:
+        # one request for all jobs on the instance
+        url = f'http://{instance.ip_address}:5000/api/v1alpha/batches/jobs/delete'
+        await retry_transient_errors(make_request, 'POST', url, json={'jobs': [list(id) for id in ids]})
+
+
+async def unschedule_jobs(app, instance_name, records):
+    cancel_ready_state_changed: asyncio.Event = app['cancel_ready_state_changed']
+    scheduler_state_changed: Notice = app['scheduler_state_changed']
+    db: Database = app['db']
+    client_session: httpx.ClientSession = app['client_session']
+    inst_coll_manager = app['driver'].inst_coll_manager
+
+    log.info(f'unscheduling {len(records)} jobs from instance {instance_name}')
+
+    end_time = time_msecs()
+
+    ids = []
+    delta_cores_mcpu = 0
+    for record in records:
+        assert record['instance_name'] == instance_name
+        batch_id = record['batch_id']
+        job_id = record['job_id']
+        attempt_id = record['attempt_id']
+        id = (batch_id, job_id)
+
+        try:
+            rv = await db.execute_and_fetchone(
+                'CALL unschedule_job(%s, %s, %s, %s, %s, %s);',
+                (batch_id, job_id, attempt_id, instance_name, end_time, 'cancelled'),
+            )
+        except Exception:
+            log.exception(f'error while unscheduling job {id} on instance {instance_name}')
+            continue
+
+        ids.append(id)
+        delta_cores_mcpu += rv['delta_cores_mcpu']
+
+    if not ids:
+        return
+
+    # jobs that were running are now ready to be cancelled
+    cancel_ready_state_changed.set()
+
+    instance = inst_coll_manager.get_instance(instance_name)
+    if not instance:
+        log.warning(f'unschedule {len(ids)} jobs: unknown instance {instance_name}')
+        return
+
+    if delta_cores_mcpu and instance.state == 'active':
+        instance.adjust_free_cores_in_memory(delta_cores_mcpu)
+        scheduler_state_changed.notify()
+        log.info(f'unschedule {len(ids)} jobs: updated {instance} free cores')
+
+    await delete_jobs_on_instance(client_session, instance, ids)
 
     if not instance.inst_coll.is_pool:
         await instance.kill()
 
-    log.info(f'unschedule job {id}, attempt {attempt_id}: called delete job')
+    log.info(f'unschedule {len(ids)} jobs from instance {instance_name}: called delete jobs')
+
+
+async def cancel_ready_jobs(app, batch_id, limit):
+    scheduler_state_changed: Notice = app['scheduler_state_changed']
+    cancel_ready_state_changed: asyncio.Event = app['cancel_ready_state_changed']
+    db: Database = app['db']
+    client_session: httpx.ClientSession = app['client_session']
+
+    try:
+        rv = await db.execute_and_fetchone(
+            'CALL cancel_ready_jobs(%s, %s, %s);', (batch_id, limit, time_msecs()), 'cancel_ready_jobs'
+        )
+    except Exception:
+        log.exception(f'error while cancelling ready jobs in batch {batch_id}')
+        raise
+
+    n_cancelled_jobs = rv['n_cancelled_jobs']
+    if n_cancelled_jobs == 0:
+        return 0
+
+    log.info(f'cancelled {n_cancelled_jobs} ready jobs in batch {batch_id}')
+
+    # children of cancelled jobs may now be ready
+    scheduler_state_changed.notify()
+    cancel_ready_state_changed.set()
+
+    await notify_batch_job_complete(db, client_session, batch_id)
+
+    return n_cancelled_jobs
 
 
 async def job_config(app, record, attempt_id):
@@ -396,7 +507,10 @@ users:
     }
 
 
-async def schedule_job(app, record, instance):
+async def schedule_job(app, record, instance, speculative=False):
+    """Schedule an attempt of a job on `instance`. A speculative attempt is
+    scheduled alongside the running attempt of the job; the first of them to
+    succeed completes the job."""
     assert instance.state == 'active'
 
     file_store: FileStore = app['file_store']
@@ -414,6 +528,9 @@ async def schedule_job(app, record, instance):
         try:
             body = await job_config(app, record, attempt_id)
         except Exception:
+            if speculative:
+                # the running attempt is unaffected
+                raise
             log.exception('while making job config')
             status = {
                 'version': STATUS_FORMAT_VERSION,
@@ -460,12 +577,13 @@ async def schedule_job(app, record, instance):
 
         log.info(f'schedule job {id} on {instance}: called create job')
 
+        procedure = 'schedule_speculative_job' if speculative else 'schedule_job'
         rv = await db.execute_and_fetchone(
-            '''
-CALL schedule_job(%s, %s, %s, %s);
+            f'''
+CALL {procedure}(%s, %s, %s, %s);
 ''',
             (batch_id, job_id, attempt_id, instance.name),
-            'schedule_job',
+            procedure,
         )
     except Exception:
         log.exception(f'error while scheduling job {id} on {instance}')
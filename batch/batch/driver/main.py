@@ -74,6 +74,8 @@ routes = web.RouteTableDef()
 
 deploy_config = get_deploy_config()
 
+MAX_PREWARM_IMAGES = 5
+
 
 def ignore_failed_to_collect_and_upload_profile(record):
     if 'Failed to collect and upload profile: [Errno 32] Broken pipe' in record.msg:
@@ -247,7 +249,9 @@ async def activate_instance_1(request, instance):
     token = await instance.activate(ip_address, timestamp)
     await instance.mark_healthy()
 
-    return web.json_response({'token': token})
+    prewarm_images = instance.inst_coll.prewarm_images(MAX_PREWARM_IMAGES)
+
+    return web.json_response({'token': token, 'prewarm_images': prewarm_images})
 
 
 # deprecated
@@ -328,6 +332,13 @@ async def job_complete_1(request, instance):
     status = job_status['status']
     resources = job_status.get('resources')
 
+    for image in body.get('prewarmable_images', []):
+        instance.inst_coll.image_used(image)
+
+    instance.inst_coll.record_job_locality(instance, batch_id, body.get('images', []))
+    if 'cached_images' in body:
+        instance.inst_coll.record_cached_images(instance, body['cached_images'])
+
     await mark_job_complete(
         request.app,
         batch_id,
@@ -363,6 +374,9 @@ async def job_started_1(request, instance):
     start_time = job_status['start_time']
     resources = job_status.get('resources')
 
+    if 'cached_images' in body:
+        instance.inst_coll.record_cached_images(instance, body['cached_images'])
+
     await mark_job_started(request.app, batch_id, job_id, attempt_id, instance, start_time, resources)
 
     await instance.mark_healthy()
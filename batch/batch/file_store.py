@@ -1,5 +1,7 @@
 import logging
 import asyncio
+import collections
+import json
 
 from hailtop.aiotools.fs import AsyncFS
 
@@ -18,6 +20,8 @@ class FileStore:
 
         self.batch_logs_root = f'{batch_logs_storage_uri}/batch/logs/{instance_id}/batch'
 
+        self._array_templates = collections.OrderedDict()
+
         log.info(f'BATCH_LOGS_ROOT {self.batch_logs_root}')
         format_version = BatchFormatVersion(BATCH_FORMAT_VERSION)
         log.info(f'EXAMPLE BATCH_JOB_LOGS_PATH {self.log_path(format_version, 1, 1, "abc123", "main")}')
@@ -68,6 +72,25 @@ class FileStore:
     def specs_index_path(self, batch_id, token):
         return f'{self.specs_dir(batch_id, token)}/specs.idx'
 
+    def specs_templates_path(self, batch_id, token):
+        return f'{self.specs_dir(batch_id, token)}/specs.templates'
+
+    MAX_CACHED_ARRAY_TEMPLATES = 64
+
+    async def _read_array_template(self, batch_id, token, template_start, template_end):
+        key = (batch_id, token, template_start)
+        template = self._array_templates.get(key)
+        if template is not None:
+            self._array_templates.move_to_end(key)
+            return template
+
+        templates_url = self.specs_templates_path(batch_id, token)
+        template = await self.fs.read_range(templates_url, template_start, template_end)
+        self._array_templates[key] = template
+        if len(self._array_templates) > FileStore.MAX_CACHED_ARRAY_TEMPLATES:
+            self._array_templates.popitem(last=False)
+        return template
+
     async def read_spec_file(self, batch_id, token, start_job_id, job_id):
         idx_url = self.specs_index_path(batch_id, token)
         idx_start, idx_end = SpecWriter.get_index_file_offsets(job_id, start_job_id)
@@ -76,16 +99,28 @@ class FileStore:
         spec_url = self.specs_path(batch_id, token)
         spec_start, spec_end = SpecWriter.get_spec_file_offsets(offsets)
         data = await self.fs.read_range(spec_url, spec_start, spec_end)
-        return data.decode('utf-8')
 
-    async def write_spec_file(self, batch_id, token, data_bytes, offsets_bytes):
+        spec = json.loads(data)
+        if not SpecWriter.is_array_element(spec):
+            return data.decode('utf-8')
+
+        template_start, template_end = SpecWriter.get_array_template_offsets(spec)
+        template = await self._read_array_template(batch_id, token, template_start, template_end)
+        return json.dumps(SpecWriter.expand_array_element(template, spec))
+
+    async def write_spec_file(self, batch_id, token, data_bytes, offsets_bytes, templates_bytes=None):
         idx_url = self.specs_index_path(batch_id, token)
         write1 = self.fs.write(idx_url, offsets_bytes)
 
         specs_url = self.specs_path(batch_id, token)
         write2 = self.fs.write(specs_url, data_bytes)
 
-        await asyncio.gather(write1, write2)
+        writes = [write1, write2]
+        if templates_bytes is not None:
+            templates_url = self.specs_templates_path(batch_id, token)
+            writes.append(self.fs.write(templates_url, templates_bytes))
+
+        await asyncio.gather(*writes)
 
     async def delete_spec_file(self, batch_id, token):
         url = self.specs_dir(batch_id, token)
@@ -92,6 +92,8 @@ BATCH_JOB_DEFAULT_MEMORY = os.environ.get('HAIL_BATCH_JOB_DEFAULT_MEMORY', 'stan
 BATCH_JOB_DEFAULT_STORAGE = os.environ.get('HAIL_BATCH_JOB_DEFAULT_STORAGE', '0Gi')
 BATCH_JOB_DEFAULT_PREEMPTIBLE = True
 
+READ_REPLICA_SQL_CONFIG_FILE = os.environ.get('HAIL_DATABASE_READ_REPLICA_CONFIG_FILE')
+
 
 def rest_authenticated_developers_or_auth_only(fun):
     @rest_authenticated_users_only
@@ -696,6 +698,9 @@ WHERE user = %s AND id = %s AND NOT deleted;
                 job_id = spec['job_id']
                 parent_ids = spec.pop('parent_ids', [])
                 always_run = spec.pop('always_run', False)
+                array = spec.pop('array', None)
+                n_array_jobs = array['n_jobs'] if array else 1
+                array_job_ids = range(job_id, job_id + n_array_jobs)
 
                 cloud = spec.get('cloud', CLOUD)
 
@@ -714,7 +719,10 @@ WHERE user = %s AND id = %s AND NOT deleted;
                         raise web.HTTPBadRequest(
                             reason=f'noncontiguous job ids found in the spec: {prev_job_idx} -> {job_id}'
                         )
-                prev_job_idx = job_id
+                prev_job_idx = array_job_ids[-1]
+
+                if array and not batch_format_version.has_full_spec_in_cloud():
+                    raise web.HTTPBadRequest(reason=f'job arrays are not supported by batch {batch_id}')
 
                 resources = spec.get('resources')
                 if not resources:
@@ -867,14 +875,14 @@ WHERE user = %s AND id = %s AND NOT deleted;
                 check_service_account_permissions(user, sa)
 
                 icr = inst_coll_resources[inst_coll_name]
-                icr['n_jobs'] += 1
+                icr['n_jobs'] += n_array_jobs
                 if len(parent_ids) == 0:
                     state = 'Ready'
-                    icr['n_ready_jobs'] += 1
-                    icr['ready_cores_mcpu'] += cores_mcpu
+                    icr['n_ready_jobs'] += n_array_jobs
+                    icr['ready_cores_mcpu'] += n_array_jobs * cores_mcpu
                     if not always_run:
-                        icr['n_ready_cancellable_jobs'] += 1
-                        icr['ready_cancellable_cores_mcpu'] += cores_mcpu
+                        icr['n_ready_cancellable_jobs'] += n_array_jobs
+                        icr['ready_cancellable_cores_mcpu'] += n_array_jobs * cores_mcpu
                 else:
                     state = 'Pending'
 
@@ -886,28 +894,34 @@ WHERE user = %s AND id = %s AND NOT deleted;
                 if user != 'ci' and unconfined:
                     raise web.HTTPBadRequest(reason=f'unauthorized use of unconfined={unconfined}')
 
-                spec_writer.add(json.dumps(spec))
-                db_spec = batch_format_version.db_spec(spec)
-
-                jobs_args.append(
-                    (
-                        batch_id,
-                        job_id,
-                        state,
-                        json.dumps(db_spec),
-                        always_run,
-                        cores_mcpu,
-                        len(parent_ids),
-                        inst_coll_name,
+                if array:
+                    # every job of the array shares this spec; only the
+                    # per-index parameters are stored for each job
+                    spec_writer.add_array(json.dumps(spec), job_id, n_array_jobs, array['parameters'])
+                else:
+                    spec_writer.add(json.dumps(spec))
+                db_spec = json.dumps(batch_format_version.db_spec(spec))
+
+                for array_job_id in array_job_ids:
+                    jobs_args.append(
+                        (
+                            batch_id,
+                            array_job_id,
+                            state,
+                            db_spec,
+                            always_run,
+                            cores_mcpu,
+                            len(parent_ids),
+                            inst_coll_name,
+                        )
                     )
-                )
 
-                for parent_id in parent_ids:
-                    job_parents_args.append((batch_id, job_id, parent_id))
+                    for parent_id in parent_ids:
+                        job_parents_args.append((batch_id, array_job_id, parent_id))
 
-                if attributes:
-                    for k, v in attributes.items():
-                        job_attributes_args.append((batch_id, job_id, k, v))
+                    if attributes:
+                        for k, v in attributes.items():
+                            job_attributes_args.append((batch_id, array_job_id, k, v))
 
         rand_token = random.randint(0, app['n_tokens'] - 1)
 
@@ -1022,7 +1036,12 @@ VALUES (%s, %s, %s);
                         f'job_parents_args={json.dumps(job_parents_args)}'
                     ) from err
 
-        await asyncio.gather(write_spec_to_cloud(), insert_jobs_into_db())
+        # Stage the bunch's specs in cloud storage before the (single
+        # transaction) bulk insert.  Once the jobs rows are visible the
+        # driver may schedule them, and a retried bunch whose insert
+        # already succeeded is acknowledged without rewriting its spec.
+        await write_spec_to_cloud()
+        await insert_jobs_into_db()
 
     return web.Response()
 
@@ -1139,8 +1158,8 @@ WHERE token = %s AND user = %s FOR UPDATE;
         now = time_msecs()
         id = await tx.execute_insertone(
             '''
-INSERT INTO batches (userdata, user, billing_project, attributes, callback, n_jobs, time_created, token, state, format_version, cancel_after_n_failures)
-VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+INSERT INTO batches (userdata, user, billing_project, attributes, callback, n_jobs, time_created, token, state, format_version, cancel_after_n_failures, speculative_execution)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
 ''',
             (
                 json.dumps(userdata),
@@ -1154,6 +1173,7 @@ VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
                 'open',
                 BATCH_FORMAT_VERSION,
                 batch_spec.get('cancel_after_n_failures'),
+                batch_spec.get('speculative_execution', False),
             ),
         )
 
@@ -1753,7 +1773,11 @@ GROUP BY billing_project, `user`;
         del record['msec_mcpu']
         return record
 
-    billing = [billing_record_to_dict(record) async for record in db.select_and_fetchall(sql, sql_args)]
+    # the billing page tolerates stale reads
+    billing = [
+        billing_record_to_dict(record)
+        async for record in db.select_and_fetchall(sql, sql_args, query_name='get_billing', read_replica=True)
+    ]
 
     return (billing, start_query, end_query)
 
@@ -2215,7 +2239,7 @@ async def on_startup(app):
     app['client_session'] = httpx.client_session()
 
     db = Database()
-    await db.async_init()
+    await db.async_init(read_replica_config_file=READ_REPLICA_SQL_CONFIG_FILE)
     app['db'] = db
 
     row = await db.select_and_fetchone(
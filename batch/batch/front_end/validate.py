@@ -45,6 +45,12 @@ image_str = str_type
 job_validator = keyed(
     {
         'always_run': bool_type,
+        'array': keyed(
+            {
+                required('n_jobs'): numeric(**{"x > 0": lambda x: isinstance(x, int) and x > 0}),
+                required('parameters'): dictof(listof(str_type)),
+            }
+        ),
         'attributes': dictof(str_type),
         'env': listof(keyed({'name': str_type, 'value': str_type})),
         'cloudfuse': listof(
@@ -102,6 +108,7 @@ batch_validator = keyed(
         required('n_jobs'): int_type,
         required('token'): str_type,
         'cancel_after_n_failures': nullable(numeric(**{"x > 0": lambda x: isinstance(x, int) and x > 0})),
+        'speculative_execution': bool_type,
     }
 )
 
@@ -112,9 +119,22 @@ def validate_and_clean_jobs(jobs):
     for i, job in enumerate(jobs):
         handle_deprecated_job_keys(i, job)
         job_validator.validate(f"jobs[{i}]", job)
+        validate_job_array(i, job)
         handle_job_backwards_compatibility(job)
 
 
+def validate_job_array(i, job):
+    array = job.get('array')
+    if array is None:
+        return
+    n_jobs = array['n_jobs']
+    for name, values in array['parameters'].items():
+        if len(values) != n_jobs:
+            raise ValidationError(
+                f'jobs[{i}].array.parameters.{name} has {len(values)} values, but the array has {n_jobs} jobs'
+            )
+
+
 def handle_deprecated_job_keys(i, job):
     if 'pvc_size' in job:
         if 'resources' in job and 'storage' in job['resources']:
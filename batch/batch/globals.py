@@ -21,7 +21,9 @@ HTTP_CLIENT_MAX_SIZE = 8 * 1024 * 1024
 
 BATCH_FORMAT_VERSION = 6
 STATUS_FORMAT_VERSION = 5
-INSTANCE_VERSION = 22
+INSTANCE_VERSION = 23
+# workers from this version accept deleting several jobs in one request
+BULK_DELETE_INSTANCE_VERSION = 23
 
 MAX_PERSISTENT_SSD_SIZE_GIB = 64 * 1024
 RESERVED_STORAGE_GB_PER_CORE = 5
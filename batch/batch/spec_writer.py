@@ -1,3 +1,4 @@
+import json
 import logging
 
 from hailtop.utils import secret_alnum_string
@@ -9,6 +10,7 @@ class SpecWriter:
     byteorder = 'little'
     signed = False
     bytes_per_offset = 8
+    array_index_env_name = 'HAIL_BATCH_ARRAY_INDEX'
 
     @staticmethod
     def get_index_file_offsets(job_id, start_job_id):
@@ -26,6 +28,26 @@ class SpecWriter:
         next_spec_start = int.from_bytes(offsets[8:], byteorder=SpecWriter.byteorder, signed=SpecWriter.signed)
         return (spec_start, next_spec_start - 1)  # `end` parameter in gcs is inclusive of last byte to return
 
+    @staticmethod
+    def is_array_element(spec):
+        return 'array' in spec
+
+    @staticmethod
+    def get_array_template_offsets(spec):
+        start, end = spec['array']['template']
+        return (start, end)
+
+    @staticmethod
+    def expand_array_element(template, spec):
+        full_spec = json.loads(template)
+        full_spec['job_id'] = spec['job_id']
+        env = full_spec.get('env')
+        if not env:
+            env = []
+            full_spec['env'] = env
+        env.extend(spec['array']['env'])
+        return full_spec
+
     @staticmethod
     async def get_token_start_id(db, batch_id, job_id):
         bunch_record = await db.select_and_fetchone(
@@ -48,6 +70,7 @@ LIMIT 1;
 
         self._data_bytes = bytearray()
         self._offsets_bytes = bytearray()
+        self._templates_bytes = bytearray()
         self._n_elements = 0
 
     def add(self, data):
@@ -59,11 +82,25 @@ LIMIT 1;
 
         self._n_elements += 1
 
+    def add_array(self, template, start_job_id, n_jobs, parameters):
+        # The template is stored once in the templates file; each element
+        # of the array only records its parameters and where to find it.
+        template_bytes = template.encode('utf-8')
+        template_start = len(self._templates_bytes)
+        self._templates_bytes.extend(template_bytes)
+        template_offsets = [template_start, len(self._templates_bytes) - 1]
+
+        for i in range(n_jobs):
+            env = [{'name': SpecWriter.array_index_env_name, 'value': str(i)}]
+            env.extend({'name': name, 'value': values[i]} for name, values in parameters.items())
+            self.add(json.dumps({'job_id': start_job_id + i, 'array': {'template': template_offsets, 'env': env}}))
+
     async def write(self):
         end = len(self._data_bytes)
         self._offsets_bytes.extend(end.to_bytes(8, byteorder=SpecWriter.byteorder, signed=SpecWriter.signed))
 
+        templates_bytes = bytes(self._templates_bytes) if self._templates_bytes else None
         await self.file_store.write_spec_file(
-            self.batch_id, self.token, bytes(self._data_bytes), bytes(self._offsets_bytes)
+            self.batch_id, self.token, bytes(self._data_bytes), bytes(self._offsets_bytes), templates_bytes
         )
         return self.token
@@ -2,6 +2,7 @@ from typing import Deque, Set, Tuple, Dict, Any
 import logging
 import json
 import secrets
+import sortedcontainers
 from aiohttp import web
 from functools import wraps
 from collections import deque
@@ -110,6 +111,89 @@ class ExceededSharesCounter:
         return f'global {self._global_counter}'
 
 
+class FairShare:
+    """Water-filling allocation of free resources among users.
+
+    Each user has resources in use and a demand, the resources in use plus
+    those their ready jobs need. Free resources are allocated by raising a
+    mark from zero: each user is allocated the amount by which the mark
+    exceeds their use, up to their demand, until the free resources run out.
+
+    Users are kept sorted by use and by demand, so updating a user is
+    O(log users) and an allocation visits only the users it allocates to.
+    """
+
+    def __init__(self):
+        self._used: Dict[str, int] = {}
+        self._demand: Dict[str, int] = {}
+        self._users_by_used = sortedcontainers.SortedSet(key=lambda user: self._used[user])
+        self._users_by_demand = sortedcontainers.SortedSet(key=lambda user: self._demand[user])
+
+    def __contains__(self, user: str) -> bool:
+        return user in self._used
+
+    def set(self, user: str, used: int, demand: int):
+        self.remove(user)
+        if demand > 0 or used > 0:
+            self._used[user] = used
+            self._demand[user] = max(used, demand)
+            self._users_by_used.add(user)
+            self._users_by_demand.add(user)
+
+    def remove(self, user: str):
+        if user in self._used:
+            self._users_by_used.remove(user)
+            self._users_by_demand.remove(user)
+            del self._used[user]
+            del self._demand[user]
+
+    def allocate(self, free: int) -> Dict[str, int]:
+        """The allocation of `free` resources to each user that is allocated
+        any."""
+        allocation: Dict[str, int] = {}
+        users_by_used = iter(self._users_by_used)
+        users_by_demand = iter(self._users_by_demand)
+        next_used_user = next(users_by_used, None)
+        next_demand_user = next(users_by_demand, None)
+        # users whose use is below the mark and whose demand is not
+        allocating: Set[str] = set()
+
+        mark = 0
+        while free > 0 and (next_used_user is not None or allocating):
+            if next_used_user is not None and self._used[next_used_user] <= mark:
+                allocating.add(next_used_user)
+                next_used_user = next(users_by_used, None)
+                continue
+
+            # every user whose demand is below the mark has been allocating
+            if next_demand_user is not None and self._demand[next_demand_user] <= mark:
+                allocating.remove(next_demand_user)
+                allocation[next_demand_user] = self._demand[next_demand_user] - self._used[next_demand_user]
+                next_demand_user = next(users_by_demand, None)
+                continue
+
+            levels = []
+            if next_used_user is not None:
+                levels.append(self._used[next_used_user])
+            if allocating:
+                assert next_demand_user is not None
+                levels.append(self._demand[next_demand_user])
+            level = min(levels)
+
+            to_allocate = len(allocating) * (level - mark)
+            if to_allocate > free:
+                mark += int(free / len(allocating) + 0.5)
+                break
+
+            mark = level
+            free -= to_allocate
+
+        for user in allocating:
+            allocation[user] = mark - self._used[user]
+
+        return allocation
+
+
 def accrued_cost_from_cost_and_msec_mcpu(record: Dict[str, Any]) -> float:
     cost_msec_mcpu = cost_from_msec_mcpu(record['msec_mcpu'])
     cost_resources = record['cost']
@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Callable, Tuple, Awaitable, Any, Union, MutableMapping
+from typing import Optional, Dict, Callable, List, Tuple, Awaitable, Any, Union, MutableMapping
 import os
 import json
 import sys
@@ -112,6 +112,16 @@ MAX_DOCKER_IMAGE_PULL_SECS = 20 * 60
 MAX_DOCKER_WAIT_SECS = 5 * 60
 MAX_DOCKER_OTHER_OPERATION_SECS = 1 * 60
 
+# A user who pulled a private image on this worker recently is not
+# required to pull it again to prove they still have access to it.
+IMAGE_ACCESS_CACHE_TTL_MSECS = 5 * 60 * 1000
+# Unused images are evicted least recently used first once the data disk
+# is this full, and unconditionally once they have been idle this long.
+IMAGE_DISK_USAGE_HIGH_WATERMARK = 0.8
+MAX_IMAGE_IDLE_MSECS = 60 * 60 * 1000
+MAX_PREWARM_IMAGES = 5
+MAX_REPORTED_CACHED_IMAGES = 50
+
 IPTABLES_WAIT_TIMEOUT_SECS = 60
 
 CLOUD = os.environ['CLOUD']
@@ -401,6 +411,30 @@ def worker_fraction_in_1024ths(cpu_in_mcpu):
     return 1024 * cpu_in_mcpu // (CORES * 1000)
 
 
+def is_cloud_image(image_ref) -> bool:
+    return (CLOUD == 'gcp' and image_ref.hosted_in('google')) or (CLOUD == 'azure' and image_ref.hosted_in('azure'))
+
+
+def is_public_image(image_ref) -> bool:
+    return image_ref.name() in PUBLIC_IMAGES
+
+
+async def ensure_image_is_pulled(image_ref_str, name, auth=None):
+    try:
+        await docker_call_retry(MAX_DOCKER_OTHER_OPERATION_SECS, name)(docker.images.get, image_ref_str)
+    except DockerError as e:
+        if e.status == 404:
+            await docker_call_retry(MAX_DOCKER_IMAGE_PULL_SECS, name)(docker.images.pull, image_ref_str, auth=auth)
+        else:
+            raise
+
+
+async def inspect_image(image_ref_str):
+    image_config, _ = await check_exec_output('docker', 'inspect', image_ref_str)
+    image_configs[image_ref_str] = json.loads(image_config)[0]
+    return image_configs[image_ref_str]
+
+
 def user_error(e):
     if isinstance(e, DockerError):
         if e.status == 404 and 'pull access denied' in e.message:
@@ -485,29 +519,13 @@ class Container:
             async def localize_rootfs():
                 async def _localize_rootfs():
                     async with image_lock.reader_lock:
-                        # FIXME Authentication is entangled with pulling images. We need a way to test
-                        # that a user has access to a cached image without pulling.
                         await self.pull_image()
                         self.image_config = image_configs[self.image_ref_str]
                         self.image_id = self.image_config['Id'].split(":")[1]
                         self.worker.image_data[self.image_id] += 1
 
-                        self.rootfs_path = f'/host/rootfs/{self.image_id}'
-
-                        image_data = self.worker.image_data[self.image_id]
-                        async with image_data.lock:
-                            if not image_data.extracted:
-                                try:
-                                    await self.extract_rootfs()
-                                    image_data.extracted = True
-                                    log.info(
-                                        f'Added expanded image to cache: {self.image_ref_str}, ID: {self.image_id}'
-                                    )
-                                except asyncio.CancelledError:
-                                    raise
-                                except Exception:
-                                    log.exception(f'while extracting image {self.image_ref_str}, ID: {self.image_id}')
-                                    await blocking_to_async(worker.pool, shutil.rmtree, self.rootfs_path)
+                        self.rootfs_path = self.worker.rootfs_path(self.image_id)
+                        await self.worker.extract_image(self.image_id, self.image_ref_str)
 
                 await asyncio.shield(_localize_rootfs())
 
@@ -579,26 +597,23 @@ class Container:
         return self.timings.step(name, ignore_job_deletion=ignore_job_deletion)
 
     async def pull_image(self):
-        is_cloud_image = (CLOUD == 'gcp' and self.image_ref.hosted_in('google')) or (
-            CLOUD == 'azure' and self.image_ref.hosted_in('azure')
-        )
-        is_public_image = self.image_ref.name() in PUBLIC_IMAGES
-
         try:
-            if not is_cloud_image:
-                await self.ensure_image_is_pulled()
-            elif is_public_image:
+            if not is_cloud_image(self.image_ref):
+                await ensure_image_is_pulled(self.image_ref_str, f'{self}')
+            elif is_public_image(self.image_ref):
                 auth = await self.batch_worker_access_token()
-                await self.ensure_image_is_pulled(auth=auth)
+                await ensure_image_is_pulled(self.image_ref_str, f'{self}', auth=auth)
+            elif self.worker.image_access_recently_verified(self.job.user, self.image_ref_str):
+                log.info(f'{self.job.user} recently verified access to {self.image_ref_str}, not pulling')
+                return
             else:
-                # Pull to verify this user has access to this
-                # image.
-                # FIXME improve the performance of this with a
-                # per-user image cache.
+                # Authentication is entangled with pulling images, so pull
+                # to verify this user has access to this image.
                 auth = self.current_user_access_token()
                 await docker_call_retry(MAX_DOCKER_IMAGE_PULL_SECS, f'{self}')(
                     docker.images.pull, self.image_ref_str, auth=auth
                 )
+                self.worker.image_access_verified(self.job.user, self.image_ref_str)
         except DockerError as e:
             if e.status == 404 and 'pull access denied' in e.message:
                 self.short_error = 'image cannot be pulled'
@@ -606,19 +621,7 @@ class Container:
                 self.short_error = 'image not found'
             raise
 
-        image_config, _ = await check_exec_output('docker', 'inspect', self.image_ref_str)
-        image_configs[self.image_ref_str] = json.loads(image_config)[0]
-
-    async def ensure_image_is_pulled(self, auth=None):
-        try:
-            await docker_call_retry(MAX_DOCKER_OTHER_OPERATION_SECS, f'{self}')(docker.images.get, self.image_ref_str)
-        except DockerError as e:
-            if e.status == 404:
-                await docker_call_retry(MAX_DOCKER_IMAGE_PULL_SECS, f'{self}')(
-                    docker.images.pull, self.image_ref_str, auth=auth
-                )
-            else:
-                raise
+        await inspect_image(self.image_ref_str)
 
     async def batch_worker_access_token(self):
         return await CLOUD_WORKER_API.worker_access_token(self.client_session)
@@ -626,13 +629,6 @@ class Container:
     def current_user_access_token(self):
         return {'username': self.job.credentials.username, 'password': self.job.credentials.password}
 
-    async def extract_rootfs(self):
-        assert self.rootfs_path
-        os.makedirs(self.rootfs_path)
-        await check_shell(
-            f'id=$(docker create {self.image_id}) && docker export $id | tar -C {self.rootfs_path} -xf - && docker rm $id'
-        )
-
     async def setup_overlay(self):
         lower_dir = self.rootfs_path
         upper_dir = f'{self.container_overlay_path}/upper'
@@ -1227,6 +1223,12 @@ class Job:
     async def get_log(self):
         pass
 
+    def prewarmable_images(self) -> List[str]:
+        return []
+
+    def images(self) -> List[str]:
+        return []
+
     async def delete(self):
         log.info(f'deleting {self}')
         self.deleted = True
@@ -1544,6 +1546,15 @@ class DockerJob(Job):
     async def get_log(self):
         return {name: await c.get_log() for name, c in self.containers.items()}
 
+    def prewarmable_images(self) -> List[str]:
+        main = self.containers['main']
+        if is_cloud_image(main.image_ref) and not is_public_image(main.image_ref):
+            return []
+        return [main.image_ref_str]
+
+    def images(self) -> List[str]:
+        return [self.containers['main'].image_ref_str]
+
     async def delete(self):
         await super().delete()
         await asyncio.wait([c.delete() for c in self.containers.values()])
@@ -1811,6 +1822,7 @@ class Worker:
 
         self.image_data: Dict[str, ImageData] = defaultdict(ImageData)
         self.image_data[BATCH_WORKER_IMAGE_ID] += 1
+        self.image_access: Dict[Tuple[str, str], int] = {}
 
         # filled in during activation
         self.fs = None
@@ -1951,6 +1963,27 @@ class Worker:
     async def delete_job(self, request):
         return await asyncio.shield(self.delete_job_1(request))
 
+    async def delete_jobs_1(self, request):
+        body = await request.json()
+
+        for batch_id, job_id in body['jobs']:
+            id = (batch_id, job_id)
+
+            job = self.jobs.pop(id, None)
+            if job is None:
+                log.info(f'deleting job {id}, not found')
+                continue
+
+            log.info(f'deleting job {id}, removing from jobs')
+            self.task_manager.ensure_future(job.delete())
+
+        self.last_updated = time_msecs()
+
+        return web.Response()
+
+    async def delete_jobs(self, request):
+        return await asyncio.shield(self.delete_jobs_1(request))
+
     async def healthcheck(self, request):  # pylint: disable=unused-argument
         body = {'name': NAME}
         return web.json_response(body)
@@ -1962,6 +1995,7 @@ class Worker:
                 web.post('/api/v1alpha/kill', self.kill),
                 web.post('/api/v1alpha/batches/jobs/create', self.create_job),
                 web.delete('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/delete', self.delete_job),
+                web.post('/api/v1alpha/batches/jobs/delete', self.delete_jobs),
                 web.get('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/log', self.get_job_log),
                 web.get('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/status', self.get_job_status),
                 web.get('/healthcheck', self.healthcheck),
@@ -2044,7 +2078,12 @@ class Worker:
             'status': db_status,
         }
 
-        body = {'status': status}
+        body = {
+            'status': status,
+            'prewarmable_images': job.prewarmable_images(),
+            'images': job.images(),
+            'cached_images': self.cached_images(),
+        }
 
         start_time = time_msecs()
         delay_secs = 0.1
@@ -2100,7 +2139,7 @@ class Worker:
             'resources': full_status['resources'],
         }
 
-        body = {'status': status}
+        body = {'status': status, 'cached_images': self.cached_images()}
 
         await request_retry_transient_errors(
             self.client_session,
@@ -2156,21 +2195,105 @@ class Worker:
         self.headers = {'X-Hail-Instance-Name': NAME, 'Authorization': f'Bearer {resp_json["token"]}'}
         self.active = True
 
+        prewarm_images = resp_json.get('prewarm_images', [])
+        if prewarm_images:
+            self.task_manager.ensure_future(self.prewarm_images(prewarm_images[:MAX_PREWARM_IMAGES]))
+
+    @staticmethod
+    def cached_images() -> List[str]:
+        # the most recently pulled images, which the driver uses to place
+        # jobs that use them on this worker
+        return list(image_configs)[-MAX_REPORTED_CACHED_IMAGES:]
+
+    def image_access_verified(self, user: str, image_ref_str: str):
+        self.image_access[(user, image_ref_str)] = time_msecs()
+
+    def image_access_recently_verified(self, user: str, image_ref_str: str) -> bool:
+        verified_at = self.image_access.get((user, image_ref_str))
+        return (
+            verified_at is not None
+            and time_msecs() - verified_at < IMAGE_ACCESS_CACHE_TTL_MSECS
+            and image_ref_str in image_configs
+        )
+
+    @staticmethod
+    def rootfs_path(image_id: str) -> str:
+        return f'/host/rootfs/{image_id}'
+
+    async def extract_image(self, image_id: str, image_ref_str: str):
+        rootfs_path = self.rootfs_path(image_id)
+        image_data = self.image_data[image_id]
+        async with image_data.lock:
+            if not image_data.extracted:
+                try:
+                    os.makedirs(rootfs_path)
+                    await check_shell(
+                        f'id=$(docker create {image_id}) && docker export $id | tar -C {rootfs_path} -xf - && docker rm $id'
+                    )
+                    image_data.extracted = True
+                    log.info(f'Added expanded image to cache: {image_ref_str}, ID: {image_id}')
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    log.exception(f'while extracting image {image_ref_str}, ID: {image_id}')
+                    await blocking_to_async(self.pool, shutil.rmtree, rootfs_path)
+
+    async def prewarm_image(self, image_ref_str: str):
+        image_ref = parse_docker_image_reference(image_ref_str)
+        if is_cloud_image(image_ref) and not is_public_image(image_ref):
+            # only the owner of a private image can prove access to it
+            return
+
+        auth = None
+        if is_cloud_image(image_ref):
+            auth = await CLOUD_WORKER_API.worker_access_token(self.client_session)
+
+        async with image_lock.reader_lock:
+            await ensure_image_is_pulled(image_ref_str, f'prewarm {image_ref_str}', auth=auth)
+            image_config = await inspect_image(image_ref_str)
+            image_id = image_config['Id'].split(":")[1]
+            await self.extract_image(image_id, image_ref_str)
+
+    async def prewarm_images(self, image_ref_strs: List[str]):
+        for image_ref_str in image_ref_strs:
+            try:
+                await self.prewarm_image(image_ref_str)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception(f'while prewarming image {image_ref_str}, ignoring')
+
+    @staticmethod
+    def data_disk_usage_fraction() -> float:
+        usage = shutil.disk_usage('/host/')
+        return usage.used / usage.total
+
+    async def delete_image(self, image_id: str):
+        assert image_id != BATCH_WORKER_IMAGE_ID
+        await check_shell(f'docker rmi -f {image_id}')
+        await blocking_to_async(self.pool, shutil.rmtree, self.rootfs_path(image_id))
+        del self.image_data[image_id]
+        for image_ref_str, image_config in list(image_configs.items()):
+            if image_config['Id'].split(":")[1] == image_id:
+                del image_configs[image_ref_str]
+        log.info(f'Deleted image from cache with ID {image_id}')
+
     async def cleanup_old_images(self):
         try:
             async with image_lock.writer_lock:
                 log.info(f"Obtained writer lock. The image ref counts are: {self.image_data}")
-                for image_id in list(self.image_data.keys()):
-                    now = time_msecs()
-                    image_data = self.image_data[image_id]
-                    if image_data.ref_count == 0 and (now - image_data.last_accessed) > 10 * 60 * 1000:
-                        assert image_id != BATCH_WORKER_IMAGE_ID
-                        log.info(f'Found an unused image with ID {image_id}')
-                        await check_shell(f'docker rmi -f {image_id}')
-                        image_path = f'/host/rootfs/{image_id}'
-                        await blocking_to_async(self.pool, shutil.rmtree, image_path)
-                        del self.image_data[image_id]
-                        log.info(f'Deleted image from cache with ID {image_id}')
+                unused_image_ids = sorted(
+                    (image_id for image_id, image_data in self.image_data.items() if image_data.ref_count == 0),
+                    key=lambda image_id: self.image_data[image_id].last_accessed,
+                )
+                for image_id in unused_image_ids:
+                    idle_msecs = time_msecs() - self.image_data[image_id].last_accessed
+                    if idle_msecs <= MAX_IMAGE_IDLE_MSECS and (
+                        self.data_disk_usage_fraction() <= IMAGE_DISK_USAGE_HIGH_WATERMARK
+                    ):
+                        break
+                    log.info(f'Found an unused image with ID {image_id}, idle for {idle_msecs} ms')
+                    await self.delete_image(image_id)
         except asyncio.CancelledError:
             raise
         except Exception as e:
@@ -0,0 +1,85 @@
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS cancel_ready_jobs $$
+CREATE PROCEDURE cancel_ready_jobs(
+  IN in_batch_id BIGINT,
+  IN in_limit INT,
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE cur_batch_cancelled BOOLEAN;
+  DECLARE n_cancelled_jobs INT DEFAULT 0;
+
+  DROP TEMPORARY TABLE IF EXISTS `tmp_cancelled_ready_jobs`;
+
+  CREATE TEMPORARY TABLE `tmp_cancelled_ready_jobs` (
+    `job_id` INT NOT NULL,
+    PRIMARY KEY (`job_id`)
+  ) ENGINE = MEMORY;
+
+  START TRANSACTION;
+
+  SET cur_batch_cancelled = EXISTS (SELECT TRUE
+                                    FROM batches_cancelled
+                                    WHERE id = in_batch_id
+                                    LOCK IN SHARE MODE);
+
+  IF cur_batch_cancelled THEN
+    INSERT INTO `tmp_cancelled_ready_jobs` (job_id)
+    SELECT job_id
+    FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
+    WHERE batch_id = in_batch_id AND state = 'Ready' AND always_run = 0
+    LIMIT in_limit
+    FOR UPDATE;
+  ELSE
+    INSERT INTO `tmp_cancelled_ready_jobs` (job_id)
+    SELECT job_id
+    FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
+    WHERE batch_id = in_batch_id AND state = 'Ready' AND always_run = 0 AND cancelled = 1
+    LIMIT in_limit
+    FOR UPDATE;
+  END IF;
+
+  SELECT COUNT(*) INTO n_cancelled_jobs FROM `tmp_cancelled_ready_jobs`;
+
+  IF n_cancelled_jobs > 0 THEN
+    UPDATE jobs
+    INNER JOIN `tmp_cancelled_ready_jobs`
+      ON jobs.job_id = `tmp_cancelled_ready_jobs`.job_id
+    SET jobs.state = 'Cancelled', jobs.status = NULL, jobs.attempt_id = NULL
+    WHERE jobs.batch_id = in_batch_id;
+
+    UPDATE batches
+      SET n_completed = n_completed + n_cancelled_jobs,
+          n_cancelled = n_cancelled + n_cancelled_jobs
+      WHERE id = in_batch_id;
+    UPDATE batches
+      SET time_completed = new_timestamp,
+          `state` = 'complete'
+      WHERE id = in_batch_id AND n_completed = batches.n_jobs;
+
+    # a child may have several parents among the cancelled jobs
+    UPDATE jobs
+      INNER JOIN (
+        SELECT `job_parents`.job_id, COUNT(*) AS n_cancelled_parents
+        FROM `job_parents`
+        INNER JOIN `tmp_cancelled_ready_jobs`
+          ON `job_parents`.parent_id = `tmp_cancelled_ready_jobs`.job_id
+        WHERE `job_parents`.batch_id = in_batch_id
+        GROUP BY `job_parents`.job_id
+      ) AS cancelled_parents
+        ON jobs.job_id = cancelled_parents.job_id
+      SET jobs.state = IF(jobs.n_pending_parents = cancelled_parents.n_cancelled_parents, 'Ready', 'Pending'),
+          jobs.n_pending_parents = jobs.n_pending_parents - cancelled_parents.n_cancelled_parents,
+          jobs.cancelled = 1
+      WHERE jobs.batch_id = in_batch_id;
+  END IF;
+
+  COMMIT;
+
+  DROP TEMPORARY TABLE IF EXISTS `tmp_cancelled_ready_jobs`;
+
+  SELECT 0 as rc, n_cancelled_jobs;
+END $$
+
+DELIMITER ;
@@ -0,0 +1,271 @@
+ALTER TABLE batches ADD COLUMN `speculative_execution` BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE TABLE IF NOT EXISTS `speculative_attempts` (
+  `batch_id` BIGINT NOT NULL,
+  `job_id` INT NOT NULL,
+  `attempt_id` VARCHAR(40) NOT NULL,
+  PRIMARY KEY (`batch_id`, `job_id`, `attempt_id`),
+  FOREIGN KEY (`batch_id`, `job_id`, `attempt_id`) REFERENCES attempts(`batch_id`, `job_id`, `attempt_id`) ON DELETE CASCADE
+) ENGINE = InnoDB;
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS deactivate_instance $$
+CREATE PROCEDURE deactivate_instance(
+  IN in_instance_name VARCHAR(100),
+  IN in_reason VARCHAR(40),
+  IN in_timestamp BIGINT
+)
+BEGIN
+  DECLARE cur_state VARCHAR(40);
+
+  START TRANSACTION;
+
+  SELECT state INTO cur_state FROM instances WHERE name = in_instance_name FOR UPDATE;
+
+  UPDATE instances
+  SET time_deactivated = in_timestamp
+  WHERE name = in_instance_name;
+
+  UPDATE attempts
+  SET end_time = in_timestamp, reason = in_reason
+  WHERE instance_name = in_instance_name;
+
+  IF cur_state = 'pending' or cur_state = 'active' THEN
+    # jobs with a live speculative attempt elsewhere keep running there
+    UPDATE jobs
+    INNER JOIN attempts AS cur_attempts
+      ON jobs.batch_id = cur_attempts.batch_id AND jobs.job_id = cur_attempts.job_id AND jobs.attempt_id = cur_attempts.attempt_id
+    INNER JOIN speculative_attempts
+      ON jobs.batch_id = speculative_attempts.batch_id AND jobs.job_id = speculative_attempts.job_id
+    INNER JOIN attempts AS spec_attempts
+      ON speculative_attempts.batch_id = spec_attempts.batch_id AND speculative_attempts.job_id = spec_attempts.job_id AND
+         speculative_attempts.attempt_id = spec_attempts.attempt_id
+    SET jobs.attempt_id = spec_attempts.attempt_id
+    WHERE cur_attempts.instance_name = in_instance_name AND jobs.state = 'Running' AND spec_attempts.end_time IS NULL;
+
+    UPDATE jobs
+    INNER JOIN attempts ON jobs.batch_id = attempts.batch_id AND jobs.job_id = attempts.job_id AND jobs.attempt_id = attempts.attempt_id
+    SET state = 'Ready',
+        jobs.attempt_id = NULL
+    WHERE instance_name = in_instance_name AND (state = 'Running' OR state = 'Creating');
+
+    UPDATE instances, instances_free_cores_mcpu
+    SET state = 'inactive',
+        free_cores_mcpu = cores_mcpu
+    WHERE instances.name = in_instance_name
+      AND instances.name = instances_free_cores_mcpu.name;
+
+    COMMIT;
+    SELECT 0 as rc;
+  ELSE
+    ROLLBACK;
+    SELECT 1 as rc, cur_state, 'state not live (active or pending)' as message;
+  END IF;
+END $$
+
+DROP PROCEDURE IF EXISTS schedule_speculative_job $$
+CREATE PROCEDURE schedule_speculative_job(
+  IN in_batch_id BIGINT,
+  IN in_job_id INT,
+  IN in_attempt_id VARCHAR(40),
+  IN in_instance_name VARCHAR(100)
+)
+BEGIN
+  DECLARE cur_job_state VARCHAR(40);
+  DECLARE cur_cores_mcpu INT;
+  DECLARE cur_job_cancel BOOLEAN;
+  DECLARE cur_instance_state VARCHAR(40);
+  DECLARE delta_cores_mcpu INT;
+  DECLARE cur_instance_is_pool BOOLEAN;
+
+  START TRANSACTION;
+
+  SELECT state, cores_mcpu
+  INTO cur_job_state, cur_cores_mcpu
+  FROM jobs
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  FOR UPDATE;
+
+  SELECT (jobs.cancelled OR batches_cancelled.id IS NOT NULL) AND NOT jobs.always_run
+  INTO cur_job_cancel
+  FROM jobs
+  LEFT JOIN batches_cancelled ON batches_cancelled.id = jobs.batch_id
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  LOCK IN SHARE MODE;
+
+  SELECT is_pool
+  INTO cur_instance_is_pool
+  FROM instances
+  LEFT JOIN inst_colls ON instances.inst_coll = inst_colls.name
+  WHERE instances.name = in_instance_name;
+
+  CALL add_attempt(in_batch_id, in_job_id, in_attempt_id, in_instance_name, cur_cores_mcpu, delta_cores_mcpu);
+
+  INSERT INTO speculative_attempts (batch_id, job_id, attempt_id)
+  VALUES (in_batch_id, in_job_id, in_attempt_id)
+  ON DUPLICATE KEY UPDATE batch_id = batch_id;
+
+  IF cur_instance_is_pool THEN
+    IF delta_cores_mcpu = 0 THEN
+      SET delta_cores_mcpu = cur_cores_mcpu;
+    ELSE
+      SET delta_cores_mcpu = 0;
+    END IF;
+  END IF;
+
+  SELECT state INTO cur_instance_state FROM instances WHERE name = in_instance_name LOCK IN SHARE MODE;
+
+  IF cur_job_state = 'Running' AND NOT cur_job_cancel AND cur_instance_state = 'active' THEN
+    COMMIT;
+    SELECT 0 as rc, in_instance_name, delta_cores_mcpu;
+  ELSE
+    COMMIT;
+    SELECT 1 as rc,
+      cur_job_state,
+      cur_job_cancel,
+      cur_instance_state,
+      in_instance_name,
+      delta_cores_mcpu,
+      'job not Running or cancelled or instance not active' as message;
+  END IF;
+END $$
+
+DROP PROCEDURE IF EXISTS mark_job_complete $$
+CREATE PROCEDURE mark_job_complete(
+  IN in_batch_id BIGINT,
+  IN in_job_id INT,
+  IN in_attempt_id VARCHAR(40),
+  IN in_instance_name VARCHAR(100),
+  IN new_state VARCHAR(40),
+  IN new_status TEXT,
+  IN new_start_time BIGINT,
+  IN new_end_time BIGINT,
+  IN new_reason VARCHAR(40),
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE cur_job_state VARCHAR(40);
+  DECLARE cur_instance_state VARCHAR(40);
+  DECLARE cur_cores_mcpu INT;
+  DECLARE cur_end_time BIGINT;
+  DECLARE delta_cores_mcpu INT DEFAULT 0;
+  DECLARE expected_attempt_id VARCHAR(40);
+  DECLARE cur_speculative BOOLEAN;
+  DECLARE racing_attempt_id VARCHAR(40);
+  DECLARE racing_instance_name VARCHAR(100);
+
+  START TRANSACTION;
+
+  SELECT state, cores_mcpu
+  INTO cur_job_state, cur_cores_mcpu
+  FROM jobs
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  FOR UPDATE;
+
+  CALL add_attempt(in_batch_id, in_job_id, in_attempt_id, in_instance_name, cur_cores_mcpu, delta_cores_mcpu);
+
+  SELECT end_time INTO cur_end_time FROM attempts
+  WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id
+  FOR UPDATE;
+
+  UPDATE attempts
+  SET start_time = new_start_time, end_time = new_end_time, reason = new_reason
+  WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id;
+
+  SELECT state INTO cur_instance_state FROM instances WHERE name = in_instance_name LOCK IN SHARE MODE;
+  IF cur_instance_state = 'active' AND cur_end_time IS NULL THEN
+    UPDATE instances_free_cores_mcpu
+    SET free_cores_mcpu = free_cores_mcpu + cur_cores_mcpu
+    WHERE instances_free_cores_mcpu.name = in_instance_name;
+
+    SET delta_cores_mcpu = delta_cores_mcpu + cur_cores_mcpu;
+  END IF;
+
+  SELECT attempt_id INTO expected_attempt_id FROM jobs
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  FOR UPDATE;
+
+  SELECT COUNT(*) > 0 INTO cur_speculative FROM speculative_attempts
+  WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id;
+
+  # the other live attempt of a job executed speculatively, if any
+  SELECT attempts.attempt_id, attempts.instance_name
+  INTO racing_attempt_id, racing_instance_name
+  FROM attempts
+  LEFT JOIN speculative_attempts
+    ON attempts.batch_id = speculative_attempts.batch_id AND attempts.job_id = speculative_attempts.job_id AND
+       attempts.attempt_id = speculative_attempts.attempt_id
+  WHERE attempts.batch_id = in_batch_id AND attempts.job_id = in_job_id AND attempts.attempt_id != in_attempt_id AND
+    attempts.end_time IS NULL AND (attempts.attempt_id = expected_attempt_id OR speculative_attempts.attempt_id IS NOT NULL)
+  LIMIT 1;
+
+  IF expected_attempt_id IS NOT NULL AND expected_attempt_id != in_attempt_id AND NOT cur_speculative THEN
+    COMMIT;
+    SELECT 2 as rc,
+      expected_attempt_id,
+      delta_cores_mcpu,
+      'input attempt id does not match expected attempt id' as message;
+  ELSEIF cur_job_state = 'Running' AND racing_attempt_id IS NOT NULL AND
+         new_state != 'Success' AND new_state != 'Cancelled' THEN
+    # the other attempt may still succeed
+    UPDATE jobs SET attempt_id = racing_attempt_id
+    WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id;
+
+    COMMIT;
+    SELECT 3 as rc,
+      racing_attempt_id,
+      delta_cores_mcpu,
+      'another attempt of the job is still running' as message;
+  ELSEIF cur_job_state = 'Ready' OR cur_job_state = 'Creating' OR cur_job_state = 'Running' THEN
+    UPDATE jobs
+    SET state = new_state, status = new_status, attempt_id = in_attempt_id
+    WHERE batch_id = in_batch_id AND job_id = in_job_id;
+
+    UPDATE batches SET n_completed = n_completed + 1 WHERE id = in_batch_id;
+    UPDATE batches
+      SET time_completed = new_timestamp,
+          `state` = 'complete'
+      WHERE id = in_batch_id AND n_completed = batches.n_jobs;
+
+    IF new_state = 'Cancelled' THEN
+      UPDATE batches SET n_cancelled = n_cancelled + 1 WHERE id = in_batch_id;
+    ELSEIF new_state = 'Error' OR new_state = 'Failed' THEN
+      UPDATE batches SET n_failed = n_failed + 1 WHERE id = in_batch_id;
+    ELSE
+      UPDATE batches SET n_succeeded = n_succeeded + 1 WHERE id = in_batch_id;
+    END IF;
+
+    UPDATE jobs
+      INNER JOIN `job_parents`
+        ON jobs.batch_id = `job_parents`.batch_id AND
+           jobs.job_id = `job_parents`.job_id
+      SET jobs.state = IF(jobs.n_pending_parents = 1, 'Ready', 'Pending'),
+          jobs.n_pending_parents = jobs.n_pending_parents - 1,
+          jobs.cancelled = IF(new_state = 'Success', jobs.cancelled, 1)
+      WHERE jobs.batch_id = in_batch_id AND
+            `job_parents`.batch_id = in_batch_id AND
+            `job_parents`.parent_id = in_job_id;
+
+    COMMIT;
+    SELECT 0 as rc,
+      cur_job_state as old_state,
+      delta_cores_mcpu,
+      racing_attempt_id,
+      racing_instance_name;
+  ELSEIF cur_job_state = 'Cancelled' OR cur_job_state = 'Error' OR
+         cur_job_state = 'Failed' OR cur_job_state = 'Success' THEN
+    COMMIT;
+    SELECT 0 as rc,
+      cur_job_state as old_state,
+      delta_cores_mcpu;
+  ELSE
+    COMMIT;
+    SELECT 1 as rc,
+      cur_job_state,
+      delta_cores_mcpu,
+      'job state not Ready, Creating, Running or complete' as message;
+  END IF;
+END $$
+
+DELIMITER ;
@@ -5,10 +5,12 @@ DROP PROCEDURE IF EXISTS deactivate_instance;
 DROP PROCEDURE IF EXISTS mark_instance_deleted;
 DROP PROCEDURE IF EXISTS close_batch;
 DROP PROCEDURE IF EXISTS schedule_job;
+DROP PROCEDURE IF EXISTS schedule_speculative_job;
 DROP PROCEDURE IF EXISTS unschedule_job;
 DROP PROCEDURE IF EXISTS mark_job_creating;
 DROP PROCEDURE IF EXISTS mark_job_started;
 DROP PROCEDURE IF EXISTS mark_job_complete;
+DROP PROCEDURE IF EXISTS cancel_ready_jobs;
 DROP PROCEDURE IF EXISTS add_attempt;
 
 DROP TRIGGER IF EXISTS instances_before_update;
@@ -24,6 +26,7 @@ DROP TABLE IF EXISTS `attempt_resources`;
 DROP TABLE IF EXISTS `batch_cancellable_resources`;  # deprecated
 DROP TABLE IF EXISTS `batch_inst_coll_cancellable_resources`;
 DROP TABLE IF EXISTS `globals`;
+DROP TABLE IF EXISTS `speculative_attempts`;
 DROP TABLE IF EXISTS `attempts`;
 DROP TABLE IF EXISTS `batch_attributes`;
 DROP TABLE IF EXISTS `job_attributes`;
@@ -161,6 +161,7 @@ CREATE TABLE IF NOT EXISTS `batches` (
   `token` VARCHAR(100) DEFAULT NULL,
   `format_version` INT NOT NULL,
   `cancel_after_n_failures` INT DEFAULT NULL,
+  `speculative_execution` BOOLEAN NOT NULL DEFAULT FALSE,
   PRIMARY KEY (`id`),
   FOREIGN KEY (`billing_project`) REFERENCES billing_projects(name)
 ) ENGINE = InnoDB;
@@ -250,6 +251,14 @@ CREATE INDEX `attempts_instance_name` ON `attempts` (`instance_name`);
 CREATE INDEX `attempts_start_time` ON `attempts` (`start_time`);
 CREATE INDEX `attempts_end_time` ON `attempts` (`end_time`);
 
+CREATE TABLE IF NOT EXISTS `speculative_attempts` (
+  `batch_id` BIGINT NOT NULL,
+  `job_id` INT NOT NULL,
+  `attempt_id` VARCHAR(40) NOT NULL,
+  PRIMARY KEY (`batch_id`, `job_id`, `attempt_id`),
+  FOREIGN KEY (`batch_id`, `job_id`, `attempt_id`) REFERENCES attempts(`batch_id`, `job_id`, `attempt_id`) ON DELETE CASCADE
+) ENGINE = InnoDB;
+
 CREATE TABLE IF NOT EXISTS `gevents_mark` (
   mark VARCHAR(40)
 ) ENGINE = InnoDB;
@@ -738,6 +747,18 @@ BEGIN
   WHERE instance_name = in_instance_name;
 
   IF cur_state = 'pending' or cur_state = 'active' THEN
+    # jobs with a live speculative attempt elsewhere keep running there
+    UPDATE jobs
+    INNER JOIN attempts AS cur_attempts
+      ON jobs.batch_id = cur_attempts.batch_id AND jobs.job_id = cur_attempts.job_id AND jobs.attempt_id = cur_attempts.attempt_id
+    INNER JOIN speculative_attempts
+      ON jobs.batch_id = speculative_attempts.batch_id AND jobs.job_id = speculative_attempts.job_id
+    INNER JOIN attempts AS spec_attempts
+      ON speculative_attempts.batch_id = spec_attempts.batch_id AND speculative_attempts.job_id = spec_attempts.job_id AND
+         speculative_attempts.attempt_id = spec_attempts.attempt_id
+    SET jobs.attempt_id = spec_attempts.attempt_id
+    WHERE cur_attempts.instance_name = in_instance_name AND jobs.state = 'Running' AND spec_attempts.end_time IS NULL;
+
     UPDATE jobs
     INNER JOIN attempts ON jobs.batch_id = attempts.batch_id AND jobs.job_id = attempts.job_id AND jobs.attempt_id = attempts.attempt_id
     SET state = 'Ready',
@@ -997,6 +1018,73 @@ BEGIN
   END IF;
 END $$
 
+DROP PROCEDURE IF EXISTS schedule_speculative_job $$
+CREATE PROCEDURE schedule_speculative_job(
+  IN in_batch_id BIGINT,
+  IN in_job_id INT,
+  IN in_attempt_id VARCHAR(40),
+  IN in_instance_name VARCHAR(100)
+)
+BEGIN
+  DECLARE cur_job_state VARCHAR(40);
+  DECLARE cur_cores_mcpu INT;
+  DECLARE cur_job_cancel BOOLEAN;
+  DECLARE cur_instance_state VARCHAR(40);
+  DECLARE delta_cores_mcpu INT;
+  DECLARE cur_instance_is_pool BOOLEAN;
+
+  START TRANSACTION;
+
+  SELECT state, cores_mcpu
+  INTO cur_job_state, cur_cores_mcpu
+  FROM jobs
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  FOR UPDATE;
+
+  SELECT (jobs.cancelled OR batches_cancelled.id IS NOT NULL) AND NOT jobs.always_run
+  INTO cur_job_cancel
+  FROM jobs
+  LEFT JOIN batches_cancelled ON batches_cancelled.id = jobs.batch_id
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  LOCK IN SHARE MODE;
+
+  SELECT is_pool
+  INTO cur_instance_is_pool
+  FROM instances
+  LEFT JOIN inst_colls ON instances.inst_coll = inst_colls.name
+  WHERE instances.name = in_instance_name;
+
+  CALL add_attempt(in_batch_id, in_job_id, in_attempt_id, in_instance_name, cur_cores_mcpu, delta_cores_mcpu);
+
+  INSERT INTO speculative_attempts (batch_id, job_id, attempt_id)
+  VALUES (in_batch_id, in_job_id, in_attempt_id)
+  ON DUPLICATE KEY UPDATE batch_id = batch_id;
+
+  IF cur_instance_is_pool THEN
+    IF delta_cores_mcpu = 0 THEN
+      SET delta_cores_mcpu = cur_cores_mcpu;
+    ELSE
+      SET delta_cores_mcpu = 0;
+    END IF;
+  END IF;
+
+  SELECT state INTO cur_instance_state FROM instances WHERE name = in_instance_name LOCK IN SHARE MODE;
+
+  IF cur_job_state = 'Running' AND NOT cur_job_cancel AND cur_instance_state = 'active' THEN
+    COMMIT;
+    SELECT 0 as rc, in_instance_name, delta_cores_mcpu;
+  ELSE
+    COMMIT;
+    SELECT 1 as rc,
+      cur_job_state,
+      cur_job_cancel,
+      cur_instance_state,
+      in_instance_name,
+      delta_cores_mcpu,
+      'job not Running or cancelled or instance not active' as message;
+  END IF;
+END $$
+
 DROP PROCEDURE IF EXISTS unschedule_job $$
 CREATE PROCEDURE unschedule_job(
   IN in_batch_id BIGINT,
@@ -1162,6 +1250,9 @@ BEGIN
   DECLARE cur_end_time BIGINT;
   DECLARE delta_cores_mcpu INT DEFAULT 0;
   DECLARE expected_attempt_id VARCHAR(40);
+  DECLARE cur_speculative BOOLEAN;
+  DECLARE racing_attempt_id VARCHAR(40);
+  DECLARE racing_instance_name VARCHAR(100);
 
   START TRANSACTION;
 
@@ -1194,12 +1285,37 @@ BEGIN
   WHERE batch_id = in_batch_id AND job_id = in_job_id
   FOR UPDATE;
 
-  IF expected_attempt_id IS NOT NULL AND expected_attempt_id != in_attempt_id THEN
+  SELECT COUNT(*) > 0 INTO cur_speculative FROM speculative_attempts
+  WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id;
+
+  # the other live attempt of a job executed speculatively, if any
+  SELECT attempts.attempt_id, attempts.instance_name
+  INTO racing_attempt_id, racing_instance_name
+  FROM attempts
+  LEFT JOIN speculative_attempts
+    ON attempts.batch_id = speculative_attempts.batch_id AND attempts.job_id = speculative_attempts.job_id AND
+       attempts.attempt_id = speculative_attempts.attempt_id
+  WHERE attempts.batch_id = in_batch_id AND attempts.job_id = in_job_id AND attempts.attempt_id != in_attempt_id AND
+    attempts.end_time IS NULL AND (attempts.attempt_id = expected_attempt_id OR speculative_attempts.attempt_id IS NOT NULL)
+  LIMIT 1;
+
+  IF expected_attempt_id IS NOT NULL AND expected_attempt_id != in_attempt_id AND NOT cur_speculative THEN
     COMMIT;
     SELECT 2 as rc,
       expected_attempt_id,
       delta_cores_mcpu,
       'input attempt id does not match expected attempt id' as message;
+  ELSEIF cur_job_state = 'Running' AND racing_attempt_id IS NOT NULL AND
+         new_state != 'Success' AND new_state != 'Cancelled' THEN
+    # the other attempt may still succeed
+    UPDATE jobs SET attempt_id = racing_attempt_id
+    WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id;
+
+    COMMIT;
+    SELECT 3 as rc,
+      racing_attempt_id,
+      delta_cores_mcpu,
+      'another attempt of the job is still running' as message;
   ELSEIF cur_job_state = 'Ready' OR cur_job_state = 'Creating' OR cur_job_state = 'Running' THEN
     UPDATE jobs
     SET state = new_state, status = new_status, attempt_id = in_attempt_id
@@ -1233,7 +1349,9 @@ BEGIN
     COMMIT;
     SELECT 0 as rc,
       cur_job_state as old_state,
-      delta_cores_mcpu;
+      delta_cores_mcpu,
+      racing_attempt_id,
+      racing_instance_name;
   ELSEIF cur_job_state = 'Cancelled' OR cur_job_state = 'Error' OR
          cur_job_state = 'Failed' OR cur_job_state = 'Success' THEN
     COMMIT;
@@ -1249,4 +1367,86 @@ BEGIN
   END IF;
 END $$
 
+DROP PROCEDURE IF EXISTS cancel_ready_jobs $$
+CREATE PROCEDURE cancel_ready_jobs(
+  IN in_batch_id BIGINT,
+  IN in_limit INT,
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE cur_batch_cancelled BOOLEAN;
+  DECLARE n_cancelled_jobs INT DEFAULT 0;
+
+  DROP TEMPORARY TABLE IF EXISTS `tmp_cancelled_ready_jobs`;
+
+  CREATE TEMPORARY TABLE `tmp_cancelled_ready_jobs` (
+    `job_id` INT NOT NULL,
+    PRIMARY KEY (`job_id`)
+  ) ENGINE = MEMORY;
+
+  START TRANSACTION;
+
+  SET cur_batch_cancelled = EXISTS (SELECT TRUE
+                                    FROM batches_cancelled
+                                    WHERE id = in_batch_id
+                                    LOCK IN SHARE MODE);
+
+  IF cur_batch_cancelled THEN
+    INSERT INTO `tmp_cancelled_ready_jobs` (job_id)
+    SELECT job_id
+    FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
+    WHERE batch_id = in_batch_id AND state = 'Ready' AND always_run = 0
+    LIMIT in_limit
+    FOR UPDATE;
+  ELSE
+    INSERT INTO `tmp_cancelled_ready_jobs` (job_id)
+    SELECT job_id
+    FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
+    WHERE batch_id = in_batch_id AND state = 'Ready' AND always_run = 0 AND cancelled = 1
+    LIMIT in_limit
+    FOR UPDATE;
+  END IF;
+
+  SELECT COUNT(*) INTO n_cancelled_jobs FROM `tmp_cancelled_ready_jobs`;
+
+  IF n_cancelled_jobs > 0 THEN
+    UPDATE jobs
+    INNER JOIN `tmp_cancelled_ready_jobs`
+      ON jobs.job_id = `tmp_cancelled_ready_jobs`.job_id
+    SET jobs.state = 'Cancelled', jobs.status = NULL, jobs.attempt_id = NULL
+    WHERE jobs.batch_id = in_batch_id;
+
+    UPDATE batches
+      SET n_completed = n_completed + n_cancelled_jobs,
+          n_cancelled = n_cancelled + n_cancelled_jobs
+      WHERE id = in_batch_id;
+    UPDATE batches
+      SET time_completed = new_timestamp,
+          `state` = 'complete'
+      WHERE id = in_batch_id AND n_completed = batches.n_jobs;
+
+    # a child may have several parents among the cancelled jobs
+    UPDATE jobs
+      INNER JOIN (
+        SELECT `job_parents`.job_id, COUNT(*) AS n_cancelled_parents
+        FROM `job_parents`
+        INNER JOIN `tmp_cancelled_ready_jobs`
+          ON `job_parents`.parent_id = `tmp_cancelled_ready_jobs`.job_id
+        WHERE `job_parents`.batch_id = in_batch_id
+        GROUP BY `job_parents`.job_id
+      ) AS cancelled_parents
+        ON jobs.job_id = cancelled_parents.job_id
+      SET jobs.state = IF(jobs.n_pending_parents = cancelled_parents.n_cancelled_parents, 'Ready', 'Pending'),
+          jobs.n_pending_parents = jobs.n_pending_parents - cancelled_parents.n_cancelled_parents,
+          jobs.cancelled = 1
+      WHERE jobs.batch_id = in_batch_id;
+  END IF;
+
+  COMMIT;
+
+  DROP TEMPORARY TABLE IF EXISTS `tmp_cancelled_ready_jobs`;
+
+  SELECT 0 as rc, n_cancelled_jobs;
+END $$
+
 DELIMITER ;
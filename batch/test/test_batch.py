@@ -45,6 +45,50 @@ def test_job(client: BatchClient):
     assert job_log['main'] == 'test\n', str((job_log, b.debug_info()))
 
 
+def test_speculative_execution_batch(client: BatchClient):
+    builder = client.create_batch(speculative_execution=True)
+    jobs = [builder.create_job(DOCKER_ROOT_IMAGE, ['echo', 'test']) for _ in range(3)]
+    b = builder.submit()
+    status = b.wait()
+    assert status['state'] == 'success', str((status, b.debug_info()))
+    for j in jobs:
+        assert j.log()['main'] == 'test\n', str((j.status(), b.debug_info()))
+
+
+def test_speculative_execution_straggler(client: BatchClient):
+    # test deployments speculate on jobs that have run for over a minute once
+    # three jobs like them have completed
+    builder = client.create_batch(speculative_execution=True)
+    for _ in range(3):
+        builder.create_job(DOCKER_ROOT_IMAGE, ['true'])
+    # the first attempt starts before the deadline and straggles; a
+    # speculative attempt can only start a minute after the first one
+    deadline = int(time.time()) + 60
+    straggler = builder.create_job(
+        DOCKER_ROOT_IMAGE, ['bash', '-c', f'if [ $(date +%s) -lt {deadline} ]; then sleep 3600; fi; echo done']
+    )
+    b = builder.submit()
+    status = straggler.wait()
+    assert status['state'] == 'Success', str((status, b.debug_info()))
+
+    # the losing attempt is cancelled after the job completes
+    start = time.time()
+    delay = 0.1
+    while True:
+        attempts = straggler.attempts()
+        if all('end_time' in attempt for attempt in attempts):
+            break
+        if time.time() + delay - start > 60:
+            assert False, str((attempts, b.debug_info()))
+        delay = sync_sleep_and_backoff(delay)
+    assert len(attempts) == 2, str((attempts, b.debug_info()))
+    first, speculative = attempts
+    assert first['instance_name'] != speculative['instance_name'], str((attempts, b.debug_info()))
+    assert first['reason'] == 'cancelled', str((attempts, b.debug_info()))
+    assert speculative['reason'] == 'completed', str((attempts, b.debug_info()))
+    assert straggler.log()['main'] == 'done\n', str((straggler.status(), b.debug_info()))
+
+
 def test_exit_code_duration(client: BatchClient):
     builder = client.create_batch()
     j = builder.create_job(DOCKER_ROOT_IMAGE, ['bash', '-c', 'exit 7'])
@@ -63,6 +107,33 @@ def test_attributes(client: BatchClient):
     assert j.attributes() == a, str(b.debug_info())
 
 
+def test_job_array(client: BatchClient):
+    builder = client.create_batch()
+    before = builder.create_job(DOCKER_ROOT_IMAGE, ['true'])
+    jobs = builder.create_job_array(
+        DOCKER_ROOT_IMAGE,
+        ['/bin/sh', '-c', 'echo $HAIL_BATCH_ARRAY_INDEX $SHARD'],
+        [{'SHARD': f'shard-{i}'} for i in range(5)],
+        parents=[before],
+    )
+    after = builder.create_job(DOCKER_ROOT_IMAGE, ['true'], parents=jobs)
+    b = builder.submit()
+    status = b.wait()
+    assert status['state'] == 'success', str((status, b.debug_info()))
+    assert status['n_jobs'] == 7, str((status, b.debug_info()))
+    assert [j.job_id for j in jobs] == [2, 3, 4, 5, 6]
+    assert after.job_id == 7
+    for i, j in enumerate(jobs):
+        job_log = j.log()
+        assert job_log['main'] == f'{i} shard-{i}\n', str((job_log, b.debug_info()))
+
+
+def test_job_array_mismatched_parameters(client: BatchClient):
+    builder = client.create_batch()
+    with pytest.raises(ValueError):
+        builder.create_job_array(DOCKER_ROOT_IMAGE, ['true'], [{'A': '1'}, {'B': '2'}])
+
+
 def test_garbage_image(client: BatchClient):
     builder = client.create_batch()
     j = builder.create_job('dsafaaadsf', ['echo', 'test'])
@@ -413,6 +484,21 @@ def test_cancel_batch(client: BatchClient):
             raise
 
 
+def test_cancel_batch_many_jobs(client: BatchClient):
+    b = client.create_batch()
+    parents = [b.create_job(DOCKER_ROOT_IMAGE, ['sleep', '300']) for _ in range(400)]
+    for i in range(20):
+        b.create_job(DOCKER_ROOT_IMAGE, ['true'], parents=parents[5 * i : 5 * i + 5])
+    b = b.submit()
+
+    b.cancel()
+    status = b.wait()
+
+    assert status['state'] == 'cancelled', str((status, b.debug_info()))
+    assert status['n_cancelled'] == 420, str((status, b.debug_info()))
+    assert status['n_completed'] == 420, str((status, b.debug_info()))
+
+
 def test_get_nonexistent_job(client: BatchClient):
     try:
         client.get_job(1, 666)
@@ -626,6 +712,16 @@ def test_restartable_insert(client: BatchClient):
         assert len(jobs) == 9, str((jobs, b.debug_info()))
 
 
+def test_submit_many_bunches_with_bounded_parallelism(client: BatchClient):
+    builder = client.create_batch()
+    for i in range(50):
+        builder.create_job(DOCKER_ROOT_IMAGE, ['echo', str(i)])
+    b = builder.submit(max_bunch_size=3, max_parallelism=2)
+    status = b.wait()
+    assert status['state'] == 'success', str((status, b.debug_info()))
+    assert status['n_jobs'] == 50, str((status, b.debug_info()))
+
+
 def test_create_idempotence(client: BatchClient):
     token = secrets.token_urlsafe(32)
     builder1 = client.create_batch(token=token)
@@ -1,5 +1,6 @@
 from hailtop.batch_client.parse import parse_memory_in_bytes
 from batch.cloud.resource_utils import adjust_cores_for_packability
+from batch.utils import FairShare
 
 
 def test_packability():
@@ -23,3 +24,23 @@ def test_memory_str_to_bytes():
     assert parse_memory_in_bytes('7') == 7
     assert parse_memory_in_bytes('1K') == 1000
     assert parse_memory_in_bytes('1Ki') == 1024
+
+
+def test_fair_share():
+    fair_share = FairShare()
+    fair_share.set('a', 0, 10)
+    fair_share.set('b', 4, 10)
+    fair_share.set('c', 0, 2)
+
+    # c's demand is met; a and b level off at 7
+    assert fair_share.allocate(12) == {'a': 7, 'b': 3, 'c': 2}
+    assert fair_share.allocate(100) == {'a': 10, 'b': 6, 'c': 2}
+    assert fair_share.allocate(0) == {}
+
+    # b catches up with a before a is allocated anything
+    fair_share.set('a', 6, 10)
+    assert fair_share.allocate(4) == {'b': 2, 'c': 2}
+
+    fair_share.remove('c')
+    assert 'c' not in fair_share
+    assert fair_share.allocate(4) == {'a': 1, 'b': 3}
@@ -161,6 +161,13 @@ def ld_prune_profile_25(mt_path):
     hl.ld_prune(mt.GT)._force_count()
 
 
+@benchmark(args=profile_25.handle('mt'))
+def ld_entries_profile_25(mt_path):
+    mt = hl.read_matrix_table(mt_path)
+    mt = mt.filter_rows(hl.len(mt.alleles) == 2)
+    hl.ld_entries(mt.GT.n_alt_alleles(), mt.locus, radius=1000000, min_r2=0.2)._force_count()
+
+
 @benchmark(args=profile_25.handle('mt'))
 def pc_relate(mt_path):
     mt = hl.read_matrix_table(mt_path)
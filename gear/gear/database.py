@@ -6,9 +6,10 @@ import aiomysql
 import logging
 import functools
 import ssl
+import sys
 import traceback
 
-from gear.metrics import PrometheusSQLTimer
+from gear.metrics import PrometheusSQLTimer, SQL_QUERY_ROWS
 from hailtop.utils import sleep_and_backoff
 from hailtop.auth.sql_config import SQLConfig
 
@@ -22,6 +23,21 @@ log = logging.getLogger('gear.database')
 # 2013 - Lost connection to MySQL server during query ([Errno 104] Connection reset by peer)
 retry_codes = (1040, 1213, 2003, 2013)
 
+DEFAULT_FETCH_SIZE = 100
+
+
+def caller_query_name() -> str:
+    # name queries without an explicit name after the function that made them,
+    # skipping this module and comprehensions
+    frame = sys._getframe(1)
+    while frame is not None and (
+        frame.f_globals.get('__name__') == __name__ or frame.f_code.co_name.startswith('<')
+    ):
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    return f'{frame.f_globals.get("__name__")}.{frame.f_code.co_name}'
+
 
 def retry_transient_mysql_errors(f):
     @functools.wraps(f)
@@ -196,51 +212,73 @@ class Transaction:
         await aexit(self.conn_context_manager)
         self.conn_context_manager = None
 
-    async def just_execute(self, sql, args=None):
+    async def _execute(self, cursor, sql, args, query_name):
+        async with PrometheusSQLTimer(query_name):
+            return await cursor.execute(sql, args)
+
+    async def just_execute(self, sql, args=None, query_name=None):
         assert self.conn
+        if query_name is None:
+            query_name = caller_query_name()
         async with self.conn.cursor() as cursor:
-            await cursor.execute(sql, args)
+            await self._execute(cursor, sql, args, query_name)
+            SQL_QUERY_ROWS.labels(query_name=query_name).observe(max(cursor.rowcount, 0))
 
     async def execute_and_fetchone(self, sql, args=None, query_name=None):
         assert self.conn
+        if query_name is None:
+            query_name = caller_query_name()
         async with self.conn.cursor() as cursor:
-            if query_name is None:
-                await cursor.execute(sql, args)
-            else:
-                async with PrometheusSQLTimer(query_name):
-                    await cursor.execute(sql, args)
-            return await cursor.fetchone()
-
-    async def execute_and_fetchall(self, sql, args=None, query_name=None):
+            await self._execute(cursor, sql, args, query_name)
+            row = await cursor.fetchone()
+            SQL_QUERY_ROWS.labels(query_name=query_name).observe(0 if row is None else 1)
+            return row
+
+    async def execute_and_fetchall(self, sql, args=None, query_name=None, fetch_size=DEFAULT_FETCH_SIZE):
         assert self.conn
-        async with self.conn.cursor() as cursor:
-            if query_name is None:
-                await cursor.execute(sql, args)
-            else:
-                async with PrometheusSQLTimer(query_name):
-                    await cursor.execute(sql, args)
-            while True:
-                rows = await cursor.fetchmany(100)
-                if not rows:
-                    break
-                for row in rows:
-                    yield row
-
-    async def execute_insertone(self, sql, args=None):
+        if query_name is None:
+            query_name = caller_query_name()
+        n_rows = 0
+        try:
+            async with self.conn.cursor() as cursor:
+                await self._execute(cursor, sql, args, query_name)
+                while True:
+                    rows = await cursor.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        n_rows += 1
+                        yield row
+        finally:
+            SQL_QUERY_ROWS.labels(query_name=query_name).observe(n_rows)
+
+    async def execute_insertone(self, sql, args=None, query_name=None):
         assert self.conn
+        if query_name is None:
+            query_name = caller_query_name()
         async with self.conn.cursor() as cursor:
-            await cursor.execute(sql, args)
+            await self._execute(cursor, sql, args, query_name)
+            SQL_QUERY_ROWS.labels(query_name=query_name).observe(max(cursor.rowcount, 0))
             return cursor.lastrowid
 
-    async def execute_update(self, sql, args=None):
+    async def execute_update(self, sql, args=None, query_name=None):
         assert self.conn
+        if query_name is None:
+            query_name = caller_query_name()
         async with self.conn.cursor() as cursor:
-            return await cursor.execute(sql, args)
+            n_rows = await self._execute(cursor, sql, args, query_name)
+            SQL_QUERY_ROWS.labels(query_name=query_name).observe(max(n_rows, 0))
+            return n_rows
 
-    async def execute_many(self, sql, args_array):
+    async def execute_many(self, sql, args_array, query_name=None):
         assert self.conn
+        if query_name is None:
+            query_name = caller_query_name()
         async with self.conn.cursor() as cursor:
-            return await cursor.executemany(sql, args_array)
+            async with PrometheusSQLTimer(query_name):
+                n_rows = await cursor.executemany(sql, args_array)
+            SQL_QUERY_ROWS.labels(query_name=query_name).observe(max(n_rows or 0, 0))
+            return n_rows
 
 
 class CallError(Exception):
@@ -252,17 +290,26 @@ class CallError(Exception):
 class Database:
     def __init__(self):
         self.pool = None
+        self.read_replica_pool = None
 
-    async def async_init(self, config_file=None, maxsize=10):
+    async def async_init(self, config_file=None, maxsize=10, read_replica_config_file=None):
         self.pool = await create_database_pool(config_file=config_file, autocommit=False, maxsize=maxsize)
-
-    def start(self, read_only=False):
+        if read_replica_config_file is not None:
+            self.read_replica_pool = await create_database_pool(
+                config_file=read_replica_config_file, autocommit=False, maxsize=maxsize
+            )
+
+    def start(self, read_only=False, read_replica=False):
+        # reads from the replica may lag writes to the primary
+        if read_replica and self.read_replica_pool is not None:
+            assert read_only
+            return TransactionAsyncContextManager(self.read_replica_pool, read_only)
         return TransactionAsyncContextManager(self.pool, read_only)
 
     @retry_transient_mysql_errors
-    async def just_execute(self, sql, args=None):
+    async def just_execute(self, sql, args=None, query_name=None):
         async with self.start() as tx:
-            await tx.just_execute(sql, args)
+            await tx.just_execute(sql, args, query_name)
 
     @retry_transient_mysql_errors
     async def execute_and_fetchone(self, sql, args=None, query_name=None):
@@ -270,34 +317,36 @@ class Database:
             return await tx.execute_and_fetchone(sql, args, query_name)
 
     @retry_transient_mysql_errors
-    async def select_and_fetchone(self, sql, args=None, query_name=None):
-        async with self.start(read_only=True) as tx:
+    async def select_and_fetchone(self, sql, args=None, query_name=None, read_replica=False):
+        async with self.start(read_only=True, read_replica=read_replica) as tx:
             return await tx.execute_and_fetchone(sql, args, query_name)
 
-    async def execute_and_fetchall(self, sql, args=None, query_name=None):
+    async def execute_and_fetchall(self, sql, args=None, query_name=None, fetch_size=DEFAULT_FETCH_SIZE):
         async with self.start() as tx:
-            async for row in tx.execute_and_fetchall(sql, args, query_name):
+            async for row in tx.execute_and_fetchall(sql, args, query_name, fetch_size):
                 yield row
 
-    async def select_and_fetchall(self, sql, args=None, query_name=None):
-        async with self.start(read_only=True) as tx:
-            async for row in tx.execute_and_fetchall(sql, args, query_name):
+    async def select_and_fetchall(
+        self, sql, args=None, query_name=None, fetch_size=DEFAULT_FETCH_SIZE, read_replica=False
+    ):
+        async with self.start(read_only=True, read_replica=read_replica) as tx:
+            async for row in tx.execute_and_fetchall(sql, args, query_name, fetch_size):
                 yield row
 
     @retry_transient_mysql_errors
-    async def execute_insertone(self, sql, args=None):
+    async def execute_insertone(self, sql, args=None, query_name=None):
         async with self.start() as tx:
-            return await tx.execute_insertone(sql, args)
+            return await tx.execute_insertone(sql, args, query_name)
 
     @retry_transient_mysql_errors
-    async def execute_update(self, sql, args=None):
+    async def execute_update(self, sql, args=None, query_name=None):
         async with self.start() as tx:
-            return await tx.execute_update(sql, args)
+            return await tx.execute_update(sql, args, query_name)
 
     @retry_transient_mysql_errors
-    async def execute_many(self, sql, args_array):
+    async def execute_many(self, sql, args_array, query_name=None):
         async with self.start() as tx:
-            return await tx.execute_many(sql, args_array)
+            return await tx.execute_many(sql, args_array, query_name)
 
     @retry_transient_mysql_errors
     async def check_call_procedure(self, sql, args=None, query_name=None):
@@ -308,4 +357,8 @@ class Database:
 
     async def async_close(self):
         self.pool.close()
+        if self.read_replica_pool is not None:
+            self.read_replica_pool.close()
         await self.pool.wait_closed()
+        if self.read_replica_pool is not None:
+            await self.read_replica_pool.wait_closed()
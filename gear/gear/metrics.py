@@ -6,7 +6,13 @@ REQUEST_TIME = pc.Summary('http_request_latency_seconds', 'Endpoint latency in s
 REQUEST_COUNT = pc.Counter('http_request_count', 'Number of HTTP requests', ['endpoint', 'verb', 'status'])
 CONCURRENT_REQUESTS = pc.Gauge('http_concurrent_requests', 'Number of in progress HTTP requests', ['endpoint', 'verb'])
 SQL_QUERY_COUNT = pc.Counter('sql_query_count', 'Number of SQL Queries', ['query_name'])
-SQL_QUERY_LATENCY = pc.Summary('sql_query_latency_seconds', 'SQL Query latency in seconds', ['query_name'])
+SQL_QUERY_LATENCY = pc.Histogram('sql_query_latency_seconds', 'SQL Query latency in seconds', ['query_name'])
+SQL_QUERY_ROWS = pc.Histogram(
+    'sql_query_rows',
+    'Number of rows returned or affected by SQL Queries',
+    ['query_name'],
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000, float('inf')),
+)
 
 
 @web.middleware
@@ -3,6 +3,9 @@ from ..fs.fs import FS
 
 
 class Backend(abc.ABC):
+    # whether _encoded_literal is implemented
+    _supports_encoded_literals = False
+
     @abc.abstractmethod
     def stop(self):
         pass
@@ -103,3 +106,7 @@ class Backend(abc.ABC):
     @abc.abstractmethod
     def persist_ir(self, ir):
         pass
+
+    def _encoded_literal(self, dtype, encoding):
+        """IR for the value of type `dtype` whose binary encoding is `encoding`."""
+        raise NotImplementedError
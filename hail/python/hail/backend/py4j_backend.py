@@ -1,8 +1,11 @@
 import abc
+import collections
+import hashlib
 
 import py4j
 
 import hail
+from hail.ir import JavaIR
 from hail.ir.renderer import CSERenderer
 from hail.utils.java import FatalError, Env, HailUserError
 from .backend import Backend
@@ -38,11 +41,17 @@ def handle_java_exception(f):
 
 
 class Py4JBackend(Backend):
+    _supports_encoded_literals = True
+
+    # encoded literals kept alive on the JVM for reuse, by content hash
+    MAX_CACHED_ENCODED_LITERALS = 64
 
     @abc.abstractmethod
     def __init__(self):
         import base64
 
+        self._encoded_literals = collections.OrderedDict()
+
         def decode_bytearray(encoded):
             return base64.standard_b64decode(encoded)
 
@@ -78,6 +87,20 @@ class Py4JBackend(Backend):
             return_type._parsable_string(),
             jbody)
 
+    def _encoded_literal(self, dtype, encoding):
+        type_str = dtype._parsable_string()
+        key = hashlib.sha256(type_str.encode() + b'\0' + encoding).hexdigest()
+        jir = self._encoded_literals.get(key)
+        if jir is None:
+            stream_codec = '{"name":"StreamBufferSpec"}'
+            jir = self._jbackend.encodedLiteral(type_str, encoding, stream_codec)
+            self._encoded_literals[key] = jir
+            if len(self._encoded_literals) > Py4JBackend.MAX_CACHED_ENCODED_LITERALS:
+                self._encoded_literals.popitem(last=False)
+        else:
+            self._encoded_literals.move_to_end(key)
+        return JavaIR(jir)
+
     def execute(self, ir, timed=False):
         jir = self._to_java_value_ir(ir)
         stream_codec = '{"name":"StreamBufferSpec"}'
@@ -7,7 +7,7 @@ import pkg_resources
 from pyspark import SparkContext
 
 import hail
-from hail.genetics.reference_genome import ReferenceGenome
+from hail.genetics.reference_genome import ReferenceGenome, _ReferenceCache
 from hail.typecheck import nullable, typecheck, typecheck_method, enumeration, dictof
 from hail.utils import get_env_or_default
 from hail.utils.java import Env, FatalError, warning
@@ -70,10 +70,10 @@ class HailContext(object):
 
         Env._hc = self
 
-        ReferenceGenome._from_config(self._backend.get_reference('GRCh37'), True)
-        ReferenceGenome._from_config(self._backend.get_reference('GRCh38'), True)
-        ReferenceGenome._from_config(self._backend.get_reference('GRCm38'), True)
-        ReferenceGenome._from_config(self._backend.get_reference('CanFam3'), True)
+        reference_cache = _ReferenceCache.default()
+        for name in ['GRCh37', 'GRCh38', 'GRCm38', 'CanFam3']:
+            ReferenceGenome._from_config(
+                reference_cache.builtin_config(version(), name, self._backend.get_reference), True)
 
         if default_reference in ReferenceGenome._references:
             self._default_ref = ReferenceGenome._references[default_reference]
@@ -540,6 +540,10 @@ def get_reference(name) -> ReferenceGenome:
 
     If ``name='default'``, the value of :func:`.default_reference` is returned.
 
+    If ``HAIL_REFERENCE_CACHE_DIR`` is set, a reference created by
+    :meth:`.ReferenceGenome.from_fasta_file` in an earlier session is
+    registered again from the local reference cache.
+
     Parameters
     ----------
     name : :class:`str`
@@ -554,8 +558,9 @@ def get_reference(name) -> ReferenceGenome:
     Env.hc()
     if name == 'default':
         return default_reference()
-    else:
-        return ReferenceGenome._references[name]
+    if name not in ReferenceGenome._references:
+        ReferenceGenome._restore(name)
+    return ReferenceGenome._references[name]
 
 
 @typecheck(seed=int)
@@ -242,6 +242,10 @@ def literal(x: Any, dtype: Optional[Union[HailType, str]] = None):
     if dtype is None:
         dtype = impute_type(x)
 
+    encoded = _encoded_literal(x, dtype)
+    if encoded is not None:
+        return construct_expr(encoded, dtype)
+
     # Special handling of numpy. Have to extract from numpy scalars, do nothing on numpy arrays
     if isinstance(x, np.generic):
         x = x.item()
@@ -285,6 +289,32 @@ def literal(x: Any, dtype: Optional[Union[HailType, str]] = None):
         return construct_expr(ir.Literal(dtype, x), dtype)
 
 
+# literals smaller than this are cheap enough to render inline as JSON
+ENCODED_LITERAL_MIN_BYTES = 1 << 16
+
+
+def _encoded_literal(x, dtype) -> Optional[ir.IR]:
+    """Encode `x` in Hail's binary value encoding and hand it to the backend
+    out of band, so that the IR refers to it rather than embedding it as JSON.
+
+    Returns ``None`` if `x` is small, if the backend does not accept encoded
+    literals, or if `x` cannot be encoded (for instance because it contains
+    expressions or does not match `dtype`), in which case the caller builds
+    an ordinary :class:`.ir.Literal`.
+    """
+    if x is None or is_primitive(dtype) or isinstance(x, (np.generic, np.ndarray)):
+        return None
+    if Env._hc is None or not Env.backend()._supports_encoded_literals:
+        return None
+    try:
+        encoding = dtype._to_encoding(x)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    if len(encoding) < ENCODED_LITERAL_MIN_BYTES:
+        return None
+    return Env.backend()._encoded_literal(dtype, encoding)
+
+
 @deprecated(version="0.2.59", reason="Replaced by hl.if_else")
 @typecheck(condition=expr_bool, consequent=expr_any, alternate=expr_any, missing_false=bool)
 def cond(condition,
@@ -5687,7 +5717,7 @@ def liftover(x, dest_reference_genome, min_match=0.95, include_strand=False):
         method_name = "liftoverLocusInterval"
         rtype = tstruct(result=tinterval(tlocus(dest_reference_genome)), is_negative_strand=tbool)
 
-    if not rg.has_liftover(dest_reference_genome.name):
+    if not rg._restore_liftover(dest_reference_genome):
         raise TypeError("""Reference genome '{}' does not have liftover to '{}'.
         Use 'add_liftover' to load a liftover chain file.""".format(rg.name, dest_reference_genome.name))
 
@@ -17,6 +17,7 @@ from hail.utils.java import escape_parsable
 from hail.utils import frozendict
 from hail.utils.misc import lookup_bit
 from hail.utils.byte_reader import ByteReader
+from hail.utils.byte_writer import ByteWriter
 
 __all__ = [
     'dtype',
@@ -268,6 +269,14 @@ class HailType(object):
     def _from_encoding(self, encoding):
         return self._convert_from_encoding(ByteReader(memoryview(encoding)))
 
+    def _to_encoding(self, x) -> bytes:
+        byte_writer = ByteWriter()
+        self._convert_to_encoding(byte_writer, x)
+        return byte_writer.getvalue()
+
+    def _convert_to_encoding(self, byte_writer, x):
+        raise NotImplementedError
+
     def _convert_from_encoding(self, byte_reader):
         raise ValueError("Not implemented yet")
 
@@ -385,6 +394,10 @@ class _tint32(HailType):
     def to_numpy(self):
         return np.int32
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        byte_writer.write_int32(x)
+
     def _convert_from_encoding(self, byte_reader):
         return byte_reader.read_int32()
 
@@ -440,6 +453,10 @@ class _tint64(HailType):
     def to_numpy(self):
         return np.int64
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        byte_writer.write_int64(x)
+
     def _convert_from_encoding(self, byte_reader):
         return byte_reader.read_int64()
 
@@ -478,6 +495,10 @@ class _tfloat32(HailType):
         else:
             return str(x)
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        byte_writer.write_float32(x)
+
     def _convert_from_encoding(self, byte_reader):
         return byte_reader.read_float32()
 
@@ -540,6 +561,10 @@ class _tfloat64(HailType):
     def to_numpy(self):
         return np.float64
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        byte_writer.write_float64(x)
+
     def _convert_from_encoding(self, byte_reader):
         return byte_reader.read_float64()
 
@@ -578,6 +603,12 @@ class _tstr(HailType):
     def clear(self):
         pass
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        b = x.encode()
+        byte_writer.write_int32(len(b))
+        byte_writer.write_bytes(b)
+
     def _convert_from_encoding(self, byte_reader):
         length = byte_reader.read_int32()
         str_literal = byte_reader.read_bytes(length).decode()
@@ -622,6 +653,10 @@ class _tbool(HailType):
     def _byte_size(self):
         return 1
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        byte_writer.write_bool(x)
+
     def _convert_from_encoding(self, byte_reader):
         return byte_reader.read_bool()
 
@@ -839,6 +874,26 @@ class tarray(HailType):
     def _get_context(self):
         return self.element_type.get_context()
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        byte_writer.write_int32(len(x))
+        if self.element_type.__class__ in _numeric_types and not isinstance(x, str):
+            arr = np.asarray(x)
+            if arr.ndim == 1 and arr.dtype.kind in _numpy_kinds[self.element_type.__class__]:
+                # no missing elements, so the elements are laid out back to back
+                np_type = self.element_type.to_numpy()
+                if arr.dtype.kind in 'iu' and len(arr) > 0 and np.issubdtype(np_type, np.integer):
+                    info = np.iinfo(np_type)
+                    if arr.min() < info.min or arr.max() > info.max:
+                        raise TypeError(f"Value out of range for {self.element_type}")
+                byte_writer.write_missing_bits(np.zeros(len(arr), dtype=bool))
+                byte_writer.write_bytes(arr.astype(np_type, copy=False).tobytes())
+                return
+        byte_writer.write_missing_bits([v is None for v in x])
+        for v in x:
+            if v is not None:
+                self.element_type._convert_to_encoding(byte_writer, v)
+
     def _convert_from_encoding(self, byte_reader):
         length = byte_reader.read_int32()
 
@@ -988,6 +1043,12 @@ class tset(HailType):
     def _convert_to_json(self, x):
         return [self.element_type._convert_to_json_na(elt) for elt in x]
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        if not is_primitive(self.element_type):
+            raise NotImplementedError
+        self._array_repr._convert_to_encoding(byte_writer, sorted(x, key=_primitive_order_key))
+
     def _convert_from_encoding(self, byte_reader):
         return frozenset(self._array_repr._convert_from_encoding(byte_reader))
 
@@ -1096,6 +1157,13 @@ class tdict(HailType):
         return [{'key': self.key_type._convert_to_json(k),
                  'value': self.value_type._convert_to_json(v)} for k, v in x.items()]
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        if not is_primitive(self.key_type):
+            raise NotImplementedError
+        keys = sorted(x, key=_primitive_order_key)
+        self._array_repr._convert_to_encoding(byte_writer, [hl.utils.Struct(key=k, value=x[k]) for k in keys])
+
     def _convert_from_encoding(self, byte_reader):
         array_of_pairs = self._array_repr._convert_from_encoding(byte_reader)
         return frozendict({pair.key: pair.value for pair in array_of_pairs})
@@ -1259,6 +1327,14 @@ class tstruct(HailType, Mapping):
     def _convert_to_json(self, x):
         return {f: t._convert_to_json_na(x[f]) for f, t in self.items()}
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        values = [x[f] for f in self._fields]
+        byte_writer.write_missing_bits([v is None for v in values])
+        for t, v in zip(self.types, values):
+            if v is not None:
+                t._convert_to_encoding(byte_writer, v)
+
     def _convert_from_encoding(self, byte_reader):
         num_missing_bytes = math.ceil(len(self) / 8)
         missing_bytes = byte_reader.read_bytes_view(num_missing_bytes)
@@ -1534,6 +1610,13 @@ class ttuple(HailType, Sequence):
     def _convert_to_json(self, x):
         return [self.types[i]._convert_to_json_na(x[i]) for i in range(len(self.types))]
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        byte_writer.write_missing_bits([v is None for v in x])
+        for t, v in zip(self.types, x):
+            if v is not None:
+                t._convert_to_encoding(byte_writer, v)
+
     def _convert_from_encoding(self, byte_reader):
         num_missing_bytes = math.ceil(len(self) / 8)
         missing_bytes = byte_reader.read_bytes_view(num_missing_bytes)
@@ -1761,6 +1844,10 @@ class tlocus(HailType):
     def _convert_to_json(self, x):
         return {'contig': x.contig, 'position': x.position}
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        tlocus.struct_repr._convert_to_encoding(byte_writer, hl.utils.Struct(contig=x.contig, pos=x.position))
+
     def _convert_from_encoding(self, byte_reader):
         as_struct = tlocus.struct_repr._convert_from_encoding(byte_reader)
         return genetics.Locus(as_struct.contig, as_struct.pos, self.reference_genome)
@@ -1854,6 +1941,12 @@ class tinterval(HailType):
                 'includeStart': x.includes_start,
                 'includeEnd': x.includes_end}
 
+    def _convert_to_encoding(self, byte_writer, x):
+        self._typecheck_one_level(x)
+        self._struct_repr._convert_to_encoding(
+            byte_writer,
+            hl.utils.Struct(start=x.start, end=x.end, includes_start=x.includes_start, includes_end=x.includes_end))
+
     def _convert_from_encoding(self, byte_reader):
         interval_as_struct = self._struct_repr._convert_from_encoding(byte_reader)
         return hl.Interval(interval_as_struct.start, interval_as_struct.end, interval_as_struct.includes_start, interval_as_struct.includes_end, point_type=self.point_type)
@@ -1990,6 +2083,8 @@ hts_entry_schema = tstruct(GT=tcall, AD=tarray(tint32), DP=tint32, GQ=tint32, PL
 
 _numeric_types = {_tbool, _tint32, _tint64, _tfloat32, _tfloat64}
 _primitive_types = _numeric_types.union({_tstr})
+# NumPy array kinds that encode as a numeric type without loss
+_numpy_kinds = {_tbool: 'b', _tint32: 'iu', _tint64: 'iu', _tfloat32: 'iuf', _tfloat64: 'iuf'}
 _interned_types = _primitive_types.union({_tcall})
 
 
@@ -2003,6 +2098,15 @@ def is_primitive(t) -> bool:
     return t.__class__ in _primitive_types
 
 
+def _primitive_order_key(x):
+    # Hail orders NaN after all other numbers, and missing values last
+    if x is None:
+        return (2, 0)
+    if x != x:
+        return (1, 0)
+    return (0, x)
+
+
 @typecheck(t=HailType)
 def is_container(t) -> bool:
     return (isinstance(t, tarray)
@@ -1,5 +1,7 @@
 import json
+import os
 import re
+import numpy as np
 from hail.typecheck import typecheck_method, sequenceof, dictof, oneof, \
     sized_tupleof, nullable, transformed, lazy
 from hail.utils.misc import wrap_to_list
@@ -10,6 +12,74 @@ rg_type = lazy()
 reference_genome_type = oneof(transformed((str, lambda x: hl.get_reference(x))), rg_type)
 
 
+class _ReferenceCache:
+    """Local, persistent record of reference genome configurations and
+    liftover registrations, so that later sessions need not fetch or rebuild
+    them.
+
+    The cache is disabled unless ``HAIL_REFERENCE_CACHE_DIR`` names the
+    directory to keep it in. Failures to read or write the cache are ignored.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @staticmethod
+    def default():
+        return _ReferenceCache(os.environ.get('HAIL_REFERENCE_CACHE_DIR') or None)
+
+    def _read(self, *path):
+        if self.directory is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, *path)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, obj, *path):
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, *path)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write then rename, so concurrent sessions never read a partial file
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(obj, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def builtin_config(self, version, name, fetch):
+        """The configuration of built-in reference `name`, fetched from the
+        backend once per Hail version."""
+        config = self._read('builtin', version, f'{name}.json')
+        if config is None:
+            config = fetch(name)
+            self._write(config, 'builtin', version, f'{name}.json')
+        return config
+
+    def reference(self, name):
+        return self._read('custom', f'{name}.json')
+
+    def put_reference(self, name, config, sequence_files):
+        self._write({'config': config, 'sequence_files': sequence_files}, 'custom', f'{name}.json')
+
+    def liftovers(self, name):
+        return self._read('liftovers', f'{name}.json') or {}
+
+    def put_liftover(self, name, dest, chain_file):
+        liftovers = self.liftovers(name)
+        liftovers[dest] = chain_file
+        self._write(liftovers, 'liftovers', f'{name}.json')
+
+    def remove_liftover(self, name, dest):
+        liftovers = self.liftovers(name)
+        if liftovers.pop(dest, None) is not None:
+            self._write(liftovers, 'liftovers', f'{name}.json')
+
+
 class ReferenceGenome(object):
     """An object that represents a `reference genome <https://en.wikipedia.org/wiki/Reference_genome>`__.
 
@@ -114,6 +184,7 @@ class ReferenceGenome(object):
         self._par_tuple = par
         self._par = [hl.Interval(hl.Locus(c, s, self), hl.Locus(c, e, self)) for (c, s, e) in par]
         self._global_positions = None
+        self._contig_arrays = None
 
         ReferenceGenome._references[name] = self
 
@@ -249,6 +320,39 @@ class ReferenceGenome(object):
     def _contig_global_position(self, contig):
         return self.global_positions_dict[contig]
 
+    def _contig_offsets_and_index(self):
+        if self._contig_arrays is None:
+            lengths = np.array([self._lengths[c] for c in self.contigs], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+            self._contig_arrays = (offsets, {c: i for i, c in enumerate(self.contigs)})
+        return self._contig_arrays
+
+    def _contig_indices(self, contigs) -> np.ndarray:
+        """Indices in :attr:`contigs` of each element of the array-like `contigs`."""
+        _, index = self._contig_offsets_and_index()
+        # look up each distinct contig once
+        distinct, inverse = np.unique(np.asarray(contigs, dtype=object).astype(str), return_inverse=True)
+        try:
+            distinct_indices = np.array([index[c] for c in distinct], dtype=np.int64)
+        except KeyError as e:
+            raise KeyError(f"Contig `{e.args[0]}' is not in reference genome.") from None
+        return distinct_indices[inverse]
+
+    def _global_positions_array(self, contigs, positions) -> np.ndarray:
+        """Global positions of the loci with the given array-likes of contigs
+        and positions, as in :meth:`.LocusExpression.global_position`."""
+        offsets, _ = self._contig_offsets_and_index()
+        return offsets[self._contig_indices(contigs)] + np.asarray(positions, dtype=np.int64) - 1
+
+    def _loci_from_global_positions_array(self, global_positions):
+        """Contigs and positions of the loci at the given array-like of global
+        positions, as in :func:`.locus_from_global_position`."""
+        offsets, _ = self._contig_offsets_and_index()
+        global_positions = np.asarray(global_positions, dtype=np.int64)
+        indices = np.searchsorted(offsets, global_positions, side='right') - 1
+        contigs = np.array(self.contigs, dtype=object)[indices]
+        return contigs, global_positions - offsets[indices] + 1
+
     @classmethod
     @typecheck_method(path=str)
     def read(cls, path):
@@ -400,6 +504,14 @@ class ReferenceGenome(object):
                         x_contigs=[], y_contigs=[], mt_contigs=[], par=[]):
         """Create reference genome from a FASTA file.
 
+        Notes
+        -----
+        If the environment variable ``HAIL_REFERENCE_CACHE_DIR`` is set, the
+        resulting configuration is recorded in a local cache in that
+        directory. In later sessions, :func:`.get_reference` with `name`
+        registers it, and its sequence, from the cache without calling this
+        method again.
+
         Parameters
         ----------
         name: :class:`str`
@@ -424,10 +536,37 @@ class ReferenceGenome(object):
         par_strings = ["{}:{}-{}".format(contig, start, end) for (contig, start, end) in par]
         Env.backend().from_fasta_file(name, fasta_file, index_file, x_contigs, y_contigs, mt_contigs, par_strings)
 
-        rg = ReferenceGenome._from_config(Env.backend().get_reference(name), _builtin=True)
+        config = Env.backend().get_reference(name)
+        rg = ReferenceGenome._from_config(config, _builtin=True)
         rg._sequence_files = (fasta_file, index_file)
+        _ReferenceCache.default().put_reference(name, config, [fasta_file, index_file])
         return rg
 
+    @classmethod
+    def _restore(cls, name):
+        """Register reference `name` from the reference cache, if a previous
+        session created it with :meth:`from_fasta_file`. Returns ``None`` if
+        it is not cached."""
+        cached = _ReferenceCache.default().reference(name)
+        if cached is None:
+            return None
+        sequence_files = cached['sequence_files']
+        if sequence_files is not None and not all(hl.hadoop_exists(f) for f in sequence_files):
+            return None
+        rg = ReferenceGenome._from_config(cached['config'])
+        if sequence_files is not None:
+            rg.add_sequence(*sequence_files)
+        return rg
+
+    def _restore_liftover(self, dest_reference_genome):
+        """Register the liftover to `dest_reference_genome` recorded by a
+        previous session, if any. Returns whether a liftover is registered."""
+        if dest_reference_genome.name not in self._liftovers:
+            chain_file = _ReferenceCache.default().liftovers(self.name).get(dest_reference_genome.name)
+            if chain_file is not None and hl.hadoop_exists(chain_file):
+                self.add_liftover(chain_file, dest_reference_genome)
+        return self.has_liftover(dest_reference_genome)
+
     @typecheck_method(dest_reference_genome=reference_genome_type)
     def has_liftover(self, dest_reference_genome):
         """``True`` if a liftover chain file is available from this reference
@@ -454,6 +593,7 @@ class ReferenceGenome(object):
         if dest_reference_genome.name in self._liftovers:
             del self._liftovers[dest_reference_genome.name]
             Env.backend().remove_liftover(self.name, dest_reference_genome.name)
+        _ReferenceCache.default().remove_liftover(self.name, dest_reference_genome.name)
 
     @typecheck_method(chain_file=str,
                       dest_reference_genome=reference_genome_type)
@@ -476,6 +616,12 @@ class ReferenceGenome(object):
         This method can only be run once per reference genome. Use
         :meth:`~has_liftover` to test whether a chain file has been registered.
 
+        If the environment variable ``HAIL_REFERENCE_CACHE_DIR`` is set, the
+        registration is recorded in a local cache in that directory, and later
+        sessions register the same chain file on first use by
+        :func:`.liftover`, without calling this method again, as long as the
+        chain file still exists. Use :meth:`remove_liftover` to forget it.
+
         The chain file format is described
         `here <https://genome.ucsc.edu/goldenpath/help/chain.html>`__.
 
@@ -503,6 +649,7 @@ class ReferenceGenome(object):
         if dest_reference_genome.name in self._liftovers:
             raise KeyError(f"Liftover already exists from {self.name} to {dest_reference_genome.name}.")
         self._liftovers[dest_reference_genome.name] = chain_file
+        _ReferenceCache.default().put_liftover(self.name, dest_reference_genome.name, chain_file)
 
 
 rg_type.set(ReferenceGenome)
@@ -5,6 +5,7 @@ from pprint import pprint
 from collections import defaultdict
 
 import hail as hl
+from hail.plot.batch import batched
 
 from .coord_cartesian import CoordCartesian
 from .geoms import Geom, FigureAttribute
@@ -120,21 +121,17 @@ class GGPlot:
         def make_geom_label(geom_idx):
             return f"geom{geom_idx}"
 
-        def select_table():
-            fields_to_select = {"figure_mapping": hl.struct(**self.aes)}
-            for geom_idx, geom in enumerate(self.geoms):
-                geom_label = make_geom_label(geom_idx)
-                fields_to_select[geom_label] = hl.struct(**geom.aes.properties)
-
-            return self.ht.select(**fields_to_select)
+        # aggregate over self.ht itself, rather than a selection of it, so
+        # that plots of the same table can share a pass in a PlotBatch
+        aggregate = batched(self.ht.aggregate)
 
-        def collect_mappings_and_precomputed(selected):
+        def collect_mappings_and_precomputed():
             mapping_per_geom = []
             precomputes = {}
             for geom_idx, geom in enumerate(self.geoms):
                 geom_label = make_geom_label(geom_idx)
 
-                combined_mapping = selected["figure_mapping"].annotate(**selected[geom_label])
+                combined_mapping = hl.struct(**self.aes).annotate(**geom.aes.properties)
 
                 for key in combined_mapping:
                     if key in self.scales:
@@ -146,13 +143,13 @@ class GGPlot:
             should_precompute = any([len(precompute) > 0 for precompute in precomputes.values()])
 
             if should_precompute:
-                precomputed = selected.aggregate(hl.struct(**precomputes))
+                precomputed = aggregate(hl.struct(**precomputes))
             else:
                 precomputed = hl.Struct(**{key: hl.Struct() for key in precomputes.keys()})
 
             return mapping_per_geom, precomputed
 
-        def get_aggregation_result(selected, mapping_per_geom, precomputed):
+        def get_aggregation_result(mapping_per_geom, precomputed):
             aggregators = {}
             labels_to_stats = {}
             for geom_idx, combined_mapping in enumerate(mapping_per_geom):
@@ -162,12 +159,11 @@ class GGPlot:
                 aggregators[geom_label] = agg
                 labels_to_stats[geom_label] = stat
 
-            return labels_to_stats, selected.aggregate(hl.struct(**aggregators))
+            return labels_to_stats, aggregate(hl.struct(**aggregators))
 
         self.verify_scales()
-        selected = select_table()
-        mapping_per_geom, precomputed = collect_mappings_and_precomputed(selected)
-        labels_to_stats, aggregated = get_aggregation_result(selected, mapping_per_geom, precomputed)
+        mapping_per_geom, precomputed = collect_mappings_and_precomputed()
+        labels_to_stats, aggregated = get_aggregation_result(mapping_per_geom, precomputed)
 
         fig = go.Figure()
 
@@ -16,6 +16,7 @@ from .statgen import (skat, impute_sex, genetic_relatedness_matrix, realized_rel
 from .qc import sample_qc, variant_qc, vep, concordance, nirvana, summarize_variants
 from .misc import rename_duplicates, maximal_independent_set, segment_intervals, filter_intervals
 from .relatedness import identity_by_descent, king, pc_relate
+from .ld import ld_entries
 
 __all__ = ['trio_matrix',
            'linear_mixed_model',
@@ -82,5 +83,6 @@ __all__ = ['trio_matrix',
            'summarize_variants',
            'row_correlation',
            'ld_matrix',
+           'ld_entries',
            'king'
            ]
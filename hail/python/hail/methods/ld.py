@@ -0,0 +1,72 @@
+import hail as hl
+from hail.expr import expr_float64, expr_locus, matrix_table_source, check_entry_indexed, check_row_indexed
+from hail.table import Table
+from hail.typecheck import typecheck, numeric
+
+from .statgen import ld_matrix
+
+
+@typecheck(entry_expr=expr_float64,
+           locus_expr=expr_locus(),
+           radius=int,
+           min_r2=numeric)
+def ld_entries(entry_expr, locus_expr, radius, min_r2=0.0) -> Table:
+    """Computes the windowed correlation (linkage disequilibrium) between
+    variants as a table of non-zero entries.
+
+    Examples
+    --------
+    Compute the correlation between pairs of variants within one megabase
+    whose squared correlation is at least 0.2:
+
+    >>> ld = hl.ld_entries(dataset.GT.n_alt_alleles(), dataset.locus, radius=1000000, min_r2=0.2)
+
+    Notes
+    -----
+    This method is a convenience wrapper around :func:`.ld_matrix`: it takes
+    the upper triangle of the windowed correlation matrix, including the
+    diagonal, with :meth:`.BlockMatrix.sparsify_triangle`, converts it to a
+    table with :meth:`.BlockMatrix.entries`, and filters the result. It does
+    no less work than :func:`.ld_matrix`.
+
+    Variants are 0-indexed by their order in the matrix table. The result has
+    a row for each pair of variants :math:`i \\leq j` on the same contig and
+    within `radius` base pairs (inclusive) whose correlation is non-zero and
+    whose squared correlation is at least `min_r2`, with fields `i`, `j`, and
+    `entry`, the Pearson correlation coefficient. Missing values are
+    mean-imputed within variant. Pairs involving a variant with a constant
+    value are omitted.
+
+    `entry_expr` and `locus_expr` must be expressions of the same matrix
+    table, whose loci must be in ascending order.
+
+    Parameters
+    ----------
+    entry_expr : :class:`.Float64Expression`
+        Entry-indexed numeric expression on matrix table.
+    locus_expr : :class:`.LocusExpression`
+        Row-indexed locus expression on the same matrix table.
+    radius: :obj:`int`
+        Radius of window in base pairs.
+    min_r2: :obj:`float`
+        Entries whose squared correlation is smaller are omitted.
+
+    Returns
+    -------
+    :class:`.Table`
+        Table of windowed correlations, with fields `i`, `j`, and `entry`.
+    """
+    if radius < 0:
+        raise ValueError(f'radius must be non-negative, found {radius}')
+
+    check_entry_indexed('ld_entries/entry_expr', entry_expr)
+    check_row_indexed('ld_entries/locus_expr', locus_expr)
+    mt = matrix_table_source('ld_entries/entry_expr', entry_expr)
+    if locus_expr._indices.source is not mt:
+        raise ValueError("'ld_entries': 'entry_expr' and 'locus_expr' must be expressions of the same MatrixTable")
+
+    entries = ld_matrix(entry_expr, locus_expr, radius).sparsify_triangle().entries(keyed=False)
+    # the blocks that intersect the window hold zeros for the pairs outside it
+    return entries.filter(~hl.is_nan(entries.entry)
+                          & (entries.entry != 0)
+                          & (entries.entry ** 2 >= min_r2))
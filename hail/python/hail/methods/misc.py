@@ -7,10 +7,10 @@ from hail.expr import Expression, \
 from hail.expr.types import ttuple, tlocus, tarray, tstr, tstruct
 from hail.matrixtable import MatrixTable
 from hail.table import Table
-from hail.typecheck import typecheck, nullable, func_spec, oneof
+from hail.typecheck import typecheck, nullable, func_spec, oneof, enumeration
 from hail.utils import Interval, Struct, new_temp_file, deduplicate
 from hail.utils.misc import plural
-from hail.utils.java import Env, info
+from hail.utils.java import Env, info, warning
 from hail import ir
 
 
@@ -18,8 +18,9 @@ from hail import ir
            j=Expression,
            keep=bool,
            tie_breaker=nullable(func_spec(2, expr_numeric)),
-           keyed=bool)
-def maximal_independent_set(i, j, keep=True, tie_breaker=None, keyed=True) -> Table:
+           keyed=bool,
+           method=enumeration('local', 'distributed'))
+def maximal_independent_set(i, j, keep=True, tie_breaker=None, keyed=True, method='local') -> Table:
     """Return a table containing the vertices in a near
     `maximal independent set <https://en.wikipedia.org/wiki/Maximal_independent_set>`_
     of an undirected graph whose edges are given by a two-column table.
@@ -97,6 +98,17 @@ def maximal_independent_set(i, j, keep=True, tie_breaker=None, keyed=True) -> Ta
     If `keyed` is ``False``, then a node may appear twice in the resulting
     table.
 
+    With ``method='local'``, the edges are collected and the greedy algorithm
+    runs on the driver, so the graph must fit in driver memory. With
+    ``method='distributed'``, the graph never leaves the cluster. Vertices are
+    first replaced by integer indices. Then, in each round, every vertex whose
+    degree is higher than that of each of its neighbors (ordering equal
+    degrees by `tie_breaker`, then by a random priority) is removed, together
+    with its edges, until no edges remain. This removes the same kinds of vertices as
+    the local algorithm, several at a time, so the two may return different,
+    equally valid sets. Each round writes the remaining edges to a temporary
+    file. The result is always keyed by `node`.
+
     Parameters
     ----------
     i : :class:`.Expression`
@@ -110,6 +122,9 @@ def maximal_independent_set(i, j, keep=True, tie_breaker=None, keyed=True) -> Ta
     keyed : :obj:`bool`
         If ``True``, key the resulting table by the `node` field, this requires
         a sort.
+    method : :class:`str`
+        ``'local'`` to run the greedy algorithm on the driver, or
+        ``'distributed'`` to run it on the cluster in rounds.
 
     Returns
     -------
@@ -135,6 +150,10 @@ def maximal_independent_set(i, j, keep=True, tie_breaker=None, keyed=True) -> Ta
 
     node_t = i.dtype
 
+    if method == 'distributed':
+        t, _ = source._process_joins(i, j)
+        return _maximal_independent_set_distributed(t.select(__i=i, __j=j), keep, tie_breaker)
+
     if tie_breaker:
         wrapped_node_t = ttuple(node_t)
         left = construct_variable('l', wrapped_node_t)
@@ -168,6 +187,79 @@ def maximal_independent_set(i, j, keep=True, tie_breaker=None, keyed=True) -> Ta
     return nodes
 
 
+def _maximal_independent_set_distributed(edges: Table, keep: bool, tie_breaker) -> Table:
+    edges = edges.key_by().select('__i', '__j')
+    edges = edges.checkpoint(new_temp_file('maximal_independent_set', 'ht'))
+
+    nodes = edges.select(node=[edges.__i, edges.__j]).explode('node')
+    nodes = nodes.key_by('node').distinct().add_index('__idx')
+    # random priorities break the remaining ties, so that, as in Luby's
+    # algorithm, a constant fraction of a run of tied vertices goes each round
+    nodes = nodes.annotate(__priority=hl.rand_unif(0, 1, seed=0))
+    nodes = nodes.checkpoint(new_temp_file('maximal_independent_set', 'ht'))
+    node_idx = nodes.key_by('__idx')
+
+    # compact, integer-indexed edges, each stored once with __i < __j
+    idx_i = nodes[edges.__i].__idx
+    idx_j = nodes[edges.__j].__idx
+    edges = edges.select(__i=hl.min(idx_i, idx_j), __j=hl.max(idx_i, idx_j))
+    edges = edges.key_by('__i', '__j').distinct()
+    edges = edges.annotate(__priority_i=node_idx[edges.__i].__priority,
+                           __priority_j=node_idx[edges.__j].__priority)
+
+    # vertices with self-edges are not independent of themselves
+    self_edges = edges.filter(edges.__i == edges.__j)
+    self_edges = self_edges.key_by().select(__idx=self_edges.__i).key_by('__idx')
+    removed = [self_edges.checkpoint(new_temp_file('maximal_independent_set', 'ht'))]
+    edges = edges.filter(hl.is_defined(removed[0][edges.__i]) | hl.is_defined(removed[0][edges.__j]), keep=False)
+    edges = edges.checkpoint(new_temp_file('maximal_independent_set', 'ht'))
+
+    n_rounds = 0
+    n_edges = edges.count()
+    use_tie_breaker = tie_breaker is not None
+    while n_edges > 0:
+        n_rounds += 1
+        endpoints = edges.select(__idx=[edges.__i, edges.__j]).explode('__idx')
+        degree = endpoints.group_by('__idx').aggregate(degree=hl.agg.count())
+
+        deg_i = degree[edges.__i].degree
+        deg_j = degree[edges.__j].degree
+        if not use_tie_breaker:
+            tie = hl.float64(0)
+        else:
+            tie = hl.float64(tie_breaker(node_idx[edges.__i].node, node_idx[edges.__j].node))
+        # the endpoint that greedy would remove first, were this the only edge
+        i_first = ((deg_i > deg_j)
+                   | ((deg_i == deg_j) & ((tie > 0) | ((tie == 0) & (edges.__priority_i > edges.__priority_j)))))
+        votes = edges.select(__votes=[hl.struct(__idx=edges.__i, first=i_first),
+                                      hl.struct(__idx=edges.__j, first=~i_first)])
+        votes = votes.explode('__votes')
+        votes = votes.select(**votes.__votes)
+        round_removed = votes.group_by('__idx').aggregate(first=hl.agg.all(votes.first))
+        round_removed = round_removed.filter(round_removed.first).select()
+        round_removed = round_removed.checkpoint(new_temp_file('maximal_independent_set', 'ht'))
+        removed.append(round_removed)
+
+        edges = edges.filter(hl.is_defined(round_removed[edges.__i]) | hl.is_defined(round_removed[edges.__j]),
+                             keep=False)
+        edges = edges.checkpoint(new_temp_file('maximal_independent_set', 'ht'))
+        previous_n_edges, n_edges = n_edges, edges.count()
+        info(f'maximal_independent_set: round {n_rounds}, {n_edges} {plural("edge", n_edges)} remaining')
+        if n_edges >= previous_n_edges:
+            # only an inconsistent tie_breaker can order a cycle so that no
+            # vertex comes first on all its edges; without it, the order by
+            # degree, priority, and then index is total, so every round makes
+            # progress
+            assert use_tie_breaker
+            warning('maximal_independent_set: tie_breaker is not a consistent order, '
+                    'breaking remaining ties by node order')
+            use_tie_breaker = False
+
+    removed = removed[0].union(*removed[1:])
+    nodes = nodes.filter(hl.is_defined(removed[nodes.__idx]), keep=not keep)
+    return nodes.select()
+
+
 def require_col_key_str(dataset: MatrixTable, method: str):
     if not len(dataset.col_key) == 1 or dataset[next(iter(dataset.col_key))].dtype != hl.tstr:
         raise ValueError(f"Method '{method}' requires column key to be one field of type 'str', found "
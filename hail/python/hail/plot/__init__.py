@@ -1,6 +1,8 @@
+from .batch import PlotBatch
 from .plots import output_notebook, show, histogram, cumulative_histogram, histogram2d, scatter, joint_plot, qq, manhattan, smoothed_pdf, pdf, cdf, set_font_size, visualize_missingness
 
-__all__ = ['output_notebook',
+__all__ = ['PlotBatch',
+           'output_notebook',
            'show',
            'histogram',
            'cumulative_histogram',
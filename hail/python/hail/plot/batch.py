@@ -0,0 +1,142 @@
+import functools
+
+import hail
+from hail.expr.expressions import to_expr
+
+_active_plot = None
+
+
+class _PendingAggregation(Exception):
+    """Raised inside a plot run by a :class:`PlotBatch` when the plot needs an
+    aggregation result that has not been computed yet."""
+
+
+def aggregate(agg_method, expr):
+    """Evaluate the aggregation `expr` with `agg_method`, a bound aggregation
+    method such as :meth:`.Table.aggregate` or
+    :meth:`.MatrixTable.aggregate_entries`.
+
+    Outside a :class:`PlotBatch` this is ``agg_method(expr)``.
+    """
+    if _active_plot is None:
+        return agg_method(expr)
+    return _active_plot.aggregate(agg_method, expr)
+
+
+def batched(agg_method):
+    """`agg_method`, deferred when called inside a :class:`PlotBatch`."""
+    return functools.partial(aggregate, agg_method)
+
+
+class _PlotRun:
+    def __init__(self, f, args, kwargs):
+        self.f = f
+        self.args = args
+        self.kwargs = kwargs
+        self.results = []
+        self.request = None
+        self.figure = None
+        self._n_requested = 0
+
+    def aggregate(self, agg_method, expr):
+        i = self._n_requested
+        self._n_requested += 1
+        if i < len(self.results):
+            return self.results[i]
+        self.request = (agg_method, expr)
+        raise _PendingAggregation()
+
+    def run(self) -> bool:
+        """Run the plot function, returning ``True`` if it finished."""
+        global _active_plot
+        self._n_requested = 0
+        self.request = None
+        _active_plot = self
+        try:
+            self.figure = self.f(*self.args, **self.kwargs)
+            return True
+        except _PendingAggregation:
+            return False
+        finally:
+            _active_plot = None
+
+
+class PlotBatch:
+    """Build several plots while scanning their data together.
+
+    Examples
+    --------
+
+    >>> with hl.plot.PlotBatch() as batch:  # doctest: +SKIP
+    ...     batch.add(hl.plot.histogram, mt.DP, range=(0, 100))
+    ...     batch.add(hl.plot.histogram, mt.GQ, range=(0, 100))
+    ...     batch.add(hl.plot.scatter, mt.x, mt.y)
+    >>> p_dp, p_gq, p_xy = batch.figures  # doctest: +SKIP
+
+    Notes
+    -----
+    Plots are built when the ``with`` block exits, or when :meth:`run` is
+    called. Instead of scanning its source once per plot, the batch runs the
+    aggregations that all plots need from the same source as a single
+    aggregation. Plots whose aggregations depend on earlier results, such as
+    :func:`.histogram` without a `range`, take one more pass, shared with every
+    other plot at the same depth.
+
+    Only work that plots do through their aggregations is shared; other
+    queries a plot makes run once per pass.
+    """
+
+    def __init__(self):
+        self._runs = []
+        self._figures = None
+
+    def add(self, plot_f, *args, **kwargs) -> int:
+        """Add a plot, returning its index in :attr:`figures`.
+
+        Parameters
+        ----------
+        plot_f : callable
+            Function that builds the plot, for example :func:`.histogram` or
+            the ``to_plotly`` method of a :func:`.ggplot`.
+        args, kwargs
+            Arguments to `plot_f`.
+        """
+        self._runs.append(_PlotRun(plot_f, args, kwargs))
+        self._figures = None
+        return len(self._runs) - 1
+
+    def run(self):
+        """Build all plots added so far, returning their figures in order."""
+        pending = [r for r in self._runs if r.figure is None]
+        while pending:
+            pending = [r for r in pending if not r.run()]
+
+            groups = {}
+            for r in pending:
+                agg_method, expr = r.request
+                key = (id(agg_method.__self__), agg_method.__func__)
+                if key not in groups:
+                    groups[key] = (agg_method, [])
+                groups[key][1].append((r, expr))
+
+            for agg_method, requests in groups.values():
+                results = agg_method(hail.tuple([to_expr(expr) for _, expr in requests]))
+                for (r, _), result in zip(requests, results):
+                    r.results.append(result)
+
+        self._figures = [r.figure for r in self._runs]
+        return self._figures
+
+    @property
+    def figures(self):
+        """The figures of the plots, in the order they were added."""
+        if self._figures is None:
+            raise ValueError('PlotBatch: plots have not been built yet, call run')
+        return self._figures
+
+    def __enter__(self) -> 'PlotBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.run()
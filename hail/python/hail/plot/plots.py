@@ -23,6 +23,7 @@ from hail.typecheck import typecheck, oneof, nullable, sized_tupleof, numeric, \
 from hail import Table
 from hail.utils.struct import Struct
 from hail.utils.java import warning
+from .batch import batched
 from typing import List, Tuple, Dict, Union
 import hail
 
@@ -81,7 +82,7 @@ def cdf(data, k=350, legend=None, title=None, normalize=True, log=False):
     if isinstance(data, Expression):
         if data._indices is None:
             return ValueError('Invalid input')
-        agg_f = data._aggregation_method()
+        agg_f = batched(data._aggregation_method())
         data = agg_f(aggregators.approx_cdf(data, k))
 
     if legend is None:
@@ -155,7 +156,7 @@ def pdf(data, k=1000, confidence=5, legend=None, title=None, log=False, interact
     if isinstance(data, Expression):
         if data._indices is None:
             return ValueError('Invalid input')
-        agg_f = data._aggregation_method()
+        agg_f = batched(data._aggregation_method())
         data = agg_f(aggregators.approx_cdf(data, k))
 
     if legend is None:
@@ -314,7 +315,7 @@ def smoothed_pdf(data, k=350, smoothing=.5, legend=None, title=None, log=False,
     if isinstance(data, Expression):
         if data._indices is None:
             return ValueError('Invalid input')
-        agg_f = data._aggregation_method()
+        agg_f = batched(data._aggregation_method())
         data = agg_f(aggregators.approx_cdf(data, k))
 
     if legend is None:
@@ -403,7 +404,7 @@ def histogram(data, range=None, bins=50, legend=None, title=None, log=False, int
         if data._indices.source is not None:
             if interactive:
                 raise ValueError("'interactive' flag can only be used on data from 'approx_cdf'.")
-            agg_f = data._aggregation_method()
+            agg_f = batched(data._aggregation_method())
             if range is not None:
                 start = range[0]
                 end = range[1]
@@ -520,7 +521,7 @@ def cumulative_histogram(data, range=None, bins=50, legend=None, title=None, nor
     """
     if isinstance(data, Expression):
         if data._indices.source is not None:
-            agg_f = data._aggregation_method()
+            agg_f = batched(data._aggregation_method())
             if range is not None:
                 start = range[0]
                 end = range[1]
@@ -704,8 +705,8 @@ def _generate_hist2d_data(x, y, bins, range):
         x_range, y_range = range
     if x_range is None or y_range is None:
         warning('At least one range was not defined in histogram_2d. Doing two passes...')
-        ranges = source.aggregate(hail.struct(x_stats=hail.agg.stats(x),
-                                              y_stats=hail.agg.stats(y)))
+        ranges = batched(source.aggregate)(hail.struct(x_stats=hail.agg.stats(x),
+                                                       y_stats=hail.agg.stats(y)))
         if x_range is None:
             x_range = (ranges.x_stats.min, ranges.x_stats.max)
         if y_range is None:
@@ -747,7 +748,8 @@ def _collect_scatter_plot_data(
 
     if n_divisions is None:
         collect_expr = hail.struct(**dict((k, v) for k, v in (x, y)), **expressions)
-        plot_data = [point for point in collect_expr.collect() if point[x[0]] is not None and point[y[0]] is not None]
+        agg_f = batched(x[1]._aggregation_method())
+        plot_data = [point for point in agg_f(hail.agg.collect(collect_expr)) if point[x[0]] is not None and point[y[0]] is not None]
         source_pd = pd.DataFrame(plot_data)
     else:
         # FIXME: remove the type conversion logic if/when downsample supports continuous values for labels
@@ -760,7 +762,7 @@ def _collect_scatter_plot_data(
         # Cast non-string types to string
         expressions = {k: hail.str(v) if not isinstance(v, StringExpression) else v for k, v in expressions.items()}
 
-        agg_f = x[1]._aggregation_method()
+        agg_f = batched(x[1]._aggregation_method())
         res = agg_f(hail.agg.downsample(x[1], y[1], label=list(expressions.values()) if expressions else None, n_divisions=n_divisions))
         source_pd = pd.DataFrame([
             dict(
@@ -773,6 +775,51 @@ def _collect_scatter_plot_data(
     return source_pd
 
 
+def _collect_significance_downsampled(
+        x: Tuple[str, NumericExpression],
+        y: Tuple[str, NumericExpression],
+        fields: Dict[str, Expression],
+        y_threshold: float,
+        x_range: Tuple[float, float],
+        y_range: Tuple[float, float],
+        n_divisions: int,
+        missing_label: str = 'NA',
+        group: Expression = None
+) -> pd.DataFrame:
+    """Collect every point whose y value is at least `y_threshold`, and one
+    point from each cell of an `n_divisions` by `n_divisions` grid over
+    `x_range` and `y_range` for the rest. If `group` is given, cells are also
+    split by its value, so that no cell spans two groups.
+
+    The number of points returned is bounded by the number above the threshold
+    plus the number of cells, regardless of the number of rows. Numeric fields
+    keep their types; as in :func:`.scatter`, all other fields are converted
+    to strings, with `missing_label` for missing values, so that they can be
+    used as categorical labels.
+    """
+    numeric_types = (Int32Expression, Int64Expression, Float32Expression, Float64Expression)
+    fields = {k: v if isinstance(v, numeric_types) else hail.or_else(hail.str(v), missing_label)
+              for k, v in fields.items()}
+    point = hail.struct(**{x[0]: x[1], y[0]: y[1]}, **fields)
+
+    x_width = (x_range[1] - x_range[0]) / n_divisions or 1.0
+    y_height = (y_range[1] - y_range[0]) / n_divisions or 1.0
+    cell = [hail.int64(hail.floor((x[1] - x_range[0]) / x_width)),
+            hail.int64(hail.floor((y[1] - y_range[0]) / y_height))]
+    if group is not None:
+        cell = [group] + cell
+
+    agg_f = batched(x[1]._aggregation_method())
+    significant, binned = agg_f((
+        hail.agg.filter(y[1] >= y_threshold, hail.agg.collect(point)),
+        hail.agg.filter((y[1] < y_threshold) & hail.is_finite(hail.float64(x[1])),
+                        hail.agg.group_by(hail.tuple(cell), hail.agg.take(point, 1)))))
+    points = significant + [cell_points[0] for cell_points in binned.values()]
+
+    columns = [x[0], y[0], *fields]
+    return pd.DataFrame({c: [point[c] for point in points] for c in columns}, columns=columns)
+
+
 def _get_categorical_palette(factors: List[str]) -> Dict[str, str]:
     n = max(3, len(factors))
     if n < len(palette):
@@ -964,8 +1011,12 @@ def scatter(
         y = ('y', y)
 
     source_pd = _collect_scatter_plot_data(x, y, fields={**hover_fields, **label}, n_divisions=None if collect_all else n_divisions, missing_label=missing_label)
+    return _scatter_figure(source_pd, x[0], y[0], label_cols, colors, title, xlabel, ylabel, size, legend, width, height)
+
+
+def _scatter_figure(source_pd, x_col, y_col, label_cols, colors, title, xlabel, ylabel, size, legend, width, height):
     sp = figure(title=title, x_axis_label=xlabel, y_axis_label=ylabel, height=height, width=width)
-    sp, sp_legend_items, sp_legend, sp_color_bar, sp_color_mappers, sp_scatter_renderers = _get_scatter_plot_elements(sp, source_pd, x[0], y[0], label_cols, colors, size)
+    sp, sp_legend_items, sp_legend, sp_color_bar, sp_color_mappers, sp_scatter_renderers = _get_scatter_plot_elements(sp, source_pd, x_col, y_col, label_cols, colors, size)
 
     if not legend:
         sp_legend.visible = False
@@ -1245,7 +1296,8 @@ def joint_plot(
            xlabel=nullable(str), ylabel=nullable(str), size=int, legend=bool,
            hover_fields=nullable(dictof(str, expr_any)),
            colors=nullable(oneof(bokeh.models.mappers.ColorMapper, dictof(str, bokeh.models.mappers.ColorMapper))),
-           width=int, height=int, collect_all=bool, n_divisions=nullable(int), missing_label=str)
+           width=int, height=int, collect_all=bool, n_divisions=nullable(int), missing_label=str,
+           significance_threshold=numeric)
 def qq(
         pvals: Union[NumericExpression, Tuple[str, NumericExpression]],
         label: Union[Expression, Dict[str, Expression]] = None,
@@ -1260,7 +1312,8 @@ def qq(
         height: int = 800,
         collect_all: bool = False,
         n_divisions: int = 500,
-        missing_label: str = 'NA'
+        missing_label: str = 'NA',
+        significance_threshold: float = 5e-8
 ) -> Union[bokeh.plotting.Figure, Column]:
     """Create a Quantile-Quantile plot. (https://en.wikipedia.org/wiki/Q-Q_plot)
 
@@ -1321,6 +1374,9 @@ def qq(
         Factor by which to downsample (default value = 500). A lower input results in fewer output datapoints.
     missing_label: str
         Label to use when a point is missing data for a categorical label
+    significance_threshold : float
+        When downsampling, every point with a p-value at or below this
+        threshold is plotted, and only the rest are downsampled.
 
     Returns
     -------
@@ -1341,24 +1397,40 @@ def qq(
     ).persist()
     if 'p' not in hover_fields:
         hover_fields['p_value'] = ht['p_value']
-    p = scatter(
-        ht.expected_p,
-        ht.observed_p,
-        label={x: ht[x] for x in label},
-        title=title,
-        xlabel=xlabel,
-        ylabel=ylabel,
-        size=size,
-        legend=legend,
-        hover_fields={x: ht[x] for x in hover_fields},
-        colors=colors,
-        width=width,
-        height=height,
-        collect_all=collect_all,
-        n_divisions=n_divisions,
-        missing_label=missing_label
+    if collect_all or n_divisions is None:
+        p = scatter(
+            ht.expected_p,
+            ht.observed_p,
+            label={x: ht[x] for x in label},
+            title=title,
+            xlabel=xlabel,
+            ylabel=ylabel,
+            size=size,
+            legend=legend,
+            hover_fields={x: ht[x] for x in hover_fields},
+            colors=colors,
+            width=width,
+            height=height,
+            collect_all=collect_all,
+            n_divisions=n_divisions,
+            missing_label=missing_label
 
-    )
+        )
+    else:
+        # -log10 p-values lie in [0, log10(n)] on the expected axis, and all
+        # downsampled points lie below the threshold on the observed axis
+        y_threshold = -math.log10(significance_threshold)
+        source_pd = _collect_significance_downsampled(
+            ('x', ht.expected_p),
+            ('y', ht.observed_p),
+            fields={x: ht[x] for x in {**hover_fields, **label}},
+            y_threshold=y_threshold,
+            x_range=(0, math.log10(max(n, 1))),
+            y_range=(0, y_threshold),
+            n_divisions=n_divisions,
+            missing_label=missing_label)
+        colors = {'label': colors} if isinstance(colors, ColorMapper) else colors
+        p = _scatter_figure(source_pd, 'x', 'y', list(label), colors, title, xlabel, ylabel, size, legend, width, height)
     from hail.methods.statgen import _lambda_gc_agg
     lambda_gc, max_p = ht.aggregate((_lambda_gc_agg(ht['p_value']), hail.agg.max(hail.max(ht.observed_p, ht.expected_p))))
     if isinstance(p, Column):
@@ -1378,8 +1450,10 @@ def qq(
 
 
 @typecheck(pvals=expr_float64, locus=nullable(expr_locus()), title=nullable(str),
-           size=int, hover_fields=nullable(dictof(str, expr_any)), collect_all=bool, n_divisions=int, significance_line=nullable(numeric))
-def manhattan(pvals, locus=None, title=None, size=4, hover_fields=None, collect_all=False, n_divisions=500, significance_line=5e-8):
+           size=int, hover_fields=nullable(dictof(str, expr_any)), collect_all=bool, n_divisions=int, significance_line=nullable(numeric),
+           significance_threshold=numeric)
+def manhattan(pvals, locus=None, title=None, size=4, hover_fields=None, collect_all=False, n_divisions=500, significance_line=5e-8,
+              significance_threshold=5e-8):
     """Create a Manhattan plot. (https://en.wikipedia.org/wiki/Manhattan_plot)
 
     Parameters
@@ -1401,6 +1475,10 @@ def manhattan(pvals, locus=None, title=None, size=4, hover_fields=None, collect_
     significance_line : float, optional
         p-value at which to add a horizontal, dotted red line indicating
         genome-wide significance.  If ``None``, no line is added.
+    significance_threshold : float
+        When downsampling, every point with a p-value at or below this
+        threshold is plotted, and only the rest are downsampled, separately
+        for each contig.
 
     Returns
     -------
@@ -1414,23 +1492,36 @@ def manhattan(pvals, locus=None, title=None, size=4, hover_fields=None, collect_
     if hover_fields is None:
         hover_fields = {}
 
-    hover_fields['locus'] = hail.str(locus)
-
     pvals = -hail.log10(pvals)
 
-    source_pd = _collect_scatter_plot_data(
-        ('_global_locus', locus.global_position()),
-        ('_pval', pvals),
-        fields=hover_fields,
-        n_divisions=None if collect_all else n_divisions
-    )
+    if collect_all:
+        hover_fields['locus'] = hail.str(locus)
+        source_pd = _collect_scatter_plot_data(
+            ('_global_locus', locus.global_position()),
+            ('_pval', pvals),
+            fields=hover_fields,
+            n_divisions=None
+        )
+    else:
+        y_threshold = -math.log10(significance_threshold)
+        source_pd = _collect_significance_downsampled(
+            ('_global_locus', locus.global_position()),
+            ('_pval', pvals),
+            fields={**hover_fields, 'locus': locus},
+            y_threshold=y_threshold,
+            x_range=(0, sum(ref.lengths.values())),
+            y_range=(0, y_threshold),
+            n_divisions=n_divisions,
+            group=locus.contig
+        )
     source_pd['p_value'] = [10 ** (-p) for p in source_pd['_pval']]
-    source_pd['_contig'] = [locus.split(":")[0] for locus in source_pd['locus']]
+    source_pd['_contig'], _ = ref._loci_from_global_positions_array(source_pd['_global_locus'])
 
     observed_contigs = set(source_pd['_contig'])
     observed_contigs = [contig for contig in ref.contigs.copy() if contig in observed_contigs]
 
-    contig_ticks = [ref._contig_global_position(contig) + ref.contig_length(contig) // 2 for contig in observed_contigs]
+    contig_ticks = ref._global_positions_array(
+        observed_contigs, [ref.contig_length(contig) // 2 + 1 for contig in observed_contigs]).tolist()
     color_mapper = CategoricalColorMapper(factors=ref.contigs, palette=palette[:2] * int((len(ref.contigs) + 1) / 2))
 
     p = figure(title=title, x_axis_label='Chromosome', y_axis_label='P-value (-log10 scale)', width=1000)
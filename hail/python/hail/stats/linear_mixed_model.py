@@ -353,6 +353,12 @@ class LinearMixedModel(object):
             self._xty = x.T @ y
             self._xtx = x.T @ x
 
+        # ydy, xdy and xdx are blocks of w^T D w, computed together per evaluation
+        self._w = np.column_stack([py, px])
+        if low_rank:
+            self._wtw = np.block([[np.reshape(self._yty, (1, 1)), self._xty[np.newaxis, :]],
+                                  [self._xty[:, np.newaxis], self._xtx]])
+
         self._dof = n - f
         self._d = None
         self._ydy = None
@@ -474,15 +480,10 @@ class LinearMixedModel(object):
 
         if self.low_rank:
             d -= gamma
-            dpy = d * self.py
-            ydy = self.py @ dpy + gamma * self._yty
-            xdy = self.px.T @ dpy + gamma * self._xty
-            xdx = (self.px.T * d) @ self.px + gamma * self._xtx
+            wdw = (self._w.T * d) @ self._w + gamma * self._wtw
         else:
-            dpy = d * self.py
-            ydy = self.py @ dpy
-            xdy = self.px.T @ dpy
-            xdx = (self.px.T * d) @ self.px
+            wdw = (self._w.T * d) @ self._w
+        ydy, xdy, xdx = wdw[0, 0], wdw[1:, 0], wdw[1:, 1:]
 
         try:
             beta = solve(xdx, xdy, assume_a='pos')
@@ -590,6 +591,137 @@ class LinearMixedModel(object):
 
         return 1 / np.sqrt(2 * a)
 
+    @typecheck_method(py=np.ndarray,
+                      y=nullable(np.ndarray),
+                      bounds=tupleof(numeric),
+                      tol=float,
+                      maxiter=int)
+    def fit_phenotypes(self, py, y=None, bounds=(-8.0, 8.0), tol=1e-8, maxiter=500):
+        r"""Fit a model for each of several phenotypes sharing this model's
+        fixed effects and kernel.
+
+        Examples
+        --------
+        Fit the columns of ``ys`` against the kinship matrix of ``model``:
+
+        >>> models = model.fit_phenotypes(p @ ys)  # doctest: +SKIP
+
+        Notes
+        -----
+        Each returned model is equivalent to a model constructed with the same
+        `px`, `s`, `x` and `p_path` as this model, and with the corresponding
+        column of `py` (and `y`), on which :meth:`fit` has been run. This model
+        itself is not modified.
+
+        Rather than optimizing each phenotype separately, the negative log
+        REML of all phenotypes is evaluated together, one vectorized
+        evaluation per step of a golden-section search for each
+        :math:`\log{\gamma}`. The optimum is accurate to within `tol`.
+
+        Parameters
+        ----------
+        py: :class:`numpy.ndarray`
+            :math:`r \times k` matrix of projected phenotypes, one per column.
+        y: :class:`numpy.ndarray`, optional
+            :math:`n \times k` matrix of phenotypes, one per column.
+            Required for low-rank models.
+        bounds: :obj:`float`, :obj:`float`
+            Lower and upper bounds for :math:`\log{\gamma}`.
+        tol: :obj:`float`
+            Absolute tolerance for optimizing :math:`\log{\gamma}`.
+        maxiter: :obj:`float`
+            Maximum number of iterations for optimizing :math:`\log{\gamma}`.
+
+        Returns
+        -------
+        :obj:`list` of :class:`LinearMixedModel`
+            Fit models, one per phenotype.
+        """
+        _check_dims(py, 'py', 2)
+        if py.shape[0] != self.r:
+            raise ValueError("fit_phenotypes: 'py' must have the same number of rows as the size of s")
+        k = py.shape[1]
+        if self.low_rank:
+            if y is None:
+                raise ValueError('fit_phenotypes: model is low-rank so y is required.')
+            _check_dims(y, 'y', 2)
+            if y.shape != (self.n, k):
+                raise ValueError("fit_phenotypes: 'y' must have shape (n, k) for 'py' of shape (r, k)")
+        elif y is not None:
+            raise ValueError('fit_phenotypes: model is full-rank so y must not be set.')
+
+        log_gammas = self._minimize_neg_log_reml_phenotypes(py, y, bounds, tol, maxiter)
+
+        models = []
+        for i in range(k):
+            if self.low_rank:
+                model = LinearMixedModel(py[:, i], self.px, self.s, y[:, i], self.x, p_path=self.p_path)
+            else:
+                model = LinearMixedModel(py[:, i], self.px, self.s, p_path=self.p_path)
+            if log_gammas[i] - bounds[0] < 0.001:
+                raise Exception(f"failed to fit log_gamma for phenotype {i}: optimum within 0.001 of lower bound.")
+            elif bounds[1] - log_gammas[i] < 0.001:
+                raise Exception(f"failed to fit log_gamma for phenotype {i}: optimum within 0.001 of upper bound.")
+            model.fit(log_gamma=log_gammas[i])
+            model.h_sq_standard_error = model._estimate_h_sq_standard_error()
+            models.append(model)
+        return models
+
+    def _neg_log_reml_phenotypes(self, log_gamma, py, yty, xty):
+        """Vectorized :meth:`compute_neg_log_reml` for the phenotypes that
+        are the columns of `py`, each at its own value of `log_gamma`."""
+        gamma = np.exp(log_gamma)
+        d = 1 / (self.s[:, np.newaxis] + 1 / gamma)  # (r, k)
+        logdet_d = np.sum(np.log(d), axis=0) + (self.n - self.r) * log_gamma
+
+        if self.low_rank:
+            d -= gamma
+        dpy = d * py
+        ydy = np.sum(py * dpy, axis=0)
+        xdy = dpy.T @ self.px  # (k, f)
+        xdx = np.einsum('if,ik,ig->kfg', self.px, d, self.px)  # (k, f, f)
+        if self.low_rank:
+            ydy += gamma * yty
+            xdy += gamma[:, np.newaxis] * xty.T
+            xdx += gamma[:, np.newaxis, np.newaxis] * self._xtx
+
+        beta = np.linalg.solve(xdx, xdy[:, :, np.newaxis])[:, :, 0]
+        residual_sq = ydy - np.sum(xdy * beta, axis=1)
+        sigma_sq = residual_sq / self._dof
+        return (np.linalg.slogdet(xdx)[1] - logdet_d + self._dof * np.log(sigma_sq)) / 2
+
+    def _minimize_neg_log_reml_phenotypes(self, py, y, bounds, tol, maxiter):
+        k = py.shape[1]
+        if self.low_rank:
+            yty = np.sum(y * y, axis=0)
+            xty = self.x.T @ y
+        else:
+            yty = xty = None
+
+        def f(log_gamma):
+            return self._neg_log_reml_phenotypes(log_gamma, py, yty, xty)
+
+        # golden-section search, in lockstep across phenotypes
+        ratio = (np.sqrt(5.0) - 1) / 2
+        lo = np.full(k, float(bounds[0]))
+        hi = np.full(k, float(bounds[1]))
+        x1 = hi - ratio * (hi - lo)
+        x2 = lo + ratio * (hi - lo)
+        f1, f2 = f(x1), f(x2)
+        for _ in range(maxiter):
+            if np.max(hi - lo) <= tol:
+                break
+            left = f1 < f2
+            hi = np.where(left, x2, hi)
+            lo = np.where(left, lo, x1)
+            x_new = np.where(left, hi - ratio * (hi - lo), lo + ratio * (hi - lo))
+            f_new = f(x_new)
+            x1, x2 = np.where(left, x_new, x2), np.where(left, x1, x_new)
+            f1, f2 = np.where(left, f_new, f2), np.where(left, f1, f_new)
+        if np.max(hi - lo) > tol:
+            raise Exception(f'failed to fit log_gamma: no convergence after {maxiter} iterations')
+        return (lo + hi) / 2
+
     def h_sq_normalized_lkhd(self):
         r"""Estimate the normalized likelihood of :math:`\mathit{h}^2` over the
         discrete grid of percentiles.
@@ -746,27 +878,48 @@ class LinearMixedModel(object):
         return Table._from_java(backend._jbackend.pyFitLinearMixedModel(
             self._scala_model, jpa_t, maybe_ja_t))
 
-    @typecheck_method(pa=np.ndarray, a=nullable(np.ndarray), return_pandas=bool)
-    def fit_alternatives_numpy(self, pa, a=None, return_pandas=False):
+    @typecheck_method(pa=oneof(np.ndarray, str),
+                      a=nullable(oneof(np.ndarray, str)),
+                      return_pandas=bool,
+                      block_size=int,
+                      n_processes=nullable(int))
+    def fit_alternatives_numpy(self, pa, a=None, return_pandas=False, block_size=4096, n_processes=None):
         r"""Fit and test alternative model for each augmented design matrix.
 
         Notes
         -----
-        This Python-only implementation runs serially on leader (master). See
+        This Python-only implementation runs on leader (master). See
         the scalable implementation :meth:`fit_alternatives` for documentation
         of the returned table.
 
+        Alternatives are fit `block_size` at a time, with one matrix product
+        per block rather than one solve per alternative. `pa` and `a` may be
+        paths to ``.npy`` files, which are memory-mapped and read one block of
+        columns at a time, so they need not fit in memory. Reads are
+        contiguous if the arrays are stored in column-major order, as results
+        from ``np.save(path, pa_t.T)`` for a row-major :math:`(P_r A)^T`.
+
+        With `n_processes`, blocks are fit in parallel by a pool of that many
+        processes.
+
         Parameters
         ----------
-        pa: :class:`numpy.ndarray`
-            Projected matrix :math:`P_r A` of alternatives with shape :math:`(r, m)`.
+        pa: :class:`numpy.ndarray` or :class:`str`
+            Projected matrix :math:`P_r A` of alternatives with shape :math:`(r, m)`,
+            or path to a ``.npy`` file containing it.
             Each column is a projected augmentation :math:`P_r x_\star` of :math:`P_r X`.
-        a: :class:`numpy.ndarray`, optional
-            Matrix :math:`A` of alternatives with shape :math:`(n, m)`.
+        a: :class:`numpy.ndarray` or :class:`str`, optional
+            Matrix :math:`A` of alternatives with shape :math:`(n, m)`,
+            or path to a ``.npy`` file containing it.
             Each column is an augmentation :math:`x_\star` of :math:`X`.
             Required for low-rank inference.
         return_pandas: :obj:`bool`
             If true, return pandas dataframe. If false, return Hail table.
+        block_size: :obj:`int`
+            Number of alternatives to fit at a time.
+        n_processes: :obj:`int`, optional
+            Number of processes to fit blocks in parallel. By default, blocks
+            are fit serially in this process.
 
         Returns
         -------
@@ -778,53 +931,88 @@ class LinearMixedModel(object):
         if not self._fitted:
             raise Exception("null model is not fit. Run 'fit' first.")
 
-        n_cols = pa.shape[1]
-        assert pa.shape[0] == self.r
+        if self.low_rank and a is None:
+            raise ValueError('model is low-rank so a is required.')
+        if block_size <= 0:
+            raise ValueError(f'block_size must be positive, found {block_size}')
+        if n_processes is not None and n_processes <= 0:
+            raise ValueError(f'n_processes must be positive, found {n_processes}')
+
+        pa_array = _load_alternatives(pa)
+        n_cols = pa_array.shape[1]
+        assert pa_array.shape[0] == self.r
 
         if self.low_rank:
-            assert a.shape[0] == self.n and a.shape[1] == n_cols
-            data = [(i,) + self._fit_alternative_numpy(pa[:, i], a[:, i]) for i in range(n_cols)]
+            a_array = _load_alternatives(a)
+            assert a_array.shape[0] == self.n and a_array.shape[1] == n_cols
         else:
-            data = [(i,) + self._fit_alternative_numpy(pa[:, i], None) for i in range(n_cols)]
+            a = a_array = None
 
-        df = pd.DataFrame.from_records(data, columns=['idx', 'beta', 'sigma_sq', 'chi_sq', 'p_value'])
+        params = self._alternatives_params()
+        blocks = [(start, min(start + block_size, n_cols)) for start in range(0, n_cols, block_size)]
 
-        if return_pandas:
-            return df
+        if n_processes is None or n_processes == 1 or len(blocks) <= 1:
+            results = [_fit_alternatives_block(params, pa_array[:, start:end],
+                                               None if a_array is None else a_array[:, start:end])
+                       for start, end in blocks]
         else:
-            return Table.from_pandas(df, key='idx')
-
-    def _fit_alternative_numpy(self, pa, a):
-        from scipy.linalg import solve, LinAlgError
-        from scipy.stats.distributions import chi2
-
-        gamma = self.gamma
-        dpa = self._d_alt * pa
+            from concurrent.futures import ProcessPoolExecutor
+
+            # params are sent to each worker once; paths are sent as is, so
+            # each worker maps its own blocks, and in-memory arrays are sent
+            # one block of columns per task
+            def block_source(x, x_array, start, end):
+                if x_array is None:
+                    return None
+                return x if isinstance(x, str) else x_array[:, start:end]
+
+            tasks = [(block_source(pa, pa_array, start, end), block_source(a, a_array, start, end), start, end)
+                     for start, end in blocks]
+            with ProcessPoolExecutor(max_workers=n_processes,
+                                     initializer=_init_alternatives_worker,
+                                     initargs=(params,)) as executor:
+                results = list(executor.map(_fit_alternatives_range, tasks))
+
+        if results:
+            columns = [np.concatenate(column) for column in zip(*results)]
+        else:
+            columns = [np.zeros(0) for _ in range(4)]
 
-        # single thread => no need to copy
-        ydy = self._ydy_alt
-        xdy = self._xdy_alt
-        xdx = self._xdx_alt
+        df = pd.DataFrame({'idx': np.arange(n_cols, dtype=np.int64),
+                           'beta': columns[0],
+                           'sigma_sq': columns[1],
+                           'chi_sq': columns[2],
+                           'p_value': columns[3]})
 
-        if self.low_rank:
-            xdy[0] = self.py @ dpa + gamma * (self.y @ a)
-            xdx[0, 0] = pa @ dpa + gamma * (a @ a)
-            xdx[0, 1:] = self.px.T @ dpa + gamma * (self.x.T @ a)
+        if return_pandas:
+            return df
         else:
-            xdy[0] = self.py @ dpa
-            xdx[0, 0] = pa @ dpa
-            xdx[0, 1:] = self.px.T @ dpa
-
-        try:
-            beta = solve(xdx, xdy, assume_a='pos')  # only uses upper triangle
-            residual_sq = ydy - xdy.T @ beta
-            sigma_sq = residual_sq / self._dof_alt
-            chi_sq = self.n * np.log(self._residual_sq / residual_sq)  # division => precision
-            p_value = chi2.sf(chi_sq, 1)
+            return Table.from_pandas(df, key='idx')
 
-            return beta[0], sigma_sq, chi_sq, p_value
-        except LinAlgError:
-            return tuple(4 * [float('nan')])
+    def _alternatives_params(self):
+        """Null-model quantities shared by all alternatives, as a picklable dict."""
+        from scipy.linalg import solve
+
+        xdx = self._xdx_alt[1:, 1:]
+        xdy = self._xdy_alt[1:]
+        xdx_inv_xdy = solve(xdx, xdy, assume_a='pos')
+
+        return {
+            'low_rank': self.low_rank,
+            'n': self.n,
+            'gamma': self.gamma,
+            'd': self._d_alt,
+            'py': self.py,
+            'px': self.px,
+            'y': self.y,
+            'x': self.x,
+            'xdx': xdx,
+            'xdy': xdy,
+            'xdx_inv_xdy': xdx_inv_xdy,
+            'null_residual_sq': self._ydy_alt - xdy @ xdx_inv_xdy,
+            'residual_sq': self._residual_sq,
+            'dof_alt': self._dof_alt
+        }
 
     def _set_scala_model(self):
         from hail.utils.java import Env
@@ -859,8 +1047,9 @@ class LinearMixedModel(object):
                       x=np.ndarray,
                       k=np.ndarray,
                       p_path=nullable(str),
-                      overwrite=bool)
-    def from_kinship(cls, y, x, k, p_path=None, overwrite=False):
+                      overwrite=bool,
+                      cache_dir=nullable(str))
+    def from_kinship(cls, y, x, k, p_path=None, overwrite=False, cache_dir=None):
         r"""Initializes a model from :math:`y`, :math:`X`, and :math:`K`.
 
         Examples
@@ -906,6 +1095,12 @@ class LinearMixedModel(object):
         `k` must be positive semi-definite; symmetry is not checked as only the
         lower triangle is used.
 
+        If `cache_dir` is set, the eigendecomposition is stored in that local
+        directory, in a file named by a hash of the contents of `k`, and later
+        calls with the same `k` read it back rather than recompute it. This
+        makes fitting many phenotypes against one kinship matrix cheap; see
+        also :meth:`fit_phenotypes`.
+
         Parameters
         ----------
         y: :class:`numpy.ndarray`
@@ -918,6 +1113,8 @@ class LinearMixedModel(object):
             Path at which to write :math:`P` as a block matrix.
         overwrite: :obj:`bool`
             If ``True``, overwrite an existing file at `p_path`.
+        cache_dir: :class:`str`, optional
+            Local directory in which to cache the eigendecomposition of :math:`K`.
 
         Returns
         -------
@@ -940,15 +1137,7 @@ class LinearMixedModel(object):
             raise ValueError("from_kinship: 'x' and 'k' must have the same "
                              "number of rows")
 
-        s, u = hl.linalg._eigh(k)
-        if s[0] < -1e12 * s[-1]:
-            raise Exception("from_kinship: smallest eigenvalue of 'k' is"
-                            f"negative: {s[0]}")
-
-        # flip singular values to descending order
-        s = np.flip(s, axis=0)
-        u = np.fliplr(u)
-        p = u.T
+        s, p = _kinship_eigendecomposition(k, cache_dir)
         if p_path:
             BlockMatrix.from_numpy(p).write(p_path, overwrite=overwrite)
 
@@ -1152,3 +1341,103 @@ class LinearMixedModel(object):
             print(f'different p_path:\n{self.p_path}\n{other.p_path}')
             same = False
         return same
+
+
+def _kinship_eigendecomposition(k, cache_dir):
+    """Eigenvalues of `k` in descending order and the matrix whose rows are
+    the corresponding eigenvectors, cached in `cache_dir` if given."""
+    import hashlib
+    import os
+
+    if cache_dir is not None:
+        k = np.ascontiguousarray(k, dtype=np.float64)
+        h = hashlib.sha256(repr(k.shape).encode())
+        h.update(k.data)
+        digest = h.hexdigest()
+        cache_path = os.path.join(cache_dir, f'kinship-{digest}.npz')
+        if os.path.exists(cache_path):
+            info(f'from_kinship: reading eigendecomposition from {cache_path}')
+            with np.load(cache_path) as cached:
+                return cached['s'], cached['p']
+
+    s, u = hl.linalg._eigh(k)
+    if s[0] < -1e12 * s[-1]:
+        raise Exception("from_kinship: smallest eigenvalue of 'k' is"
+                        f"negative: {s[0]}")
+
+    # flip singular values to descending order
+    s = np.flip(s, axis=0)
+    u = np.fliplr(u)
+    p = u.T
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write then rename, so concurrent readers never see a partial file
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, s=s, p=p)
+        os.replace(tmp_path, cache_path)
+
+    return s, p
+
+
+def _load_alternatives(x):
+    if isinstance(x, str):
+        return np.load(x, mmap_mode='r')
+    return x
+
+
+_alternatives_worker_params = None
+
+
+def _init_alternatives_worker(params):
+    global _alternatives_worker_params
+    _alternatives_worker_params = params
+
+
+def _fit_alternatives_range(args):
+    pa, a, start, end = args
+    if isinstance(pa, str):
+        pa = _load_alternatives(pa)[:, start:end]
+    if isinstance(a, str):
+        a = _load_alternatives(a)[:, start:end]
+    return _fit_alternatives_block(_alternatives_worker_params, pa, a)
+
+
+def _fit_alternatives_block(params, pa, a):
+    r"""Fit the alternative model for each column of `pa` (and `a`).
+
+    The augmented system is solved by its Schur complement with respect to
+    the null model's :math:`X^T D X`, which is shared by all alternatives.
+    Returns arrays of `beta`, `sigma_sq`, `chi_sq` and `p_value`.
+    """
+    from scipy.linalg import solve
+    from scipy.stats.distributions import chi2
+
+    pa = np.asarray(pa, dtype=np.float64)
+    dpa = params['d'][:, np.newaxis] * pa
+
+    xdy_alt = params['py'] @ dpa
+    xdx_alt = np.einsum('ij,ij->j', pa, dpa)
+    xdx_cross = params['px'].T @ dpa
+
+    if params['low_rank']:
+        gamma = params['gamma']
+        a = np.asarray(a, dtype=np.float64)
+        xdy_alt += gamma * (params['y'] @ a)
+        xdx_alt += gamma * np.einsum('ij,ij->j', a, a)
+        xdx_cross += gamma * (params['x'].T @ a)
+
+    xdx_inv_cross = solve(params['xdx'], xdx_cross, assume_a='pos')
+    numerator = xdy_alt - xdx_cross.T @ params['xdx_inv_xdy']
+    schur = xdx_alt - np.einsum('ij,ij->j', xdx_cross, xdx_inv_cross)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # the augmented system is positive definite iff the Schur complement is positive
+        schur = np.where(schur > 0, schur, np.nan)
+        beta = numerator / schur
+        residual_sq = params['null_residual_sq'] - numerator * beta
+        sigma_sq = residual_sq / params['dof_alt']
+        chi_sq = params['n'] * np.log(params['residual_sq'] / residual_sq)  # division => precision
+        p_value = chi2.sf(chi_sq, 1)
+
+    return beta, sigma_sq, chi_sq, p_value
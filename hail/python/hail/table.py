@@ -1,4 +1,5 @@
 import collections
+import csv
 import itertools
 import pandas
 import pyspark
@@ -3298,10 +3299,45 @@ class Table(ExprContainer):
 
         """
         table = self.flatten() if flatten else self
-        dtypes_struct = table.row.dtype
-        collect_dict = {key: hl.agg.collect(value) for key, value in table.row.items()}
-        column_struct_array = table.aggregate(hl.struct(**collect_dict))
-        columns = list(column_struct_array.keys())
+        return table._collect_to_pandas()
+
+    @typecheck_method(flatten=bool)
+    def to_pandas_partitions(self, flatten=True):
+        """Converts this table to Pandas DataFrames, one per partition.
+
+        Examples
+        --------
+
+        >>> for df in table1.to_pandas_partitions():  # doctest: +SKIP
+        ...     process(df)
+
+        Notes
+        -----
+        The table is first written to a temporary file, so the pipeline that
+        computes it runs once; each partition is then read back and collected
+        on its own, so only one partition's rows are held in memory at once.
+        This costs a write of the whole table, and a query per partition.
+        Concatenating the frames gives the same result as :meth:`.to_pandas`.
+
+        Parameters
+        ----------
+        flatten : :obj:`bool`
+            If ``True``, :meth:`flatten` before converting to Pandas DataFrames.
+
+        Returns
+        -------
+        iterator of :class:`.pandas.DataFrame`
+        """
+        table = self.flatten() if flatten else self
+        table = table.checkpoint(hl.utils.new_temp_file('to_pandas_partitions', 'ht'))
+        for i in range(table.n_partitions()):
+            yield table._filter_partitions([i])._collect_to_pandas()
+
+    def _collect_to_pandas(self):
+        dtypes_struct = self.row.dtype
+        collect_dict = {key: hl.agg.collect(value) for key, value in self.row.items()}
+        column_values = dict(self.aggregate(hl.struct(**collect_dict)))
+        columns = list(column_values.keys())
         data_dict = {}
 
         for column in columns:
@@ -3310,10 +3346,40 @@ class Table(ExprContainer):
                 pd_dtype = 'string'
             else:
                 pd_dtype = hl_dtype.to_numpy()
-            data_dict[column] = pandas.Series(column_struct_array[column], dtype=pd_dtype)
+            # drop each collected list as soon as its column is built
+            data_dict[column] = pandas.Series(column_values.pop(column), dtype=pd_dtype)
 
         return pandas.DataFrame(data_dict)
 
+    @typecheck_method(output=str, flatten=bool, overwrite=bool)
+    def export_parquet(self, output, flatten=True, overwrite=False):
+        """Export to a directory of Parquet files, one per partition.
+
+        Examples
+        --------
+
+        >>> table1.export_parquet('output/table1.parquet')  # doctest: +SKIP
+
+        Notes
+        -----
+        Partitions are written in parallel. Types are expanded as in
+        :meth:`.to_spark`, so the files can be read by any Parquet reader,
+        for example :func:`pandas.read_parquet` or Spark.
+
+        This method requires the Spark backend.
+
+        Parameters
+        ----------
+        output : :class:`str`
+            Path of the output directory.
+        flatten : :obj:`bool`
+            If ``True``, :meth:`flatten` before exporting.
+        overwrite : :obj:`bool`
+            If ``True``, overwrite an existing directory at `output`.
+        """
+        mode = 'overwrite' if overwrite else 'errorifexists'
+        self.to_spark(flatten).write.parquet(output, mode=mode)
+
     @staticmethod
     @typecheck(df=pandas.DataFrame,
                key=oneof(str, sequenceof(str)))
@@ -3340,6 +3406,11 @@ class Table(ExprContainer):
         key = [key] if isinstance(key, str) else key
         fields = list(df.columns)
         pd_dtypes = df.dtypes
+
+        new_table = Table._from_pandas_columnar(df)
+        if new_table is not None:
+            return new_table if not key else new_table.key_by(*key)
+
         hl_type_hints = {}
         columns = {fields[col_idx]: df[col].tolist() for col_idx, col in enumerate(df.columns)}
         data = [{} for _ in range(len(columns[fields[0]]))]
@@ -3356,6 +3427,45 @@ class Table(ExprContainer):
         new_table = hl.Table.parallelize(data, partial_type=hl_type_hints)
         return new_table if not key else new_table.key_by(*key)
 
+    @staticmethod
+    def _from_pandas_columnar(df) -> Optional['Table']:
+        """Import `df` by writing it out column-wise and reading it back with
+        :func:`.import_table`, avoiding per-cell Python work and literal IR.
+
+        Returns ``None`` if `df` has a column this path cannot represent
+        faithfully, in which case the caller falls back to parallelizing rows.
+        """
+        missing = 'NA'
+        fields = list(df.columns)
+        if len(df) == 0 or not fields or len(set(fields)) != len(fields):
+            return None
+        if not all(isinstance(f, str) for f in fields):
+            return None
+        if any(c in f for f in fields for c in '\t\n\r"'):
+            return None
+
+        types = {}
+        for field in fields:
+            hl_type = dtypes_from_pandas(df.dtypes[field])
+            if hl_type is None:
+                return None
+            if hl_type == hl.tstr:
+                col = df[field]
+                if (col == missing).any() or col.str.contains('[\t\n\r"]', regex=True).any():
+                    return None
+            types[field] = hl_type
+
+        path = hl.utils.new_temp_file(prefix='from_pandas', extension='tsv')
+        with hl.hadoop_open(path, 'w') as f:
+            df.to_csv(f, sep='\t', na_rep=missing, index=False, quoting=csv.QUOTE_NONE)
+
+        t = hl.import_table(path, types=types, missing=missing, quote=None)
+        # NumPy float columns cannot hold missing values, but to_csv writes NaN as `missing`
+        float_fields = [f for f, hl_type in types.items() if hl_type in (hl.tfloat32, hl.tfloat64)]
+        if float_fields:
+            t = t.annotate(**{f: hl.or_else(t[f], hl.literal(float('nan'), types[f])) for f in float_fields})
+        return t
+
     @typecheck_method(other=table_type, tolerance=nullable(numeric), absolute=bool)
     def _same(self, other, tolerance=1e-6, absolute=False):
         from hail.expr.functions import _values_similar
@@ -0,0 +1,36 @@
+import struct
+
+import numpy as np
+
+
+class ByteWriter:
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write_int32(self, v: int):
+        self._buffer += struct.pack('=i', v)
+
+    def write_int64(self, v: int):
+        self._buffer += struct.pack('=q', v)
+
+    def write_bool(self, v: bool):
+        self._buffer.append(1 if v else 0)
+
+    def write_float32(self, v: float):
+        self._buffer += struct.pack('=f', v)
+
+    def write_float64(self, v: float):
+        self._buffer += struct.pack('=d', v)
+
+    def write_bytes(self, b):
+        self._buffer += b
+
+    def write_missing_bits(self, missing):
+        """Write one bit per element, set if the element is missing, padded to
+        a whole number of bytes."""
+        if len(missing) == 0:
+            return
+        self._buffer += np.packbits(np.asarray(missing, dtype=bool), bitorder='little').tobytes()
+
+    def getvalue(self) -> bytes:
+        return bytes(self._buffer)
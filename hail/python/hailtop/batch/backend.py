@@ -1,6 +1,7 @@
-from typing import Optional, Dict, Any, TypeVar, Generic, List, Union
+from typing import Optional, Dict, Any, TypeVar, Generic, List, Union, Tuple, Set
 import sys
 import abc
+import asyncio
 import orjson
 import os
 import subprocess as sp
@@ -16,13 +17,15 @@ from hailtop import pip_version
 from hailtop.config import get_deploy_config, get_user_config
 from hailtop.utils import parse_docker_image_reference, async_to_blocking, bounded_gather, tqdm, url_scheme
 from hailtop.batch.hail_genetics_images import HAIL_GENETICS_IMAGES
-from hailtop.batch_client.parse import parse_cpu_in_mcpu
+from hailtop.batch_client.parse import parse_cpu_in_mcpu, parse_memory_in_bytes
 import hailtop.batch_client.client as bc
 from hailtop.batch_client.client import BatchClient
 from hailtop.aiotools import AsyncFS
 from hailtop.aiotools.router_fs import RouterAsyncFS
+from hailtop.aiotools.copy import copy as copy_files, make_transfer
 
 from . import resource, batch, job as _job  # pylint: disable=unused-import
+from .call_cache import CallCache, cached_outputs
 from .exceptions import BatchException
 from .globals import DEFAULT_SHELL
 
@@ -40,6 +43,38 @@ enables the user to monitor the asynchronous execution of a Batch.
 SelfType = TypeVar('SelfType')
 
 
+def _job_memory(job) -> Optional[str]:
+    """The memory of a job run locally, with `lowmem`, `standard` and `highmem`
+    resolved to a number of bytes."""
+    memory = job._memory
+    if memory is not None:
+        memory_ratios = {'lowmem': 1024**3, 'standard': 4 * 1024**3, 'highmem': 7 * 1024**3}
+        if memory in memory_ratios:
+            if job._cpu is not None:
+                mcpu = parse_cpu_in_mcpu(job._cpu)
+                if mcpu is not None:
+                    memory = str(int(memory_ratios[memory] * (mcpu / 1000)))
+                else:
+                    raise BatchException(f'invalid value for cpu: {job._cpu}')
+            else:
+                raise BatchException(f'must specify cpu when using {memory} to specify the memory')
+    return memory
+
+
+def _host_resources() -> Tuple[int, Optional[int]]:
+    """The CPU, in millicores, and memory, in bytes, available to this process.
+    Memory is `None` if it cannot be determined."""
+    try:
+        n_cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n_cores = os.cpu_count() or 1
+    try:
+        memory: Optional[int] = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        memory = None
+    return n_cores * 1000, memory
+
+
 class Backend(abc.ABC, Generic[RunningBatchType]):
     """
     Abstract class for backends.
@@ -111,13 +146,36 @@ class LocalBackend(Backend[None]):
         Additional flags to pass to `docker run`. Only used if a job specifies
         a docker image. This option will override the value set by the environment
         variable `HAIL_BATCH_EXTRA_DOCKER_RUN_FLAGS`.
+    parallelism:
+        Maximum number of jobs to run at once. If `None`, the number of jobs is
+        limited only by the CPU and memory of this computer.
+    fail_fast:
+        If `True`, no new jobs are started after a job fails, except jobs that
+        are set to always run. If `False`, only jobs that depend on a failed
+        job are skipped.
+
+    Notes
+    -----
+    Jobs run concurrently as soon as the jobs they depend on have completed.
+    A job is started only if the cores and memory it requests, with
+    :meth:`.Job.cpu` and :meth:`.Job.memory`, fit in what this computer has
+    left after the jobs already running. Jobs that do not set their cores
+    request one core; jobs that do not set their memory request none. A job
+    that requests more than this computer has runs by itself.
     """
 
     def __init__(self,
                  tmp_dir: str = '/tmp/',
                  gsa_key_file: Optional[str] = None,
-                 extra_docker_run_flags: Optional[str] = None):
+                 extra_docker_run_flags: Optional[str] = None,
+                 parallelism: Optional[int] = None,
+                 fail_fast: bool = True):
+        if parallelism is not None and parallelism < 1:
+            raise ValueError(f'parallelism must be positive, found {parallelism}')
+
         self._tmp_dir = tmp_dir.rstrip('/')
+        self._parallelism = parallelism
+        self._fail_fast = fail_fast
 
         flags = ''
 
@@ -175,57 +233,36 @@ class LocalBackend(Backend[None]):
                     f"cd {tmpdir}",
                     '\n']
 
-        def run_code(code):
-            code = '\n'.join(code)
-            if dry_run:
-                print(code)
-            else:
-                try:
-                    sp.check_call(code, shell=True)
-                except sp.CalledProcessError as e:
-                    print(e)
-                    print(e.output)
-                    raise
-
-        copied_input_resource_files = set()
         os.makedirs(tmpdir + '/inputs/', exist_ok=True)
 
         requester_pays_project_json = orjson.dumps(batch.requester_pays_project).decode('utf-8')
 
-        def copy_input(job, r):
-            if isinstance(r, resource.InputResourceFile):
-                if r not in copied_input_resource_files:
-                    copied_input_resource_files.add(r)
-
-                    input_scheme = url_scheme(r._input_path)
-                    if input_scheme != '':
-                        transfers_bytes = orjson.dumps([{"from": r._input_path, "to": r._get_path(tmpdir)}])
-                        transfers = transfers_bytes.decode('utf-8')
-                        return [f'python3 -m hailtop.aiotools.copy {shq(requester_pays_project_json)} {shq(transfers)}']
-
-                    absolute_input_path = os.path.realpath(os.path.expanduser(r._input_path))
-
-                    dest = r._get_path(os.path.expanduser(tmpdir))
-                    dir = os.path.dirname(dest)
-                    os.makedirs(dir, exist_ok=True)
+        call_cache = CallCache(self._fs, batch._call_cache) if batch._call_cache is not None else None
+        cache_keys: Dict[_job.Job, str] = {}
+        cached_jobs: Set[_job.Job] = set()
+        if call_cache is not None:
+            cache_keys = async_to_blocking(call_cache.keys(batch._jobs))
+            cached_jobs = async_to_blocking(call_cache.hits(cache_keys))
+        jobs = [job for job in batch._jobs if job not in cached_jobs]
 
-                    if job._image is not None:  # pylint: disable-msg=W0640
-                        return [f'cp {shq(absolute_input_path)} {shq(dest)}']
+        def stage_local_input(r, copy_file):
+            absolute_input_path = os.path.realpath(os.path.expanduser(r._input_path))
 
-                    return [f'ln -sf {shq(absolute_input_path)} {shq(dest)}']
+            dest = r._get_path(os.path.expanduser(tmpdir))
+            dir = os.path.dirname(dest)
+            os.makedirs(dir, exist_ok=True)
 
-                return []
+            if copy_file:
+                return [f'cp {shq(absolute_input_path)} {shq(dest)}']
 
-            assert isinstance(r, (resource.JobResourceFile, resource.PythonResult))
-            return []
+            return [f'ln -sf {shq(absolute_input_path)} {shq(dest)}']
 
         def symlink_input_resource_group(r):
             symlinks = []
-            if isinstance(r, resource.ResourceGroup) and r._source is None:
-                for name, irf in r._resources.items():
-                    src = irf._get_path(tmpdir)
-                    dest = f'{r._get_path(tmpdir)}.{name}'
-                    symlinks.append(f'ln -sf {shq(src)} {shq(dest)}')
+            for name, irf in r._resources.items():
+                src = irf._get_path(tmpdir)
+                dest = f'{r._get_path(tmpdir)}.{name}'
+                symlinks.append(f'ln -sf {shq(src)} {shq(dest)}')
             return symlinks
 
         def transfer_dicts_for_resource_file(res_file: Union[resource.ResourceFile, resource.PythonResult]) -> List[dict]:
@@ -237,94 +274,252 @@ class LocalBackend(Backend[None]):
 
             return [{"from": source, "to": dest} for dest in res_file._output_paths]
 
-        try:
-            input_transfer_dicts = [
-                transfer_dict
-                for input_resource in batch._input_resources
-                for transfer_dict in transfer_dicts_for_resource_file(input_resource)]
+        def job_code(job):
+            async_to_blocking(job._compile(tmpdir, tmpdir))
 
-            if input_transfer_dicts:
-                input_transfers = orjson.dumps(input_transfer_dicts).decode('utf-8')
-                code = new_code_block()
-                code += ["# Write input resources to output destinations"]
-                code += [f'python3 -m hailtop.aiotools.copy {shq(requester_pays_project_json)} {shq(input_transfers)}']
-                code += ['\n']
-                run_code(code)
+            os.makedirs(f'{tmpdir}/{job._dirname}/', exist_ok=True)
 
-            for job in batch._jobs:
-                async_to_blocking(job._compile(tmpdir, tmpdir))
+            code = new_code_block()
 
-                os.makedirs(f'{tmpdir}/{job._dirname}/', exist_ok=True)
+            code.append(f"# {job._job_id}: {job.name if job.name else ''}")
 
-                code = new_code_block()
+            if job._user_code:
+                code.append('# USER CODE')
+                user_code = [f'# {line}' for cmd in job._user_code for line in cmd.split('\n')]
+                code.append('\n'.join(user_code))
 
-                code.append(f"# {job._job_id}: {job.name if job.name else ''}")
+            env = {**job._env, 'BATCH_TMPDIR': tmpdir}
+            env_declarations = [f'export {k}={v}' for k, v in env.items()]
+            joined_env = '; '.join(env_declarations) + '; ' if env else ''
 
-                if job._user_code:
-                    code.append('# USER CODE')
-                    user_code = [f'# {line}' for cmd in job._user_code for line in cmd.split('\n')]
-                    code.append('\n'.join(user_code))
+            job_shell = job._shell if job._shell else DEFAULT_SHELL
 
-                code += [x for r in job._inputs for x in copy_input(job, r)]
-                code += [x for r in job._mentioned for x in symlink_input_resource_group(r)]
+            cmd = " && ".join(f'{{\n{x}\n}}' for x in job._wrapper_code)
 
-                env = {**job._env, 'BATCH_TMPDIR': tmpdir}
-                env_declarations = [f'export {k}={v}' for k, v in env.items()]
-                joined_env = '; '.join(env_declarations) + '; ' if env else ''
+            quoted_job_script = shq(joined_env + cmd)
 
-                job_shell = job._shell if job._shell else DEFAULT_SHELL
+            if job._image:
+                cpu = f'--cpus={job._cpu}' if job._cpu else ''
 
-                cmd = " && ".join(f'{{\n{x}\n}}' for x in job._wrapper_code)
+                memory = _job_memory(job)
+                memory = f'-m {memory}' if memory else ''
 
-                quoted_job_script = shq(joined_env + cmd)
+                code.append(f"docker run "
+                            "--entrypoint=''"
+                            f"{self._extra_docker_run_flags} "
+                            f"-v {tmpdir}:{tmpdir} "
+                            f"-w {tmpdir} "
+                            f"{memory} "
+                            f"{cpu} "
+                            f"{job._image} "
+                            f"{job_shell} -c {quoted_job_script}")
+            else:
+                code.append(f"{job_shell} -c {quoted_job_script}")
 
-                if job._image:
-                    cpu = f'--cpus={job._cpu}' if job._cpu else ''
+            output_transfer_dicts = [
+                transfer_dict
+                for output_resource in job._external_outputs
+                for transfer_dict in transfer_dicts_for_resource_file(output_resource)]
+            if call_cache is not None and job in cache_keys:
+                key = cache_keys[job]
+                output_transfer_dicts += [{"from": r._get_path(tmpdir), "to": call_cache.output_path(key, r)}
+                                          for r in cached_outputs(job)]
+            if output_transfer_dicts:
+                output_transfers = orjson.dumps(output_transfer_dicts).decode('utf-8')
+                code += [f'python3 -m hailtop.aiotools.copy {shq(requester_pays_project_json)} {shq(output_transfers)}']
+            if call_cache is not None and job in cache_keys:
+                # the manifest is written last, once the outputs are in the cache
+                key = cache_keys[job]
+                manifest_path = f'{tmpdir}/{job._dirname}/call_cache_manifest.json'
+                manifest_transfers = orjson.dumps([{"from": manifest_path, "to": call_cache.manifest_path(key)}]).decode('utf-8')
+                code += [f'printf %s {shq(call_cache.manifest(key, job).decode("utf-8"))} > {shq(manifest_path)}']
+                code += [f'python3 -m hailtop.aiotools.copy {shq(requester_pays_project_json)} {shq(manifest_transfers)}']
+            code += ['\n']
 
-                    memory = job._memory
-                    if memory is not None:
-                        memory_ratios = {'lowmem': 1024**3, 'standard': 4 * 1024**3, 'highmem': 7 * 1024**3}
-                        if memory in memory_ratios:
-                            if job._cpu is not None:
-                                mcpu = parse_cpu_in_mcpu(job._cpu)
-                                if mcpu is not None:
-                                    memory = str(int(memory_ratios[memory] * (mcpu / 1000)))
-                                else:
-                                    raise BatchException(f'invalid value for cpu: {job._cpu}')
-                            else:
-                                raise BatchException(f'must specify cpu when using {memory} to specify the memory')
-                        memory = f'-m {memory}' if memory else ''
-                    else:
-                        memory = ''
-
-                    code.append(f"docker run "
-                                "--entrypoint=''"
-                                f"{self._extra_docker_run_flags} "
-                                f"-v {tmpdir}:{tmpdir} "
-                                f"-w {tmpdir} "
-                                f"{memory} "
-                                f"{cpu} "
-                                f"{job._image} "
-                                f"{job_shell} -c {quoted_job_script}")
-                else:
-                    code.append(f"{job_shell} -c {quoted_job_script}")
+            return '\n'.join(code)
 
-                output_transfer_dicts = [
-                    transfer_dict
-                    for output_resource in job._external_outputs
-                    for transfer_dict in transfer_dicts_for_resource_file(output_resource)]
-                output_transfers = orjson.dumps(output_transfer_dicts).decode('utf-8')
+        try:
+            scripts = {job: job_code(job) for job in jobs}
 
-                code += [f'python3 -m hailtop.aiotools.copy {shq(requester_pays_project_json)} {shq(output_transfers)}']
-                code += ['\n']
+            # inputs written straight to output destinations and remote inputs
+            # of jobs are all copied up front, in one transfer
+            input_transfer_dicts = [
+                transfer_dict
+                for input_resource in batch._input_resources
+                for transfer_dict in transfer_dicts_for_resource_file(input_resource)]
+            remote_inputs = {
+                r: None
+                for job in jobs
+                for r in job._inputs
+                if isinstance(r, resource.InputResourceFile) and url_scheme(r._input_path) != ''}
+            input_transfer_dicts += [{"from": r._input_path, "to": r._get_path(tmpdir)} for r in remote_inputs]
+
+            # the outputs of cached jobs are copied from the cache
+            if call_cache is not None:
+                for job in cached_jobs:
+                    for r in cached_outputs(job):
+                        cache_path = call_cache.output_path(cache_keys[job], r)
+                        input_transfer_dicts.append({"from": cache_path, "to": r._get_path(tmpdir)})
+                        input_transfer_dicts += [{"from": cache_path, "to": dest} for dest in r._output_paths]
+
+            # local inputs are linked into the scratch directory, or copied if
+            # any job reading them runs in a container, before any job starts,
+            # so that concurrent jobs never stage the same input
+            local_inputs: Dict[resource.InputResourceFile, bool] = {}
+            for job in jobs:
+                for r in job._inputs:
+                    if isinstance(r, resource.InputResourceFile) and r not in remote_inputs:
+                        local_inputs[r] = local_inputs.get(r, False) or job._image is not None
+            input_groups = {
+                r: None
+                for job in jobs
+                for r in job._mentioned
+                if isinstance(r, resource.ResourceGroup) and r._source is None}
+
+            staging_code = new_code_block()
+            staging_code += ["# Stage local input resources"]
+            staging_code += [x for r, copy_file in local_inputs.items() for x in stage_local_input(r, copy_file)]
+            staging_code += [x for r in input_groups for x in symlink_input_resource_group(r)]
+            staging_code += ['\n']
+
+            if dry_run:
+                if input_transfer_dicts:
+                    input_transfers = orjson.dumps(input_transfer_dicts).decode('utf-8')
+                    print(f'# Copy input resources\n'
+                          f'python3 -m hailtop.aiotools.copy {shq(requester_pays_project_json)} {shq(input_transfers)}\n')
+                print('\n'.join(staging_code))
+                for job in batch._jobs:
+                    if job in cached_jobs:
+                        print(f"# {job._job_id}: {job.name if job.name else ''} (cached)\n")
+                    else:
+                        print(scripts[job])
+            else:
+                if input_transfer_dicts:
+                    async_to_blocking(copy_files(
+                        gcs_kwargs={'project': batch.requester_pays_project},
+                        transfers=[make_transfer(transfer_dict) for transfer_dict in input_transfer_dicts]))
+                sp.check_call('\n'.join(staging_code), shell=True)
 
-                run_code(code)
+                async_to_blocking(self._run_jobs(jobs, scripts))
         finally:
             if delete_scratch_on_exit:
                 sp.run(f'rm -rf {tmpdir}', shell=True, check=False)
 
+        if cached_jobs:
+            print(f'{len(cached_jobs)} job(s) were cached and not run.')
         print('Batch completed successfully!')
 
+    async def _run_jobs(self, jobs: List['_job.Job'], scripts: Dict['_job.Job', str]) -> None:
+        """Run the job scripts, each once the jobs it depends on have completed
+        and the cores and memory it requests are free."""
+        cpu_free, memory_free = _host_resources()
+        cpu_capacity, memory_capacity = cpu_free, memory_free
+
+        def request(job) -> Tuple[int, int]:
+            mcpu = parse_cpu_in_mcpu(job._cpu) if job._cpu is not None else 1000
+            if mcpu is None:
+                raise BatchException(f'invalid value for cpu: {job._cpu}')
+            memory = _job_memory(job)
+            memory_bytes = parse_memory_in_bytes(memory) if memory is not None else 0
+            if memory_bytes is None:
+                raise BatchException(f'invalid value for memory: {job._memory}')
+            # a job larger than this computer runs alone
+            return (min(mcpu, cpu_capacity),
+                    min(memory_bytes, memory_capacity) if memory_capacity is not None else 0)
+
+        requests = {job: request(job) for job in jobs}
+        order = {job: i for i, job in enumerate(jobs)}
+        children: Dict['_job.Job', List['_job.Job']] = {job: [] for job in jobs}
+        n_waiting: Dict['_job.Job', int] = {}
+        for job in jobs:
+            # dependencies that are not run, because they are cached, are complete
+            parents = [parent for parent in job._dependencies if parent in children]
+            n_waiting[job] = len(parents)
+            for parent in parents:
+                children[parent].append(job)
+
+        ready = [job for job in jobs if n_waiting[job] == 0]
+        running: Dict[asyncio.Future, '_job.Job'] = {}
+        unsuccessful = set()
+        errors: List[Exception] = []
+        n_skipped = 0
+
+        def finish(job):
+            for child in children[job]:
+                n_waiting[child] -= 1
+                if n_waiting[child] == 0:
+                    ready.append(child)
+            ready.sort(key=order.__getitem__)
+
+        def should_run(job) -> bool:
+            if job._always_run:
+                return True
+            if errors and self._fail_fast:
+                return False
+            return not any(parent in unsuccessful for parent in job._dependencies)
+
+        async def run_script(script: str) -> int:
+            proc = await asyncio.create_subprocess_shell(script)
+            try:
+                return await proc.wait()
+            except asyncio.CancelledError:
+                proc.terminate()
+                raise
+
+        try:
+            while ready or running:
+                i = 0
+                while i < len(ready):
+                    job = ready[i]
+                    if not should_run(job):
+                        del ready[i]
+                        unsuccessful.add(job)
+                        n_skipped += 1
+                        finish(job)
+                        i = 0
+                        continue
+                    mcpu, memory_bytes = requests[job]
+                    if ((self._parallelism is None or len(running) < self._parallelism)
+                            and mcpu <= cpu_free and memory_bytes <= (memory_free or 0)):
+                        del ready[i]
+                        cpu_free -= mcpu
+                        if memory_free is not None:
+                            memory_free -= memory_bytes
+                        running[asyncio.ensure_future(run_script(scripts[job]))] = job
+                        continue
+                    i += 1
+
+                if not running:
+                    assert not ready, ready
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job = running.pop(task)
+                    mcpu, memory_bytes = requests[job]
+                    cpu_free += mcpu
+                    if memory_free is not None:
+                        memory_free += memory_bytes
+                    try:
+                        returncode = task.result()
+                        if returncode != 0:
+                            raise sp.CalledProcessError(returncode, scripts[job])
+                    except Exception as e:  # pylint: disable=broad-except
+                        print(f"Job {job._job_id}{f' ({job.name})' if job.name else ''} failed: {e}")
+                        unsuccessful.add(job)
+                        errors.append(e)
+                    finish(job)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        if errors:
+            if n_skipped:
+                print(f'{len(errors)} job(s) failed, {n_skipped} job(s) were not run')
+            raise errors[0]
+
     def _get_scratch_dir(self):
         def _get_random_name():
             dir = f'{self._tmp_dir}/batch/{uuid.uuid4().hex[:6]}'
@@ -524,7 +719,8 @@ class ServiceBackend(Backend[bc.Batch]):
             attributes['name'] = batch.name
 
         bc_batch = self._batch_client.create_batch(attributes=attributes, callback=callback,
-                                                   token=token, cancel_after_n_failures=batch._cancel_after_n_failures)
+                                                   token=token, cancel_after_n_failures=batch._cancel_after_n_failures,
+                                                   speculative_execution=batch._speculative_execution)
 
         n_jobs_submitted = 0
         used_remote_tmpdir = False
@@ -535,10 +731,20 @@ class ServiceBackend(Backend[bc.Batch]):
 
         bash_flags = 'set -e' + ('x' if verbose else '')
 
+        call_cache = CallCache(self._fs, batch._call_cache) if batch._call_cache is not None else None
+        cache_keys: Dict[_job.Job, str] = {}
+        cached_jobs: Set[_job.Job] = set()
+        if call_cache is not None:
+            cache_keys = await call_cache.keys(batch._jobs)
+            cached_jobs = await call_cache.hits(cache_keys)
+
         def copy_input(r):
             if isinstance(r, resource.InputResourceFile):
                 return [(r._input_path, r._get_path(local_tmpdir))]
             assert isinstance(r, (resource.JobResourceFile, resource.PythonResult))
+            if r._source in cached_jobs:
+                assert call_cache is not None
+                return [(call_cache.output_path(cache_keys[r._source], r), r._get_path(local_tmpdir))]
             return [(r._get_path(batch_remote_tmpdir), r._get_path(local_tmpdir))]
 
         def copy_internal_output(r):
@@ -561,6 +767,11 @@ class ServiceBackend(Backend[bc.Batch]):
             return symlinks
 
         write_external_inputs = [x for r in batch._input_resources for x in copy_external_output(r)]
+        if call_cache is not None:
+            write_external_inputs += [(call_cache.output_path(cache_keys[job], r), dest)
+                                      for job in cached_jobs
+                                      for r in cached_outputs(job)
+                                      for dest in r._output_paths]
         if write_external_inputs:
             transfers_bytes = orjson.dumps([
                 {"from": src, "to": dest}
@@ -590,10 +801,16 @@ class ServiceBackend(Backend[bc.Batch]):
                 used_remote_tmpdir = await job._compile(local_tmpdir, batch_remote_tmpdir, dry_run=dry_run)
                 pbar.update(1)
                 return used_remote_tmpdir
-            used_remote_tmpdir_results = await bounded_gather(*[functools.partial(compile_job, j) for j in batch._jobs], parallelism=150)
+            pbar.update(len(cached_jobs))
+            used_remote_tmpdir_results = await bounded_gather(*[functools.partial(compile_job, j) for j in batch._jobs if j not in cached_jobs], parallelism=150)
             used_remote_tmpdir |= any(used_remote_tmpdir_results)
 
         for job in tqdm(batch._jobs, desc='create job objects', disable=disable_progress_bar):
+            if job in cached_jobs:
+                if dry_run:
+                    commands.append(f'# Job {job._job_id} {f": {job.name}" if job.name else ""} (cached)')
+                continue
+
             inputs = [x for r in job._inputs for x in copy_input(r)]
 
             outputs = [x for r in job._internal_outputs for x in copy_internal_output(r)]
@@ -601,6 +818,14 @@ class ServiceBackend(Backend[bc.Batch]):
                 used_remote_tmpdir = True
             outputs += [x for r in job._external_outputs for x in copy_external_output(r)]
 
+            write_manifest = ''
+            if call_cache is not None and job in cache_keys:
+                key = cache_keys[job]
+                outputs += [(r._get_path(local_tmpdir), call_cache.output_path(key, r)) for r in cached_outputs(job)]
+                manifest_path = f'{local_tmpdir}/{job._dirname}/call_cache_manifest.json'
+                write_manifest = f'printf %s {shq(call_cache.manifest(key, job).decode("utf-8"))} > {shq(manifest_path)}'
+                outputs.append((manifest_path, call_cache.manifest_path(key)))
+
             symlinks = [x for r in job._mentioned for x in symlink_input_resource_group(r)]
 
             if job._image is None:
@@ -616,6 +841,7 @@ class ServiceBackend(Backend[bc.Batch]):
 {make_local_tmpdir}
 {"; ".join(symlinks)}
 {" && ".join(prepared_job_command)}
+{write_manifest}
 '''
 
             user_code = '\n\n'.join(job._user_code) if job._user_code else None
@@ -639,7 +865,7 @@ class ServiceBackend(Backend[bc.Batch]):
                 commands.append(formatted_command)
                 continue
 
-            parents = [job_to_client_job_mapping[j] for j in job._dependencies]
+            parents = [job_to_client_job_mapping[j] for j in job._dependencies if j not in cached_jobs]
 
             attributes = copy.deepcopy(job.attributes) if job.attributes else dict()
             if job.name:
@@ -702,6 +928,8 @@ class ServiceBackend(Backend[bc.Batch]):
 
         if verbose:
             print(f'Built DAG with {n_jobs_submitted} jobs in {round(time.time() - build_dag_start, 3)} seconds.')
+        if cached_jobs:
+            print(f'{len(cached_jobs)} job(s) were cached and not submitted.')
 
         submit_batch_start = time.time()
         batch_handle = bc_batch.submit(disable_progress_bar=disable_progress_bar)
@@ -1,7 +1,8 @@
+import asyncio
 import os
 import warnings
 import re
-from typing import Optional, Dict, Union, List, Any, Set
+from typing import Optional, Dict, Union, List, Any, Set, Tuple
 
 from hailtop.utils import secret_alnum_string, url_scheme
 from hailtop.aiotools import AsyncFS
@@ -86,6 +87,31 @@ class Batch:
         Automatically cancel the batch after N failures have occurred. The default
         behavior is there is no limit on the number of failures. Only
         applicable for the :class:`.ServiceBackend`. Must be greater than 0.
+    call_cache:
+        If not `None`, a directory, such as ``gs://my-bucket/call-cache``, in
+        which to keep the outputs of jobs. A job whose command, image,
+        environment, resources, input files and dependencies are the same as
+        those of a job that completed in an earlier batch using the same
+        directory is not run; its outputs are read from the directory
+        instead. Only Bash jobs are cached.
+    fuse_jobs:
+        If `True`, before running the batch, fuse each chain of Bash jobs in
+        which every job depends only on the previous job, and is the only job
+        that depends on it, into one job, provided the jobs use the same image,
+        shell, environment, resources and mounted buckets, none is set to
+        always run, and no two give an attribute different values. The
+        commands of a fused job run in order in one container, stopping at the
+        first job whose commands fail, and files passed along the chain are
+        kept on the container's disk instead of being uploaded and downloaded
+        between jobs. The fused job has the attributes of all of the jobs.
+        Jobs fused into another cannot be used by jobs added to the batch
+        after it runs.
+    speculative_execution:
+        If `True`, when a job runs much longer than the completed jobs of the
+        batch that request the same resources, start a second attempt of it on
+        another machine. The first attempt to succeed completes the job and
+        the other attempt is cancelled. Only applicable for the
+        :class:`.ServiceBackend`.
 
     """
 
@@ -112,13 +138,18 @@ class Batch:
                  default_shell: Optional[str] = None,
                  default_python_image: Optional[str] = None,
                  project: Optional[str] = None,
-                 cancel_after_n_failures: Optional[int] = None):
+                 cancel_after_n_failures: Optional[int] = None,
+                 call_cache: Optional[str] = None,
+                 fuse_jobs: bool = False,
+                 speculative_execution: bool = False):
         self._jobs: List[job.Job] = []
         self._resource_map: Dict[str, _resource.Resource] = {}
         self._allocated_files: Set[str] = set()
         self._input_resources: Set[_resource.InputResourceFile] = set()
         self._uid = Batch._get_uid()
         self._job_tokens: Set[str] = set()
+        # path of a serialized Python function -> its input resource and its upload
+        self._python_functions: Dict[str, Tuple[_resource.InputResourceFile, Optional[asyncio.Future]]] = {}
 
         self._backend = backend if backend else _backend.LocalBackend()
 
@@ -148,6 +179,9 @@ class Batch:
         self._DEPRECATED_fs: Optional[RouterAsyncFS] = None
 
         self._cancel_after_n_failures = cancel_after_n_failures
+        self._call_cache = call_cache
+        self._fuse_jobs = fuse_jobs
+        self._speculative_execution = speculative_execution
 
     def _unique_job_token(self, n=5):
         token = secret_alnum_string(n)
@@ -575,10 +609,18 @@ class Batch:
             ordered_jobs.append(j)
 
         for j in self._jobs:
+            for p in j._dependencies:
+                if p._fused_into is not None:
+                    raise BatchException(
+                        f"job '{p.name}' was fused into job '{p._fused_into.name}' when this batch last ran, "
+                        f"so job '{j.name}' cannot depend on it or use its resources")
             schedule_job(j)
 
         assert len(seen) == len(self._jobs)
 
+        if self._fuse_jobs:
+            ordered_jobs = self._fuse_chains(ordered_jobs)
+
         job_index = {j: i for i, j in enumerate(ordered_jobs, start=1)}
         for j in ordered_jobs:
             i = job_index[j]
@@ -595,5 +637,76 @@ class Batch:
             self._DEPRECATED_fs = None
         return run_result
 
+    @staticmethod
+    def _can_fuse(parent: job.Job, child: job.Job) -> bool:
+        return (isinstance(parent, job.BashJob)
+                and isinstance(child, job.BashJob)
+                and len(parent._command) > 0
+                and len(child._command) > 0
+                and not parent._always_run
+                and not child._always_run
+                and parent._image == child._image
+                and parent._shell == child._shell
+                and parent._env == child._env
+                and parent._cpu == child._cpu
+                and parent._memory == child._memory
+                and parent._storage == child._storage
+                and parent._machine_type == child._machine_type
+                and parent._preemptible == child._preemptible
+                and parent._cloudfuse == child._cloudfuse
+                and all((parent.attributes or {}).get(k, v) == v for k, v in (child.attributes or {}).items()))
+
+    def _fuse_chains(self, ordered_jobs: List[job.Job]) -> List[job.Job]:
+        """Fuse each job into its only dependency when it is the only job that
+        depends on it. `ordered_jobs` must be in an order in which every job
+        follows its dependencies."""
+        children: Dict[job.Job, Set[job.Job]] = {j: set() for j in ordered_jobs}
+        for j in ordered_jobs:
+            for p in j._dependencies:
+                children[p].add(j)
+
+        fused = set()
+        for child in ordered_jobs:
+            if len(child._dependencies) != 1:
+                continue
+            parent = next(iter(child._dependencies))
+            if children[parent] != {child} or not Batch._can_fuse(parent, child):
+                continue
+
+            assert isinstance(parent, job.BashJob) and isinstance(child, job.BashJob)
+            # the child runs only if the parent's last command succeeded, and
+            # in a directory of its own, as it would in its own job
+            parent._command.append(f'__hail_rc=$?; if [ $__hail_rc -ne 0 ]; then exit $__hail_rc; fi; '
+                                   f'mkdir -p ${{BATCH_TMPDIR}}/{child._dirname}/')
+            parent._command.extend(child._command)
+            parent._fused_dirnames.extend([child._dirname, *child._fused_dirnames])
+
+            # files passed from parent to child stay on the container's disk
+            parent._internal_outputs = child._internal_outputs
+            parent._external_outputs |= child._external_outputs
+            fused_dirnames = {parent._dirname, *parent._fused_dirnames}
+            parent._inputs |= {r for r in child._inputs
+                               if r._source is None or r._source._dirname not in fused_dirnames}
+            parent._mentioned |= child._mentioned
+            parent._valid |= child._valid
+            if child._timeout is not None and parent._timeout is not None:
+                parent._timeout += child._timeout
+            else:
+                parent._timeout = None
+            names = [name for name in (parent.name, child.name) if name]
+            parent.name = ' + '.join(names) if names else None
+            if child.attributes:
+                parent.attributes = {**(parent.attributes or {}), **child.attributes}
+            parent._user_code.extend(child._user_code)
+
+            children[parent] = children.pop(child)
+            for grandchild in children[parent]:
+                grandchild._dependencies.remove(child)
+                grandchild._dependencies.add(parent)
+            child._fused_into = parent
+            fused.add(child)
+
+        return [j for j in ordered_jobs if j not in fused]
+
     def __str__(self):
         return self._uid
@@ -1,13 +1,17 @@
-from typing import Optional, Callable, Type, Union, List, Any, Iterable
+from typing import Optional, Callable, Type, Union, List, Any, Iterable, Dict, Tuple, Set
 from types import TracebackType
 from io import BytesIO
+from shlex import quote as shq
 import asyncio
+import base64
 import concurrent
 import dill
 import functools
+import logging
 import sys
+import time
 
-from hailtop.utils import secret_alnum_string, partition
+from hailtop.utils import secret_alnum_string, partition, url_scheme
 import hailtop.batch_client.aioclient as low_level_batch_client
 from hailtop.batch_client.parse import parse_cpu_in_mcpu
 from hailtop.aiotools.router_fs import RouterAsyncFS
@@ -15,6 +19,8 @@ from hailtop.aiotools.router_fs import RouterAsyncFS
 from .batch import Batch
 from .backend import ServiceBackend
 
+log = logging.getLogger('batch_pool_executor')
+
 
 if sys.version_info < (3, 7):
     def create_task(coro, *, name=None):  # pylint: disable=unused-argument
@@ -42,6 +48,93 @@ def async_to_blocking(coro):
     return asyncio.get_event_loop().run_until_complete(coro)
 
 
+def value_or_raise(value, traceback):
+    if traceback is None:
+        return value
+    assert isinstance(value, BaseException)
+    traceback = ''.join(traceback)
+    raise ValueError(f'submitted job failed:\n{traceback}')
+
+
+# Run by each worker job of a BatchPoolExecutor with `n_workers`. The worker
+# runs the tasks that appear in its tasks directory, writing each result to a
+# file of the same name in its results directory and then deleting the task,
+# until the executor writes a stop file or no task arrives for the idle
+# timeout. Directories are listed, rather than files checked for, because
+# gcsfuse caches missing files.
+WORKER_SCRIPT = '''
+import os
+import sys
+import time
+import traceback
+import dill
+
+worker_dir = sys.argv[1]
+idle_timeout = float(sys.argv[2])
+tasks_dir = os.path.join(worker_dir, 'tasks')
+results_dir = os.path.join(worker_dir, 'results')
+os.makedirs(results_dir, exist_ok=True)
+
+done = set()
+idle_since = time.time()
+delay = 0.1
+while True:
+    try:
+        names = os.listdir(worker_dir)
+        listed = set(os.listdir(tasks_dir)) if 'tasks' in names else set()
+    except FileNotFoundError:
+        break
+    # a deleted task may still be listed for a while
+    done &= listed
+    pending = sorted(listed - done)
+    if not pending:
+        if 'stop' in names or time.time() - idle_since > idle_timeout:
+            break
+        time.sleep(delay)
+        delay = min(2 * delay, 2.0)
+        continue
+    for name in pending:
+        task_path = os.path.join(tasks_dir, name)
+        done.add(name)
+        try:
+            with open(task_path, 'rb') as f:
+                task = f.read()
+        except FileNotFoundError:
+            # cancelled
+            continue
+        try:
+            result = dill.dumps((dill.loads(task)(), None), recurse=True)
+        except Exception as e:
+            print('BatchPoolExecutor encountered an exception:')
+            traceback.print_exc()
+            result = dill.dumps((e, traceback.format_exception(type(e), e, e.__traceback__)), recurse=True)
+        with open(os.path.join(results_dir, name), 'wb') as out:
+            out.write(result)
+        try:
+            os.remove(task_path)
+        except FileNotFoundError:
+            pass
+    idle_since = time.time()
+    delay = 0.1
+'''
+
+
+async def remove_if_exists(fs: RouterAsyncFS, url: str):
+    try:
+        await fs.remove(url)
+    except FileNotFoundError:
+        pass
+
+
+def bucket_and_path(url: str) -> Tuple[str, str]:
+    """The bucket, as accepted by :meth:`.Job.cloudfuse`, and the path within
+    it, of a cloud storage URL."""
+    scheme = url_scheme(url)
+    parts = url[len(scheme) + 3:].split('/')
+    n_bucket_parts = 2 if scheme == 'hail-az' else 1
+    return '/'.join(parts[:n_bucket_parts]), '/'.join(parts[n_bucket_parts:])
+
+
 class BatchPoolExecutor:
     """An executor which executes Python functions in the cloud.
 
@@ -114,6 +207,27 @@ class BatchPoolExecutor:
         If specified, the project to use when authenticating with Google
         Storage. Google Storage is used to transfer serialized values between
         this computer and the cloud machines that execute jobs.
+    n_workers:
+        If specified, run every submitted function on one of this many
+        long-lived worker jobs, started with the first submission, instead of
+        in a new batch of its own. See the notes.
+    worker_idle_timeout:
+        When `n_workers` is specified, the number of seconds after which a
+        worker with no tasks exits. Workers also exit when the executor is
+        shut down. A worker that has exited is replaced when tasks are next
+        sent to it.
+
+    Notes
+    -----
+    By default, every submitted function runs in a batch of its own, which
+    takes tens of seconds to schedule and start. For many short functions,
+    specify `n_workers`. The executor then starts that many worker jobs once,
+    mounting the bucket of the `backend`'s remote temporary directory with
+    :meth:`.Job.cloudfuse`. Each function is written to the tasks folder of the
+    worker with the fewest outstanding tasks, and its result is read back from
+    the worker's results folder, so each call costs one small write and one
+    small read. :meth:`.map` groups values into a few chunks per worker unless
+    `chunksize` is given.
     """
 
     def __init__(self, *,
@@ -123,7 +237,9 @@ class BatchPoolExecutor:
                  cpus_per_job: Optional[Union[int, str]] = None,
                  wait_on_exit: bool = True,
                  cleanup_bucket: bool = True,
-                 project: Optional[str] = None):
+                 project: Optional[str] = None,
+                 n_workers: Optional[int] = None,
+                 worker_idle_timeout: Union[int, float] = 600):
         self.name = name or "BatchPoolExecutor-" + secret_alnum_string(4)
         self.backend = backend or ServiceBackend()
         if not isinstance(self.backend, ServiceBackend):
@@ -147,6 +263,9 @@ class BatchPoolExecutor:
         self.cpus_per_job = cpus_per_job
         self.cleanup_bucket = cleanup_bucket
         self.wait_on_exit = wait_on_exit
+        if n_workers is not None and n_workers < 1:
+            raise ValueError(f'n_workers must be positive, found {n_workers}')
+        self._pool = WorkerPool(self, n_workers, worker_idle_timeout) if n_workers is not None else None
 
     def __enter__(self):
         return self
@@ -155,7 +274,7 @@ class BatchPoolExecutor:
             fn: Callable,
             *iterables: Iterable[Any],
             timeout: Optional[Union[int, float]] = None,
-            chunksize: int = 1):
+            chunksize: Optional[int] = None):
         """Call `fn` on cloud machines with arguments from `iterables`.
 
         This function returns a generator which will produce each result in the
@@ -210,7 +329,9 @@ class BatchPoolExecutor:
             containers take about 5 seconds to start. Ideally, each task should
             take an order of magnitude more time than start-up time. You can
             make the chunksize larger to reduce parallelism but increase the
-            amount of meaningful work done per-container.
+            amount of meaningful work done per-container. If unspecified, it is
+            ``1``, or, with `n_workers`, chosen to give each worker about four
+            chunks.
         """
 
         agen = async_to_blocking(
@@ -228,11 +349,19 @@ class BatchPoolExecutor:
                         fn: Callable,
                         iterables: Iterable[Iterable[Any]],
                         timeout: Optional[Union[int, float]] = None,
-                        chunksize: int = 1):
+                        chunksize: Optional[int] = None):
         """Aysncio compatible version of :meth:`.map`."""
         if not iterables:
             return iter([])
 
+        if chunksize is None:
+            chunksize = 1
+            if self._pool is not None:
+                iterables = [list(x) for x in iterables]
+                # a few chunks per worker balance the load while keeping the
+                # number of reads and writes small
+                chunksize = max(1, len(iterables[0]) // (4 * self._pool.n_workers))
+
         if chunksize > 1:
             list_per_argument = [list(x) for x in iterables]
             n = len(list_per_argument[0])
@@ -340,6 +469,10 @@ class BatchPoolExecutor:
         if self._shutdown:
             raise RuntimeError('BatchPoolExecutor has already been shutdown.')
 
+        if self._pool is not None:
+            name, result = await self._pool.submit(unapplied, args, kwargs)
+            return WorkerPoolFuture(self, self._pool, name, result)
+
         try:
             name = unapplied.__name__
         except AttributeError:
@@ -358,15 +491,7 @@ class BatchPoolExecutor:
         await self.fs.write(pickledfun_remote, pipe.getvalue())
         pickledfun_local = batch.read_input(pickledfun_remote)
 
-        thread_limit = "1"
-        if self.cpus_per_job:
-            j.cpu(self.cpus_per_job)
-            thread_limit = str(int(max(1.0, cpu_spec_to_float(self.cpus_per_job))))
-        j.env("OMP_NUM_THREADS", thread_limit)
-        j.env("OPENBLAS_NUM_THREADS", thread_limit)
-        j.env("MKL_NUM_THREADS", thread_limit)
-        j.env("VECLIB_MAXIMUM_THREADS", thread_limit)
-        j.env("NUMEXPR_NUM_THREADS", thread_limit)
+        self._configure_job(j)
 
         j.command('set -ex')
         j.command(f'''python3 -c "
@@ -396,6 +521,17 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
             await backend_batch.cancel()
             raise
 
+    def _configure_job(self, j):
+        thread_limit = "1"
+        if self.cpus_per_job:
+            j.cpu(self.cpus_per_job)
+            thread_limit = str(int(max(1.0, cpu_spec_to_float(self.cpus_per_job))))
+        j.env("OMP_NUM_THREADS", thread_limit)
+        j.env("OPENBLAS_NUM_THREADS", thread_limit)
+        j.env("MKL_NUM_THREADS", thread_limit)
+        j.env("VECLIB_MAXIMUM_THREADS", thread_limit)
+        j.env("NUMEXPR_NUM_THREADS", thread_limit)
+
     def __exit__(self,
                  exc_type: Optional[Type[BaseException]],
                  exc_value: Optional[BaseException],
@@ -431,11 +567,15 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
                     pass
             async_to_blocking(
                 asyncio.gather(*[ignore_exceptions(f) for f in self.futures]))
+        if self._pool is not None:
+            async_to_blocking(self._pool.stop())
         if self.finished_future_count == len(self.futures):
             self._cleanup()
         self._shutdown = True
 
     def _cleanup(self):
+        if self._pool is not None:
+            async_to_blocking(self._pool.close())
         if self.cleanup_bucket:
             async_to_blocking(self.fs.rmtree(None, self.directory))
         async_to_blocking(self.fs.close())
@@ -547,12 +687,7 @@ class BatchPoolFuture:
                 job_log = await self.job.log()
                 raise ValueError(
                     f"submitted job did not write output:\n{main_container_status}\n\nLog:\n{job_log}") from exc
-            if traceback is None:
-                return value
-            assert isinstance(value, BaseException)
-            self.value = None
-            traceback = ''.join(traceback)
-            raise ValueError(f'submitted job failed:\n{traceback}')
+            return value_or_raise(value, traceback)
         finally:
             await self.batch.cancel()
             self.executor._finish_future()
@@ -568,3 +703,234 @@ class BatchPoolFuture:
         """NOT IMPLEMENTED
         """
         raise NotImplementedError()
+
+
+class WorkerPool:
+    """The long-lived worker jobs of a :class:`.BatchPoolExecutor`.
+
+    Tasks are sent to a worker by writing them to its tasks folder, and their
+    results are read from its results folder, polling only the workers with
+    outstanding tasks. A worker that has exited, because it was idle or
+    failed, is replaced by a new worker job, with a new folder, the next time
+    a task is sent to it.
+    """
+
+    POLL_INTERVAL_SECS = 0.5
+    STATUS_INTERVAL_SECS = 30
+    MOUNT_POINT = '/batch-pool-executor'
+
+    def __init__(self, executor: BatchPoolExecutor, n_workers: int, idle_timeout: Union[int, float]):
+        self.executor = executor
+        self.n_workers = n_workers
+        self.idle_timeout = idle_timeout
+        self.directory = executor.directory + 'workers/'
+        self.batches: List[low_level_batch_client.Batch] = []
+        self.n_started = 0
+        # for each worker, its job and folder, or None if it has exited
+        self.jobs: List[Optional[low_level_batch_client.Job]] = [None] * n_workers
+        self.worker_directories: List[Optional[str]] = [None] * n_workers
+        # for each worker, the name of each outstanding task -> its result
+        self.outstanding: List[Dict[str, asyncio.Future]] = [{} for _ in range(n_workers)]
+        # for each worker, the number of tasks being written to it
+        self.n_writing = [0] * n_workers
+        self.idle_since = [time.time()] * n_workers
+        # results of cancelled tasks, which are deleted when they appear
+        self.abandoned: Set[str] = set()
+        self.n_submitted = 0
+        self.stopped = False
+        self.lock = asyncio.Lock()
+        self.poll_task: Optional[asyncio.Future] = None
+
+    async def _start_workers(self, workers: List[int]):
+        for worker in workers:
+            self.worker_directories[worker] = f'{self.directory}{self.n_started}/'
+            self.n_started += 1
+        # gcsfuse caches folders that do not exist, so create them first
+        await asyncio.gather(*[self.executor.fs.write(self.worker_directories[worker] + 'started', b'')
+                               for worker in workers])
+        if self.stopped:
+            await asyncio.gather(*[self.executor.fs.write(self.worker_directories[worker] + 'stop', b'')
+                                   for worker in workers])
+
+        code = f'import base64; exec(base64.b64decode("{base64.b64encode(WORKER_SCRIPT.encode()).decode()}"))'
+        batch = Batch(name=self.executor.name + '-workers',
+                      backend=self.executor.backend,
+                      default_image=self.executor.image)
+        self.executor.batches.append(batch)
+        for worker in workers:
+            bucket, path = bucket_and_path(self.worker_directories[worker])
+            j = batch.new_job(f'worker-{worker}')
+            self.executor._configure_job(j)
+            j.cloudfuse(bucket, WorkerPool.MOUNT_POINT, read_only=False)
+            j.command(f'python3 -c {shq(code)} {shq(f"{WorkerPool.MOUNT_POINT}/{path}")} {self.idle_timeout}')
+        backend_batch = batch.run(wait=False, disable_progress_bar=True)._async_batch
+        self.batches.append(backend_batch)
+        for i, worker in enumerate(workers):
+            self.jobs[worker] = low_level_batch_client.Job.submitted_job(backend_batch, i + 1)
+            self.idle_since[worker] = time.time()
+        if self.poll_task is None:
+            self.poll_task = asyncio.ensure_future(self._poll())
+
+    async def _exited_idle(self, worker: int) -> bool:
+        job = self.jobs[worker]
+        assert job is not None
+        # the worker's idle time began before ours
+        if self.outstanding[worker] or time.time() - self.idle_since[worker] < self.idle_timeout / 2:
+            return False
+        return await job.is_complete()
+
+    async def _choose_worker(self) -> int:
+        async with self.lock:
+            if not self.batches:
+                await self._start_workers(list(range(self.n_workers)))
+            worker = min(range(self.n_workers), key=lambda w: len(self.outstanding[w]))
+            if self.jobs[worker] is None or await self._exited_idle(worker):
+                await self._start_workers([worker])
+            return worker
+
+    async def _send(self, name: str, task: bytes, result: asyncio.Future):
+        worker = await self._choose_worker()
+        directory = self.worker_directories[worker]
+        self.outstanding[worker][name] = result
+        self.n_writing[worker] += 1
+        try:
+            await self.executor.fs.write(f'{directory}tasks/{name}', task)
+        except:
+            del self.outstanding[worker][name]
+            raise
+        finally:
+            self.n_writing[worker] -= 1
+
+    async def submit(self, unapplied: Callable, args, kwargs) -> Tuple[str, asyncio.Future]:
+        name = f'{self.n_submitted:012d}'
+        self.n_submitted += 1
+        result = asyncio.get_event_loop().create_future()
+        await self._send(name, dill.dumps(functools.partial(unapplied, *args, **kwargs), recurse=True), result)
+        return name, result
+
+    async def cancel(self, name: str):
+        """Stop waiting for a task, and delete it if its worker has not run it."""
+        for worker, outstanding in enumerate(self.outstanding):
+            if name in outstanding:
+                del outstanding[name]
+                if not outstanding:
+                    self.idle_since[worker] = time.time()
+                directory = self.worker_directories[worker]
+                self.abandoned.add(f'{directory}results/{name}')
+                await remove_if_exists(self.executor.fs, f'{directory}tasks/{name}')
+                return
+
+    async def _fetch_results(self, worker: int):
+        results_directory = f'{self.worker_directories[worker]}results/'
+        try:
+            names = [entry.name() async for entry in await self.executor.fs.listfiles(results_directory)]
+        except FileNotFoundError:
+            return
+        abandoned = [results_directory + name for name in names if results_directory + name in self.abandoned]
+        names = [name for name in names if name in self.outstanding[worker]]
+        values = await asyncio.gather(*[self.executor.fs.read(results_directory + name) for name in names])
+        for name, value in zip(names, values):
+            result = self.outstanding[worker].pop(name, None)
+            if result is not None and not result.done():
+                try:
+                    result.set_result(dill.loads(value))
+                except Exception as e:  # pylint: disable=broad-except
+                    result.set_exception(e)
+        if not self.outstanding[worker]:
+            self.idle_since[worker] = time.time()
+        await asyncio.gather(*[remove_if_exists(self.executor.fs, path)
+                               for path in abandoned + [results_directory + name for name in names]])
+        self.abandoned.difference_update(abandoned)
+
+    async def _worker_exited(self, worker: int, job: low_level_batch_client.Job):
+        directory = self.worker_directories[worker]
+        outstanding = self.outstanding[worker]
+        self.jobs[worker] = None
+        self.outstanding[worker] = {}
+        if not outstanding:
+            return
+        if job._status['state'] == 'Success':
+            # the worker exited for lack of tasks just before these arrived,
+            # so they never ran
+            for name, result in outstanding.items():
+                try:
+                    await self._send(name, await self.executor.fs.read(f'{directory}tasks/{name}'), result)
+                except Exception as e:  # pylint: disable=broad-except
+                    if not result.done():
+                        result.set_exception(e)
+        else:
+            job_log = await job.log()
+            exc = ValueError(
+                f'worker job exited with {len(outstanding)} outstanding tasks:\n\nLog:\n{job_log}')
+            for result in outstanding.values():
+                if not result.done():
+                    result.set_exception(exc)
+
+    async def _check_workers(self):
+        for worker in range(self.n_workers):
+            job = self.jobs[worker]
+            if job is None or not self.outstanding[worker] or self.n_writing[worker] > 0:
+                continue
+            if await job.is_complete():
+                # the worker may have written results just before exiting
+                await self._fetch_results(worker)
+                await self._worker_exited(worker, job)
+
+    async def _poll(self):
+        last_status_check = time.time()
+        while not (self.stopped and not any(self.outstanding)):
+            try:
+                await asyncio.gather(*[self._fetch_results(worker)
+                                       for worker in range(self.n_workers)
+                                       if self.outstanding[worker]])
+                if time.time() - last_status_check > WorkerPool.STATUS_INTERVAL_SECS:
+                    last_status_check = time.time()
+                    await self._check_workers()
+            except Exception:  # pylint: disable=broad-except
+                log.exception('BatchPoolExecutor failed to poll its workers, will retry')
+            await asyncio.sleep(WorkerPool.POLL_INTERVAL_SECS)
+
+    async def stop(self):
+        """Let the workers exit once they have run every task sent to them."""
+        if not self.stopped:
+            self.stopped = True
+            await asyncio.gather(*[self.executor.fs.write(directory + 'stop', b'')
+                                   for directory, job in zip(self.worker_directories, self.jobs)
+                                   if job is not None])
+
+    async def close(self):
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+        await asyncio.gather(*[batch.cancel() for batch in self.batches])
+
+
+class WorkerPoolFuture(BatchPoolFuture):
+    def __init__(self,  # pylint: disable=super-init-not-called
+                 executor: BatchPoolExecutor,
+                 pool: WorkerPool,
+                 name: str,
+                 result: asyncio.Future):
+        self.executor = executor
+        self.pool = pool
+        self.name = name
+        self.result_future = result
+        self.fetch_coro = asyncio.ensure_future(self._async_fetch_result())
+        executor._add_future(self)
+
+    async def async_cancel(self):
+        """Asynchronously cancel this task, removing it from its worker's
+        queue if the worker has not run it yet.
+
+        ``True`` is returned if the task is cancelled. ``False`` is returned if
+        the task has already completed.
+        """
+        cancelled = await super().async_cancel()
+        if cancelled:
+            await self.pool.cancel(self.name)
+        return cancelled
+
+    async def _async_fetch_result(self):
+        try:
+            return value_or_raise(*await self.result_future)
+        finally:
+            self.executor._finish_future()
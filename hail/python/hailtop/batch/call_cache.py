@@ -0,0 +1,200 @@
+from typing import Dict, List, Set, Tuple, Union
+import asyncio
+import functools
+import hashlib
+import os
+
+import orjson
+
+from hailtop.aiotools import AsyncFS
+from hailtop.utils import bounded_gather, url_scheme
+
+from . import resource, job as _job
+
+
+class CallCache:
+    """The outputs of jobs from earlier batches, keyed by what determines
+    them.
+
+    A job's key is a hash of its command, image, shell, environment and
+    resources, of the contents of its input files, and of the keys of the jobs
+    it depends on. Paths in the command, which are different in every batch,
+    are replaced by the file or job they refer to before hashing.
+
+    When a job with a key completes, the files it produces that are read by
+    later jobs or written to outputs are copied to
+    ``{location}/outputs/{key}/`` and a manifest listing them is written to
+    ``{location}/manifests/{key}.json``. A later job with the same key whose
+    outputs are all in the cache is not run; its outputs are read from the
+    cache instead.
+
+    Only Bash jobs that do not always run and do not mount buckets with
+    :meth:`.BashJob.cloudfuse`, and whose dependencies can all be cached, are
+    cached.
+    """
+
+    def __init__(self, fs: AsyncFS, location: str):
+        self._fs = fs
+        self.location = location.rstrip('/')
+        self._digests: Dict[str, str] = {}
+
+    def manifest_path(self, key: str) -> str:
+        return f'{self.location}/manifests/{key}.json'
+
+    def output_path(self, key: str, r: resource.JobResourceFile) -> str:
+        return f'{self.location}/outputs/{key}/{_output_name(r)}'
+
+    def manifest(self, key: str, job: '_job.Job') -> bytes:
+        return orjson.dumps({'key': key,
+                             'outputs': {_output_name(r): self.output_path(key, r) for r in cached_outputs(job)}})
+
+    async def _file_digest(self, url: str) -> str:
+        status = await self._fs.statfile(url)
+        # cloud storage already has a checksum of the contents
+        for field in ('md5Hash', 'crc32c'):
+            try:
+                return f'{field}:{await status[field]}'
+            except KeyError:
+                pass
+        h = hashlib.sha256()
+        async with await self._fs.open(url) as f:
+            while True:
+                b = await f.read(8 * 1024 * 1024)
+                if not b:
+                    break
+                h.update(b)
+        return f'sha256:{h.hexdigest()}'
+
+    async def _digest(self, url: str) -> str:
+        url = _normalize(url)
+        if url not in self._digests:
+            if await self._fs.isfile(url):
+                digest = await self._file_digest(url)
+            else:
+                base = url.rstrip('/') + '/'
+                files = []
+                async for entry in await self._fs.listfiles(url, recursive=True):
+                    file_url = await entry.url()
+                    files.append((file_url[len(base):], await self._file_digest(file_url)))
+                digest = 'dir:' + hashlib.sha256(orjson.dumps(sorted(files))).hexdigest()
+            self._digests[url] = digest
+        return self._digests[url]
+
+    async def keys(self, jobs: List['_job.Job']) -> Dict['_job.Job', str]:
+        """Keys of the jobs that can be cached. Keys must be computed before
+        jobs are compiled, and `jobs` must be in an order in which every job
+        follows its dependencies."""
+        input_files = {r for j in jobs for r in j._inputs if isinstance(r, resource.InputResourceFile)}
+        await bounded_gather(*[functools.partial(self._digest, r._input_path) for r in input_files], parallelism=50)
+
+        keys: Dict[_job.Job, str] = {}
+        for j in jobs:
+            if not _cacheable(j) or any(p not in keys for p in j._dependencies):
+                continue
+
+            # command paths are '${BATCH_TMPDIR}' followed by the path of the
+            # resource relative to the scratch directory
+            owners = {j._dirname: 'self'}
+            owners.update({dirname: f'self:{i}' for i, dirname in enumerate(j._fused_dirnames, start=1)})
+            owners.update({p._dirname: keys[p] for p in j._dependencies})
+            substitutions: List[Tuple[str, str]] = [(f'/{dirname}/', f'<{owner}>/') for dirname, owner in owners.items()]
+            # file names and resource group roots may be random, so refer to
+            # job resources by the names they were declared with
+            substitutions += [(r._get_path(''), f'<{owners[r._source._dirname]}>/{_resource_name(r)}')
+                              for r in j._mentioned
+                              if isinstance(r, (resource.JobResourceFile, resource.ResourceGroup))
+                              and r._source is not None and r._source._dirname in owners]
+            groups: Dict[str, List[str]] = {}
+            for r in j._inputs:
+                if isinstance(r, resource.InputResourceFile):
+                    # an input's path, and the path of its group, start with a
+                    # random token unique to the input or its group
+                    token = r._value.split('/')[0]
+                    groups.setdefault(token, []).append(self._digests[_normalize(r._input_path)])
+            substitutions += [(f'/inputs/{token}', '<input:' + hashlib.sha256(orjson.dumps(sorted(digests))).hexdigest() + '>')
+                              for token, digests in groups.items()]
+
+            command = '\n'.join(j._command)
+            for path, label in sorted(substitutions, key=lambda s: -len(s[0])):
+                command = command.replace(path, label)
+
+            key_data = {
+                'command': command,
+                'image': j._image,
+                'shell': j._shell,
+                'env': j._env,
+                'cpu': j._cpu,
+                'memory': j._memory,
+                'storage': j._storage,
+                'dependencies': sorted(keys[p] for p in j._dependencies),
+            }
+            keys[j] = hashlib.sha256(orjson.dumps(key_data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        return keys
+
+    async def _hit(self, key: str, j: '_job.Job') -> bool:
+        try:
+            manifest = orjson.loads(await self._fs.read(self.manifest_path(key)))
+        except FileNotFoundError:
+            return False
+        outputs = manifest.get('outputs', {})
+        needed = [_output_name(r) for r in cached_outputs(j)]
+        if any(value not in outputs for value in needed):
+            return False
+        # the manifest may have been written before all outputs were copied
+        exist = await asyncio.gather(*[self._fs.exists(outputs[value]) for value in needed])
+        return all(exist)
+
+    async def hits(self, keys: Dict['_job.Job', str]) -> Set['_job.Job']:
+        """The jobs whose outputs are all in the cache."""
+        jobs = list(keys)
+        results = await bounded_gather(*[functools.partial(self._hit, keys[j], j) for j in jobs], parallelism=50)
+        return {j for j, hit in zip(jobs, results) if hit}
+
+
+def cached_outputs(j: '_job.Job') -> List[resource.JobResourceFile]:
+    """The files produced by a job that are kept in the cache: those read by
+    other jobs or written to outputs."""
+    outputs = {r for r in j._internal_outputs | j._external_outputs if isinstance(r, resource.JobResourceFile)}
+    return sorted(outputs, key=lambda r: r._value)
+
+
+def _output_name(r: resource.JobResourceFile) -> str:
+    """The name of a file in the cache, unique among the files of a job,
+    including the files of jobs fused into it."""
+    source = r._source
+    job = source
+    while job._fused_into is not None:
+        job = job._fused_into
+    if job is source:
+        return _resource_name(r)
+    return f'{job._fused_dirnames.index(source._dirname) + 1}/{_resource_name(r)}'
+
+
+def _resource_name(r: Union[resource.JobResourceFile, resource.ResourceGroup]) -> str:
+    """The name a job's file or resource group was declared with, which,
+    unlike its path, is the same in every batch."""
+    assert r._source is not None
+    for name, declared in r._source._resources.items():
+        if declared is r:
+            return name
+        if isinstance(declared, resource.ResourceGroup):
+            for member, f in declared._resources.items():
+                if f is r:
+                    return f'{name}.{member}'
+    if isinstance(r, resource.ResourceGroup):
+        return r._root
+    assert r._value is not None
+    return r._value
+
+
+def _cacheable(j: '_job.Job') -> bool:
+    return (isinstance(j, _job.BashJob)
+            and len(j._command) > 0
+            and not j._always_run
+            and not j._cloudfuse)
+
+
+def _normalize(url: str) -> str:
+    if url_scheme(url) == '':
+        return os.path.abspath(os.path.expanduser(url))
+    return url
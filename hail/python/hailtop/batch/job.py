@@ -1,13 +1,14 @@
 import re
 
+import asyncio
+import base64
+import hashlib
 import warnings
 import dill
 import os
-import functools
 import inspect
 import textwrap
 from shlex import quote as shq
-from io import BytesIO
 from typing import Union, Optional, Dict, List, Set, Tuple, Callable, Any, cast
 
 from . import backend, resource as _resource, batch  # pylint: disable=cyclic-import
@@ -96,6 +97,8 @@ class Job:
         self._mentioned: Set[_resource.Resource] = set()  # resources used in the command
         self._valid: Set[_resource.Resource] = set()  # resources declared in the appropriate place
         self._dependencies: Set[Job] = set()
+        self._fused_dirnames: List[str] = []  # directories of jobs fused into this one
+        self._fused_into: Optional[Job] = None
 
         def safe_str(s):
             new_s = []
@@ -817,6 +820,9 @@ class PythonJob(Job):
     instead.
     """
 
+    # serialized arguments of at most this many bytes are stored in the job's command
+    _INLINE_ARGUMENTS_LIMIT = 4 * 1024
+
     def __init__(self,
                  batch: 'batch.Batch',
                  token: str,
@@ -1025,6 +1031,27 @@ class PythonJob(Job):
 
         return result
 
+    async def _upload_function(self, unapplied: Callable, remote_tmpdir: str, dry_run: bool) -> '_resource.InputResourceFile':
+        """Serialize `unapplied` with the globals it captures and upload it,
+        once per batch, to a path named by the hash of its contents."""
+        function_bytes = dill.dumps(unapplied, recurse=True)
+        digest = hashlib.sha256(function_bytes).hexdigest()
+        function_path = f'{remote_tmpdir}/python-functions/{digest}.p'
+
+        functions = self._batch._python_functions
+        if function_path not in functions:
+            async def upload():
+                await self._batch._fs.makedirs(os.path.dirname(function_path), exist_ok=True)
+                await self._batch._fs.write(function_path, function_bytes)
+
+            functions[function_path] = (self._batch.read_input(function_path),
+                                        None if dry_run else asyncio.ensure_future(upload()))
+
+        function, uploaded = functions[function_path]
+        if uploaded is not None:
+            await uploaded
+        return function
+
     async def _compile(self, local_tmpdir, remote_tmpdir, *, dry_run=False):
         for i, (result, unapplied, args, kwargs) in enumerate(self._functions):
             def prepare_argument_for_serialization(arg):
@@ -1037,38 +1064,27 @@ class PythonJob(Job):
                                           for name, resource in arg._resources.items()})
                 return ('value', arg)
 
-            def deserialize_argument(arg):
-                typ, val = arg
-                if typ == 'py_path':
-                    return dill.load(open(val, 'rb'))
-                if typ in ('path', 'dict_path'):
-                    return val
-                assert typ == 'value'
-                return val
-
-            def wrap(f):
-                @functools.wraps(f)
-                def wrapped(*args, **kwargs):
-                    args = [deserialize_argument(arg) for arg in args]
-                    kwargs = {kw: deserialize_argument(arg) for kw, arg in kwargs.items()}
-                    return f(*args, **kwargs)
-                return wrapped
-
             args = [prepare_argument_for_serialization(arg) for arg in args]
             kwargs = {kw: prepare_argument_for_serialization(arg) for kw, arg in kwargs.items()}
 
-            pipe = BytesIO()
-            dill.dump(functools.partial(wrap(unapplied), *args, **kwargs), pipe, recurse=True)
-            pipe.seek(0)
+            # the function is shared by every call of it in the batch, and only
+            # the arguments of this call are stored with the job: inline if
+            # small, and otherwise in a file of their own
+            function = await self._upload_function(unapplied, remote_tmpdir, dry_run)
 
-            job_path = os.path.dirname(result._get_path(remote_tmpdir))
-            code_path = f'{job_path}/code{i}.p'
+            arguments_bytes = dill.dumps((args, kwargs), recurse=True)
+            if len(arguments_bytes) <= PythonJob._INLINE_ARGUMENTS_LIMIT:
+                load_arguments = f'dill.loads(base64.b64decode(\\"{base64.b64encode(arguments_bytes).decode()}\\"))'
+            else:
+                job_path = os.path.dirname(result._get_path(remote_tmpdir))
+                arguments_path = f'{job_path}/arguments{i}.p'
 
-            if not dry_run:
-                await self._batch._fs.makedirs(os.path.dirname(code_path), exist_ok=True)
-                await self._batch._fs.write(code_path, pipe.getvalue())
+                if not dry_run:
+                    await self._batch._fs.makedirs(os.path.dirname(arguments_path), exist_ok=True)
+                    await self._batch._fs.write(arguments_path, arguments_bytes)
 
-            code = self._batch.read_input(code_path)
+                arguments = self._batch.read_input(arguments_path)
+                load_arguments = f'dill.load(open(\\"{arguments}\\", \\"rb\\"))'
 
             json_write = ''
             if result._json:
@@ -1099,10 +1115,21 @@ import traceback
 import json
 import sys
 
+def deserialize_argument(arg):
+    typ, val = arg
+    if typ == \\"py_path\\":
+        with open(val, \\"rb\\") as f:
+            return dill.load(f)
+    return val
+
 with open(\\"{result}\\", \\"wb\\") as dill_out:
     try:
-        with open(\\"{code}\\", \\"rb\\") as f:
-            result = dill.load(f)()
+        with open(\\"{function}\\", \\"rb\\") as f:
+            function = dill.load(f)
+            args, kwargs = {load_arguments}
+            args = [deserialize_argument(arg) for arg in args]
+            kwargs = {{kw: deserialize_argument(arg) for kw, arg in kwargs.items()}}
+            result = function(*args, **kwargs)
             dill.dump(result, dill_out, recurse=True)
             {json_write}
             {str_write}
@@ -1,16 +1,17 @@
-from typing import Optional, Dict, Any, List, Tuple, Union
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
 import math
+import itertools
+import time
 import random
 import logging
 import json
-import functools
 import asyncio
 import aiohttp
 import secrets
 
 from hailtop.config import get_deploy_config, DeployConfig
 from hailtop.auth import service_auth_headers
-from hailtop.utils import bounded_gather, request_retry_transient_errors, tqdm, TqdmDisableOption
+from hailtop.utils import request_retry_transient_errors, tqdm, TqdmDisableOption
 from hailtop import httpx
 
 from .globals import tasks, complete_states
@@ -419,8 +420,48 @@ class Batch:
         await self._client._delete(f'/api/v1alpha/batches/{self.id}')
 
 
+class _AdaptiveParallelism:
+    '''Additive-increase, multiplicative-decrease bound on the number of
+    bunches uploaded concurrently.
+
+    The limit grows by one after every bunch whose latency is close to the
+    best latency observed so far and is halved when a bunch takes much
+    longer, which indicates that the front end (or the database behind
+    it) is saturated.
+    '''
+
+    INITIAL_PARALLELISM = 2
+    SLOW_FACTOR = 2.0
+    SLOW_MIN_SECS = 0.5
+
+    def __init__(self, max_parallelism: int):
+        self.max_parallelism = max_parallelism
+        self.limit = min(self.INITIAL_PARALLELISM, max_parallelism)
+        self._n_running = 0
+        self._best_secs: Optional[float] = None
+        self._changed = asyncio.Event()
+
+    async def acquire(self):
+        while self._n_running >= self.limit:
+            self._changed.clear()
+            await self._changed.wait()
+        self._n_running += 1
+
+    def release(self, elapsed_secs: Optional[float]):
+        self._n_running -= 1
+        if elapsed_secs is not None:
+            if self._best_secs is None or elapsed_secs < self._best_secs:
+                self._best_secs = elapsed_secs
+            if elapsed_secs > max(self.SLOW_FACTOR * self._best_secs, self.SLOW_MIN_SECS):
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.limit = min(self.max_parallelism, self.limit + 1)
+        self._changed.set()
+
+
 class BatchBuilder:
-    def __init__(self, client, attributes, callback, token=None, cancel_after_n_failures=None):
+    def __init__(self, client, attributes, callback, token=None, cancel_after_n_failures=None,
+                 speculative_execution=False):
         self._client = client
         self._job_idx = 0
         self._job_specs = []
@@ -434,6 +475,7 @@ class BatchBuilder:
         self.token = token
 
         self._cancel_after_n_failures = cancel_after_n_failures
+        self._speculative_execution = speculative_execution
 
     def create_job(self,
                    image: str,
@@ -540,8 +582,42 @@ class BatchBuilder:
         self._jobs.append(j)
         return j
 
+    def create_job_array(self,
+                         image: str,
+                         command: List[str],
+                         parameters: List[Dict[str, str]],
+                         **kwargs) -> List[Job]:
+        '''Create one job per element of `parameters` from a single template.
+
+        The jobs share `image`, `command` and every keyword argument accepted
+        by :meth:`create_job`. Job `i` additionally has the entries of
+        `parameters[i]` and `HAIL_BATCH_ARRAY_INDEX=i` in its environment.
+        Only the template and the parameter table are sent to and stored by
+        the batch service.
+        '''
+        if len(parameters) == 0:
+            raise ValueError('a job array must have at least one element')
+        names = sorted(parameters[0])
+        for i, params in enumerate(parameters):
+            if sorted(params) != names:
+                raise ValueError(f'job array parameters[{i}] has names {sorted(params)}, expected {names}')
+
+        template = self.create_job(image, command, **kwargs)
+        self._job_specs[-1]['array'] = {
+            'n_jobs': len(parameters),
+            'parameters': {name: [params[name] for params in parameters] for name in names}
+        }
+
+        jobs = [template]
+        for _ in range(1, len(parameters)):
+            self._job_idx += 1
+            j = Job.unsubmitted_job(self, self._job_idx)
+            self._jobs.append(j)
+            jobs.append(j)
+        return jobs
+
     async def _open_submit_close(self, byte_job_specs: List[bytes], n_jobs: int, pbar) -> Batch:
-        assert n_jobs == len(self._job_specs)
+        assert n_jobs == self._job_idx
         b = bytearray()
         b.extend(b'{"bunch":')
         b.append(ord('['))
@@ -589,7 +665,7 @@ class BatchBuilder:
         pbar.update(n_jobs)
 
     def _batch_spec(self):
-        n_jobs = len(self._job_specs)
+        n_jobs = self._job_idx
         batch_spec = {'billing_project': self._client.billing_project,
                       'n_jobs': n_jobs,
                       'token': self.token}
@@ -599,6 +675,8 @@ class BatchBuilder:
             batch_spec['callback'] = self.callback
         if self._cancel_after_n_failures is not None:
             batch_spec['cancel_after_n_failures'] = self._cancel_after_n_failures
+        if self._speculative_execution:
+            batch_spec['speculative_execution'] = True
         return batch_spec
 
     async def _open_batch(self) -> Batch:
@@ -616,57 +694,97 @@ class BatchBuilder:
 
     MAX_BUNCH_BYTESIZE = 1024 * 1024
     MAX_BUNCH_SIZE = 1024
+    MAX_SUBMIT_PARALLELISM = 16
 
-    async def submit(self,
-                     max_bunch_bytesize: int = MAX_BUNCH_BYTESIZE,
-                     max_bunch_size: int = MAX_BUNCH_SIZE,
-                     disable_progress_bar: Union[bool, None, TqdmDisableOption] = TqdmDisableOption.default,
-                     ):
-        assert max_bunch_bytesize > 0
-        assert max_bunch_size > 0
-        if self._submitted:
-            raise ValueError("cannot submit an already submitted batch")
-        byte_job_specs = [json.dumps(job_spec).encode('utf-8')
-                          for job_spec in self._job_specs]
-        byte_job_specs_bunches: List[List[bytes]] = []
-        bunch_sizes = []
+    def _encoded_bunches(self, max_bunch_bytesize: int, max_bunch_size: int) -> Iterator[Tuple[List[bytes], int]]:
+        # Specs are encoded on demand so that only the bunches in flight
+        # are resident as bytes, rather than an encoded copy of every job.
         bunch: List[bytes] = []
         bunch_n_bytes = 0
         bunch_n_jobs = 0
-        for spec in byte_job_specs:
+        for job_spec in self._job_specs:
+            spec = json.dumps(job_spec).encode('utf-8')
             n_bytes = len(spec)
+            n_jobs = job_spec['array']['n_jobs'] if 'array' in job_spec else 1
             assert n_bytes < max_bunch_bytesize, (
                 'every job spec must be less than max_bunch_bytesize,'
                 f' { max_bunch_bytesize }B, but {spec.decode()} is larger')
-            if bunch_n_bytes + n_bytes < max_bunch_bytesize and len(bunch) < max_bunch_size:
+            if not bunch or (bunch_n_bytes + n_bytes < max_bunch_bytesize and bunch_n_jobs + n_jobs <= max_bunch_size):
                 bunch.append(spec)
                 bunch_n_bytes += n_bytes
-                bunch_n_jobs += 1
+                bunch_n_jobs += n_jobs
             else:
-                byte_job_specs_bunches.append(bunch)
-                bunch_sizes.append(bunch_n_jobs)
+                yield (bunch, bunch_n_jobs)
                 bunch = [spec]
                 bunch_n_bytes = n_bytes
-                bunch_n_jobs = 1
+                bunch_n_jobs = n_jobs
         if bunch:
-            byte_job_specs_bunches.append(bunch)
-            bunch_sizes.append(bunch_n_jobs)
+            yield (bunch, bunch_n_jobs)
+
+    async def _submit_bunches(self, batch_id: int, bunches: Iterator[Tuple[List[bytes], int]], max_parallelism: int, pbar):
+        parallelism = _AdaptiveParallelism(max_parallelism)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_parallelism)
+
+        async def enqueue_bunches():
+            for bunch in bunches:
+                await queue.put(bunch)
+            for _ in range(max_parallelism):
+                await queue.put(None)
+
+        async def upload_bunches():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                bunch, n_jobs = item
+                await parallelism.acquire()
+                start = time.monotonic()
+                elapsed = None
+                try:
+                    await self._submit_jobs(batch_id, bunch, n_jobs, pbar)
+                    elapsed = time.monotonic() - start
+                finally:
+                    parallelism.release(elapsed)
+
+        tasks = [asyncio.ensure_future(enqueue_bunches())]
+        tasks.extend(asyncio.ensure_future(upload_bunches()) for _ in range(max_parallelism))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def submit(self,
+                     max_bunch_bytesize: int = MAX_BUNCH_BYTESIZE,
+                     max_bunch_size: int = MAX_BUNCH_SIZE,
+                     disable_progress_bar: Union[bool, None, TqdmDisableOption] = TqdmDisableOption.default,
+                     max_parallelism: int = MAX_SUBMIT_PARALLELISM,
+                     ):
+        assert max_bunch_bytesize > 0
+        assert max_bunch_size > 0
+        assert max_parallelism > 0
+        if self._submitted:
+            raise ValueError("cannot submit an already submitted batch")
 
-        with tqdm(total=len(self._job_specs),
+        with tqdm(total=self._job_idx,
                   disable=disable_progress_bar,
                   desc='jobs submitted to queue') as pbar:
-            if len(byte_job_specs_bunches) == 1:
-                batch = await self._open_submit_close(byte_job_specs_bunches[0], bunch_sizes[0], pbar)
+            bunches = self._encoded_bunches(max_bunch_bytesize, max_bunch_size)
+            first_bunch = next(bunches, None)
+            second_bunch = next(bunches, None)
+            if first_bunch is not None and second_bunch is None:
+                batch = await self._open_submit_close(*first_bunch, pbar)
                 id = batch.id
             else:
                 batch = await self._open_batch()
                 id = batch.id
-                await bounded_gather(
-                    *[functools.partial(self._submit_jobs, id, bunch, size, pbar)
-                      for bunch, size in zip(byte_job_specs_bunches, bunch_sizes)
-                      ],
-                    parallelism=6,
-                )
+                if first_bunch is not None:
+                    assert second_bunch is not None
+                    await self._submit_bunches(
+                        id,
+                        itertools.chain([first_bunch, second_bunch], bunches),
+                        max_parallelism,
+                        pbar)
                 await self._close_batch(id)
 
         log.info(f'created batch {id}')
@@ -788,8 +906,9 @@ class BatchClient:
                      token=b['token'],
                      last_known_status=b)
 
-    def create_batch(self, attributes=None, callback=None, token=None, cancel_after_n_failures=None) -> BatchBuilder:
-        return BatchBuilder(self, attributes, callback, token, cancel_after_n_failures)
+    def create_batch(self, attributes=None, callback=None, token=None, cancel_after_n_failures=None,
+                     speculative_execution=False) -> BatchBuilder:
+        return BatchBuilder(self, attributes, callback, token, cancel_after_n_failures, speculative_execution)
 
     async def get_billing_project(self, billing_project):
         bp_resp = await self._get(f'/api/v1alpha/billing_projects/{billing_project}')
@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import asyncio
 
 from ..config import DeployConfig
@@ -188,9 +188,10 @@ class BatchBuilder:
         return b
 
     def __init__(self, client, attributes, callback, token: Optional[str] = None,
-                 cancel_after_n_failures: Optional[int] = None):
+                 cancel_after_n_failures: Optional[int] = None, speculative_execution: bool = False):
         self._async_builder: aioclient.BatchBuilder = aioclient.BatchBuilder(client, attributes, callback, token,
-                                                                             cancel_after_n_failures)
+                                                                             cancel_after_n_failures,
+                                                                             speculative_execution)
 
     @property
     def attributes(self):
@@ -226,6 +227,15 @@ class BatchBuilder:
 
         return Job.from_async_job(async_job)
 
+    def create_job_array(self, image, command, parameters, **kwargs) -> List[Job]:
+        parents = kwargs.get('parents')
+        if parents:
+            kwargs['parents'] = [parent._async_job for parent in parents]
+
+        async_jobs = self._async_builder.create_job_array(image, command, parameters, **kwargs)
+
+        return [Job.from_async_job(async_job) for async_job in async_jobs]
+
     def _open_batch(self) -> Batch:
         async_batch = async_to_blocking(self._async_builder._open_batch())
         return Batch.from_async_batch(async_batch)
@@ -276,10 +286,12 @@ class BatchClient:
                      attributes=None,
                      callback=None,
                      token=None,
-                     cancel_after_n_failures=None
+                     cancel_after_n_failures=None,
+                     speculative_execution=False
                      ) -> 'BatchBuilder':
         builder = self._async_client.create_batch(attributes=attributes, callback=callback, token=token,
-                                                  cancel_after_n_failures=cancel_after_n_failures)
+                                                  cancel_after_n_failures=cancel_after_n_failures,
+                                                  speculative_execution=speculative_execution)
         return BatchBuilder.from_async_builder(builder)
 
     def get_billing_project(self, billing_project):
@@ -3567,6 +3567,22 @@ class Tests(unittest.TestCase):
         fd = hl.utils.frozendict({"a": 4, "b": 8})
         assert hl.eval(hl.literal(fd)) == hl.utils.frozendict({"a": 4, "b": 8})
 
+    def test_encoding_roundtrip(self):
+        t = hl.tstruct(a=hl.tarray(hl.tint32), b=hl.tset(hl.tstr), c=hl.tdict(hl.tfloat64, hl.ttuple(hl.tbool, hl.tint64)),
+                       d=hl.tlocus('GRCh37'), e=hl.tinterval(hl.tint32))
+        x = hl.Struct(a=[1, None, 3], b={'foo', 'bar', None}, c={2.5: (True, None), -1.0: None},
+                      d=hl.Locus('1', 100), e=hl.Interval(1, 5, includes_end=True))
+        assert t._from_encoding(t._to_encoding(x)) == x
+        assert hl.tarray(hl.tint64)._from_encoding(hl.tarray(hl.tint64)._to_encoding(list(range(100)))) == list(range(100))
+
+    def test_large_literal(self):
+        ids = {f'1:{i}:A:T' for i in range(20000)}
+        s = hl.literal(ids)
+        assert hl.eval(s.contains('1:17:A:T'))
+        assert not hl.eval(s.contains('1:17:A:G'))
+        assert hl.eval(hl.len(s)) == len(ids)
+        assert hl.eval(hl.literal(ids)) == ids
+
     def test_nan_roundtrip(self):
         a = [math.nan, math.inf, -math.inf, 0, 1]
         round_trip = hl.eval(hl.literal(a))
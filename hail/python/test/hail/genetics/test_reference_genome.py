@@ -1,9 +1,11 @@
+import os
 import unittest
 
 import hail as hl
 from hail.genetics import *
+from hail.genetics.reference_genome import _ReferenceCache
 from ..helpers import *
-from hail.utils import FatalError
+from hail.utils import FatalError, new_local_temp_dir
 
 setUpModule = startTestHailContext
 tearDownModule = stopTestHailContext
@@ -145,6 +147,57 @@ class Tests(unittest.TestCase):
 
         grch37.remove_liftover("GRCh38")
 
+    def test_global_positions_array(self):
+        rg = hl.get_reference('GRCh37')
+        loci = [('1', 1), ('1', 249250621), ('2', 1), ('X', 60001), ('MT', 16569), ('2', 5)]
+        expected = hl.eval([hl.locus(c, p, 'GRCh37').global_position() for c, p in loci])
+        global_positions = rg._global_positions_array([c for c, _ in loci], [p for _, p in loci])
+        self.assertEqual(list(global_positions), expected)
+
+        contigs, positions = rg._loci_from_global_positions_array(global_positions)
+        self.assertEqual(list(zip(contigs, positions)), loci)
+
+        with self.assertRaises(KeyError):
+            rg._global_positions_array(['chr1'], [1])
+
+    def test_reference_cache_disabled_by_default(self):
+        old_cache_dir = os.environ.pop('HAIL_REFERENCE_CACHE_DIR', None)
+        try:
+            self.assertIsNone(_ReferenceCache.default().directory)
+        finally:
+            if old_cache_dir is not None:
+                os.environ['HAIL_REFERENCE_CACHE_DIR'] = old_cache_dir
+
+    @fails_service_backend()
+    def test_reference_cache_liftover(self):
+        old_cache_dir = os.environ.get('HAIL_REFERENCE_CACHE_DIR')
+        os.environ['HAIL_REFERENCE_CACHE_DIR'] = new_local_temp_dir()
+        try:
+            grch37 = hl.get_reference('GRCh37')
+            grch37.add_liftover(resource('grch37_to_grch38_chr20.over.chain.gz'), 'GRCh38')
+
+            # as in a new session, where the liftover was never registered
+            del grch37._liftovers['GRCh38']
+            hl.current_backend().remove_liftover('GRCh37', 'GRCh38')
+
+            self.assertEqual(hl.eval(hl.liftover(hl.locus('20', 60001, 'GRCh37'), 'GRCh38')),
+                             hl.Locus('chr20', 79360, 'GRCh38'))
+            self.assertTrue(grch37.has_liftover('GRCh38'))
+
+            grch37.remove_liftover('GRCh38')
+            with self.assertRaises(TypeError):
+                hl.liftover(hl.locus('20', 60001, 'GRCh37'), 'GRCh38')
+
+            # a recorded chain file that no longer exists is not registered
+            _ReferenceCache.default().put_liftover('GRCh37', 'GRCh38', new_local_temp_dir() + '/missing.over.chain.gz')
+            with self.assertRaises(TypeError):
+                hl.liftover(hl.locus('20', 60001, 'GRCh37'), 'GRCh38')
+        finally:
+            if old_cache_dir is None:
+                del os.environ['HAIL_REFERENCE_CACHE_DIR']
+            else:
+                os.environ['HAIL_REFERENCE_CACHE_DIR'] = old_cache_dir
+
     @fails_service_backend()
     def test_read_custom_reference_genome(self):
         # this test doesn't behave properly if these reference genomes are already defined in scope.
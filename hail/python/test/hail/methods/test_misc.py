@@ -1,4 +1,5 @@
 import unittest
+from unittest import mock
 
 import hail as hl
 from ..helpers import *
@@ -117,6 +118,63 @@ class Tests(unittest.TestCase):
         self.assertTrue(mis.all(mis.node.is_case))
         self.assertTrue(set([row.id for row in mis.select(mis.node.id).collect()]) in expected_sets)
 
+    @skip_unless_spark_backend()
+    def test_maximal_independent_set_distributed(self):
+        t = hl.utils.range_table(10)
+        graph = t.select(i=hl.int64(t.idx), j=hl.int64(t.idx + 10))
+        mis_table = hl.maximal_independent_set(graph.i, graph.j, True, lambda l, r: l - r, method='distributed')
+        self.assertEqual(mis_table.row.dtype, hl.tstruct(node=hl.tint64))
+        self.assertEqual(mis_table.key.dtype, hl.tstruct(node=hl.tint64))
+        self.assertEqual([row.node for row in mis_table.collect()], list(range(0, 10)))
+
+        edges = [(0, 4), (0, 1), (0, 2), (1, 5), (1, 3), (2, 3), (2, 6),
+                 (3, 7), (4, 5), (4, 6), (5, 7), (6, 7), (8, 8), (8, 9)]
+        t = hl.Table.parallelize([{"i": l, "j": r} for l, r in edges], hl.tstruct(i=hl.tint64, j=hl.tint64))
+        mis = set(hl.maximal_independent_set(t.i, t.j, method='distributed').node.collect())
+        removed = set(hl.maximal_independent_set(t.i, t.j, keep=False, method='distributed').node.collect())
+        self.assertEqual(mis | removed, set(range(10)))
+        self.assertFalse(mis & removed)
+        self.assertIn(8, removed)
+        for l, r in edges:
+            self.assertFalse(l in mis and r in mis)
+
+        is_case = {"A", "C", "E", "G", "H"}
+        edges = [("A", "B"), ("C", "D"), ("E", "F"), ("G", "H")]
+        t = hl.Table.parallelize([{"i": {"id": l, "is_case": l in is_case},
+                                   "j": {"id": r, "is_case": r in is_case}} for l, r in edges],
+                                 hl.tstruct(i=hl.tstruct(id=hl.tstr, is_case=hl.tbool),
+                                            j=hl.tstruct(id=hl.tstr, is_case=hl.tbool)))
+        tiebreaker = lambda l, r: (hl.case()
+                                   .when(l.is_case & (~r.is_case), -1)
+                                   .when(~(l.is_case) & r.is_case, 1)
+                                   .default(0))
+        mis = hl.maximal_independent_set(t.i, t.j, tie_breaker=tiebreaker, method='distributed')
+        self.assertTrue(mis.all(mis.node.is_case))
+        self.assertIn(set(mis.node.id.collect()), [{"A", "C", "E", "G"}, {"A", "C", "E", "H"}])
+
+    @skip_unless_spark_backend()
+    def test_maximal_independent_set_distributed_inconsistent_tie_breaker(self):
+        # orders the triangle 0 < 1 < 2 < 0, so no vertex comes first on both its edges
+        t = hl.Table.parallelize([{"i": l, "j": r} for l, r in [(0, 1), (1, 2), (0, 2)]],
+                                 hl.tstruct(i=hl.tint64, j=hl.tint64))
+        mis = hl.maximal_independent_set(t.i, t.j, tie_breaker=lambda l, r: hl.if_else((l == 0) & (r == 2), -1, 1),
+                                         method='distributed')
+        self.assertEqual(mis.count(), 1)
+
+    @skip_unless_spark_backend()
+    def test_maximal_independent_set_distributed_path(self):
+        # every interior vertex of a path ties on degree
+        n = 1000
+        t = hl.utils.range_table(n - 1)
+        t = t.select(i=t.idx, j=t.idx + 1)
+        with mock.patch("hail.methods.misc.info", autospec=True) as info:
+            mis = set(hl.maximal_independent_set(t.i, t.j, method='distributed').node.collect())
+        self.assertLess(info.call_count, 30)
+        for k in range(n - 1):
+            self.assertFalse(k in mis and k + 1 in mis)
+        for k in range(n):
+            self.assertTrue(k in mis or k - 1 in mis or k + 1 in mis)
+
     @skip_unless_spark_backend()
     def test_maximal_independent_set_types(self):
         ht = hl.utils.range_table(10)
@@ -1297,6 +1297,24 @@ class Tests(unittest.TestCase):
             hl.ld_matrix(mt.GT.n_alt_alleles(), mt.locus, radius=1.0, coord_expr=mt.cm).to_numpy(),
             [[1., -0.85280287, 0.], [-0.85280287, 1., 0.], [0., 0., 1.]]))
 
+    @skip_unless_spark_backend()
+    def test_ld_entries(self):
+        ds = hl.balding_nichols_model(n_populations=2, n_samples=30, n_variants=60, n_partitions=4)
+        ds = ds.key_rows_by(locus=hl.locus('1', hl.int32(ds.row_idx // 20 * 1000 + ds.row_idx % 20 * 10 + 1)),
+                            alleles=ds.alleles)
+        ds = ds.filter_rows(hl.agg.collect_as_set(ds.GT).size() > 1)
+        n = ds.count_rows()
+
+        expected = hl.ld_matrix(ds.GT.n_alt_alleles(), ds.locus, radius=50).to_numpy()
+        actual = np.zeros((n, n))
+        for e in hl.ld_entries(ds.GT.n_alt_alleles(), ds.locus, radius=50).collect():
+            self.assertLessEqual(e.i, e.j)
+            actual[e.i, e.j] = actual[e.j, e.i] = e.entry
+        self.assertTrue(np.allclose(actual, expected))
+
+        entries = hl.ld_entries(ds.GT.n_alt_alleles(), ds.locus, radius=50, min_r2=0.1).collect()
+        self.assertEqual(len(entries), int(np.sum(np.triu(expected ** 2 >= 0.1))))
+
     @skip_when_service_backend('Shuffler encoding/decoding is broken.')
     def test_split_multi_hts(self):
         ds1 = hl.import_vcf(resource('split_test.vcf'))
@@ -0,0 +1,76 @@
+import pytest
+
+import hail as hl
+from hail.plot.batch import aggregate as batch_aggregate
+
+
+def _renderer_data(fig):
+    return [{name: list(values) for name, values in r.data_source.data.items()} for r in fig.renderers]
+
+
+@pytest.fixture
+def count_aggregations(monkeypatch):
+    counts = {'n': 0}
+    aggregate = hl.Table.aggregate
+
+    def counting_aggregate(self, *args, **kwargs):
+        counts['n'] += 1
+        return aggregate(self, *args, **kwargs)
+
+    monkeypatch.setattr(hl.Table, 'aggregate', counting_aggregate)
+    return counts
+
+
+def _table():
+    ht = hl.utils.range_table(100)
+    return ht.annotate(x=hl.float64(ht.idx), y=hl.float64(ht.idx) ** 2)
+
+
+def test_plot_batch_one_aggregation(count_aggregations):
+    ht = _table()
+    expected = [hl.plot.histogram(ht.x, range=(0, 100)),
+                hl.plot.histogram(ht.y, range=(0, 10000), bins=20),
+                hl.plot.cdf(ht.x)]
+    count_aggregations['n'] = 0
+
+    with hl.plot.PlotBatch() as batch:
+        batch.add(hl.plot.histogram, ht.x, range=(0, 100))
+        batch.add(hl.plot.histogram, ht.y, range=(0, 10000), bins=20)
+        batch.add(hl.plot.cdf, ht.x)
+
+    assert count_aggregations['n'] == 1
+    assert len(batch.figures) == 3
+    for actual, exp in zip(batch.figures, expected):
+        assert _renderer_data(actual) == _renderer_data(exp)
+
+
+def test_plot_batch_dependent_aggregations_share_passes(count_aggregations):
+    ht = _table()
+    expected = [hl.plot.histogram(ht.x), hl.plot.histogram(ht.y)]
+    unbatched = count_aggregations['n']
+    assert unbatched == 4
+    count_aggregations['n'] = 0
+
+    with hl.plot.PlotBatch() as batch:
+        batch.add(hl.plot.histogram, ht.x)
+        batch.add(hl.plot.histogram, ht.y)
+
+    # one pass for the ranges of both histograms, one for their bins
+    assert count_aggregations['n'] == 2
+    for actual, exp in zip(batch.figures, expected):
+        assert _renderer_data(actual) == _renderer_data(exp)
+
+
+def test_plot_batch_figures_before_run():
+    ht = _table()
+    batch = hl.plot.PlotBatch()
+    batch.add(hl.plot.histogram, ht.x, range=(0, 100))
+    with pytest.raises(ValueError):
+        batch.figures
+    assert len(batch.run()) == 1
+
+
+def test_aggregate_outside_plot_batch(count_aggregations):
+    ht = _table()
+    assert batch_aggregate(ht.aggregate, hl.agg.count()) == 100
+    assert count_aggregations['n'] == 1
@@ -0,0 +1,25 @@
+import hail as hl
+from hail.plot.plots import _collect_significance_downsampled
+
+
+def test_significance_downsampled_labels_are_strings():
+    ht = hl.utils.range_table(50)
+    ht = ht.annotate(x=hl.float64(ht.idx), y=hl.float64(ht.idx) / 10)
+    fields = {'flag': ht.idx % 2 == 0,
+              'maybe': hl.or_missing(ht.idx % 3 == 0, hl.str(ht.idx)),
+              'n': ht.idx}
+    df = _collect_significance_downsampled(('x', ht.x), ('y', ht.y), fields, y_threshold=4.0,
+                                           x_range=(0, 50), y_range=(0, 5), n_divisions=10)
+    assert set(df['flag']) <= {'true', 'false'}
+    assert 'NA' in set(df['maybe'])
+    assert all(isinstance(v, str) for v in df['maybe'])
+    assert df['n'].dtype.kind == 'i'
+
+
+def test_manhattan_with_bool_label():
+    ht = hl.utils.range_table(100)
+    ht = ht.annotate(locus=hl.locus('1', ht.idx + 1),
+                     pval=hl.float64(ht.idx + 1) / 1000,
+                     flag=ht.idx % 2 == 0)
+    hl.plot.manhattan(ht.pval, locus=ht.locus, hover_fields={'flag': ht.flag})
+    hl.plot.qq(ht.pval, label=ht.flag)
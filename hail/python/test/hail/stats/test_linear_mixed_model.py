@@ -265,6 +265,77 @@ class Tests(unittest.TestCase):
         self.assertAlmostEqual(stats.beta, beta1[0])
         self.assertAlmostEqual(stats.chi_sq, chi_sq)
 
+    def test_fit_alternatives_numpy_blocks(self):
+        np.random.seed(0)
+        n, f, m, r = 20, 2, 7, 10
+        y = np.random.normal(size=n)
+        x = np.hstack([np.ones((n, 1)), np.random.normal(size=(n, f - 1))])
+        a = np.random.normal(size=(n, m))
+        z = np.random.normal(size=(n, r))
+
+        model, p = LinearMixedModel.from_random_effects(y, x, z)
+        model.fit()
+
+        v = z @ z.T + np.identity(n) / model.gamma
+        v_inv = np.linalg.inv(v)
+        residual = y - x @ np.linalg.solve(x.T @ v_inv @ x, x.T @ v_inv @ y)
+        expected_beta, expected_chi_sq = [], []
+        for i in range(m):
+            x1 = np.hstack([a[:, i:i + 1], x])
+            beta1 = np.linalg.solve(x1.T @ v_inv @ x1, x1.T @ v_inv @ y)
+            residual1 = y - x1 @ beta1
+            expected_beta.append(beta1[0])
+            expected_chi_sq.append(n * np.log((residual @ v_inv @ residual) / (residual1 @ v_inv @ residual1)))
+
+        pa = p @ a
+        pa_path = utils.new_local_temp_file('pa.npy')
+        a_path = utils.new_local_temp_file('a.npy')
+        np.save(pa_path, np.asfortranarray(pa))
+        np.save(a_path, np.asfortranarray(a))
+
+        for kwargs in [dict(pa=pa, a=a),
+                       dict(pa=pa, a=a, block_size=1),
+                       dict(pa=pa, a=a, block_size=3),
+                       dict(pa=pa_path, a=a_path, block_size=2),
+                       dict(pa=pa_path, a=a_path, block_size=2, n_processes=2),
+                       dict(pa=pa, a=a, block_size=2, n_processes=2)]:
+            res = model.fit_alternatives_numpy(return_pandas=True, **kwargs)
+            self.assertEqual(list(res['idx']), list(range(m)))
+            self.assertTrue(np.allclose(res['beta'], expected_beta))
+            self.assertTrue(np.allclose(res['chi_sq'], expected_chi_sq))
+
+    def test_fit_phenotypes(self):
+        np.random.seed(0)
+        n, f, r, n_phenotypes = 50, 2, 20, 3
+        x = np.hstack([np.ones((n, 1)), np.random.normal(size=(n, f - 1))])
+        z = np.random.normal(size=(n, r)) / np.sqrt(r)
+        ys = z @ np.random.normal(size=(r, n_phenotypes)) + np.random.normal(size=(n, n_phenotypes))
+        k = z @ z.T
+
+        cache_dir = utils.new_local_temp_dir()
+        model, p = LinearMixedModel.from_kinship(ys[:, 0], x, k, cache_dir=cache_dir)
+        cached_model, cached_p = LinearMixedModel.from_kinship(ys[:, 0], x, k, cache_dir=cache_dir)
+        self.assertTrue(np.array_equal(p, cached_p))
+        self.assertTrue(model._same(cached_model))
+
+        # full rank
+        models = model.fit_phenotypes(p @ ys)
+        for i, fit_model in enumerate(models):
+            expected, _ = LinearMixedModel.from_kinship(ys[:, i], x, k)
+            expected.fit()
+            self.assertAlmostEqual(fit_model.log_gamma, expected.log_gamma, places=4)
+            self.assertTrue(np.allclose(fit_model.beta, expected.beta, atol=1e-6))
+            self.assertAlmostEqual(fit_model.h_sq_standard_error, expected.h_sq_standard_error, places=4)
+
+        # low rank
+        model, p = LinearMixedModel.from_random_effects(ys[:, 0], x, z)
+        models = model.fit_phenotypes(p @ ys, ys)
+        for i, fit_model in enumerate(models):
+            expected = LinearMixedModel(p @ ys[:, i], p @ x, model.s, ys[:, i], x)
+            expected.fit()
+            self.assertAlmostEqual(fit_model.log_gamma, expected.log_gamma, places=4)
+            self.assertTrue(np.allclose(fit_model.beta, expected.beta, atol=1e-6))
+
     @skip_unless_spark_backend()
     def test_linear_mixed_model_function(self):
         n, f, m = 4, 2, 3
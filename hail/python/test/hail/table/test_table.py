@@ -664,6 +664,27 @@ https://hail.zulipchat.com/#narrow/stream/123011-Hail-Dev/topic/test_drop/near/2
         with pytest.raises(ExpressionException, match='cannot impute array elements'):
             hl.Table.from_pandas(df)
 
+    def test_from_pandas_columnar(self):
+        import numpy as np
+
+        df = pd.DataFrame({
+            'a': np.array([1, 2, 3], dtype=np.int32),
+            'b': np.array([1, 2, 2 ** 40], dtype=np.int64),
+            'c': np.array([0.5, np.nan, -np.inf], dtype=np.float64),
+            'd': np.array([True, False, True]),
+            'e': pd.array(['foo', None, ''], dtype='string'),
+        })
+        t = hl.Table.from_pandas(df, key='a')
+        self.assertIn('TableRead', str(t._tir))
+
+        t2 = hl.Table.parallelize(
+            [hl.Struct(a=1, b=1, c=0.5, d=True, e='foo'),
+             hl.Struct(a=2, b=2, c=float('nan'), d=False, e=None),
+             hl.Struct(a=3, b=2 ** 40, c=float('-inf'), d=True, e='')],
+            hl.tstruct(a=hl.tint32, b=hl.tint64, c=hl.tfloat64, d=hl.tbool, e=hl.tstr),
+            key='a')
+        self.assertTrue(t._same(t2))
+
     def test_table_parallelize_infer_types(self):
         import numpy as np
         a = hl.array([{"b": 1, "c": "d"}, {"b": 1, "c": "d"}])
@@ -1842,4 +1863,23 @@ def test_to_pandas_nd_array():
     }
 
     df_from_python = pd.DataFrame(python_data)
-    pd.testing.assert_frame_equal(df_from_hail, df_from_python)
\ No newline at end of file
+    pd.testing.assert_frame_equal(df_from_hail, df_from_python)
+
+
+def test_to_pandas_partitions():
+    ht = hl.utils.range_table(10, n_partitions=3)
+    ht = ht.annotate(s=hl.str(ht.idx), nested=hl.struct(foo=ht.idx * 2))
+    dfs = list(ht.to_pandas_partitions())
+    assert len(dfs) == 3
+    pd.testing.assert_frame_equal(pd.concat(dfs, ignore_index=True), ht.to_pandas())
+
+
+@skip_unless_spark_backend()
+def test_export_parquet():
+    ht = hl.utils.range_table(10, n_partitions=3)
+    ht = ht.annotate(s=hl.str(ht.idx), nested=hl.struct(foo=ht.idx * 2))
+    path = new_temp_file(extension='parquet')
+    ht.export_parquet(path)
+    df = Env.spark_session().read.parquet(path)
+    assert sorted(r.idx for r in df.collect()) == list(range(10))
+    assert set(df.columns) == {'idx', 's', 'nested.foo'}
@@ -131,6 +131,139 @@ class LocalTests(unittest.TestCase):
 
         self.assertRaises(Exception, b.run)
 
+    def test_independent_jobs_run_concurrently(self):
+        with tempfile.TemporaryDirectory() as dir:
+            b = self.batch()
+            for name, other in [('a', 'b'), ('b', 'a')]:
+                j = b.new_job()
+                j.cpu(0.25)
+                # each job waits for the other to have started
+                j.command(f'touch {dir}/{name}; for i in $(seq 60); do [ -e {dir}/{other} ] && exit 0; sleep 1; done; exit 1')
+            b.run()
+
+    def test_always_run_after_failure(self):
+        with tempfile.NamedTemporaryFile('w') as output_file:
+            b = self.batch()
+            j = b.new_job()
+            j.command('false')
+            j2 = b.new_job()
+            j2.depends_on(j)
+            j2.command(f'echo "skipped" > {output_file.name}')
+            j3 = b.new_job()
+            j3.depends_on(j2)
+            j3.always_run()
+            j3.command(f'echo "cleanup" >> {output_file.name}')
+
+            self.assertRaises(Exception, b.run)
+            assert self.read(output_file.name) == 'cleanup'
+
+    def test_call_cache(self):
+        with tempfile.NamedTemporaryFile('w') as input_file, \
+                tempfile.NamedTemporaryFile('w') as output_file, \
+                tempfile.TemporaryDirectory() as cache_dir, \
+                tempfile.TemporaryDirectory() as dir:
+            input_file.write('abc')
+            input_file.flush()
+
+            def run(tail_msg):
+                b = Batch(backend=LocalBackend(), call_cache=cache_dir)
+                input = b.read_input(input_file.name)
+                head = b.new_job()
+                head.command(f'echo run >> {dir}/head_runs; cat {input} > {head.ofile}')
+                tail = b.new_job()
+                tail.command(f'cat {head.ofile} > {tail.ofile}; echo "{tail_msg}" >> {tail.ofile}')
+                b.write_output(tail.ofile, output_file.name)
+                b.run()
+
+            run('1')
+            run('1')
+            assert self.read(output_file.name) == 'abc\n1'
+            run('2')
+            assert self.read(output_file.name) == 'abc\n2'
+            assert self.read(f'{dir}/head_runs') == 'run'
+
+            input_file.write('def')
+            input_file.flush()
+            run('2')
+            assert self.read(output_file.name) == 'abcdef\n2'
+            assert self.read(f'{dir}/head_runs') == 'run\nrun'
+
+    def test_fuse_jobs(self):
+        with tempfile.NamedTemporaryFile('w') as output_file:
+            b = Batch(backend=LocalBackend(), fuse_jobs=True)
+            j1 = b.new_job()
+            j1.command(f'echo a > {j1.ofile}')
+            j2 = b.new_job()
+            j2.command(f'cat {j1.ofile} > {j2.ofile}; echo b >> {j2.ofile}')
+            j3 = b.new_job()
+            j3.command(f'cat {j2.ofile} > {j3.ofile}; echo c >> {j3.ofile}')
+            b.write_output(j3.ofile, output_file.name)
+            b.run()
+
+            assert len(b._jobs) == 1
+            assert self.read(output_file.name) == 'a\nb\nc'
+
+    def test_fuse_jobs_merges_attributes(self):
+        b = Batch(backend=LocalBackend(), fuse_jobs=True)
+        j1 = b.new_job(attributes={'step': 'align'})
+        j1.command(f'echo a > {j1.ofile}')
+        j2 = b.new_job(attributes={'sample': 'x'})
+        j2.command(f'cat {j1.ofile}')
+        j3 = b.new_job(attributes={'step': 'call'})
+        j3.depends_on(j2)
+        j3.command('true')
+        b.run()
+
+        assert len(b._jobs) == 2
+        assert b._jobs[0].attributes == {'step': 'align', 'sample': 'x'}
+        assert b._jobs[1].attributes == {'step': 'call'}
+
+    def test_depend_on_fused_job(self):
+        b = Batch(backend=LocalBackend(), fuse_jobs=True)
+        j1 = b.new_job()
+        j1.command(f'echo a > {j1.ofile}')
+        j2 = b.new_job()
+        j2.command(f'cat {j1.ofile} > {j2.ofile}')
+        b.run()
+
+        j3 = b.new_job()
+        j3.command(f'cat {j2.ofile}')
+        with self.assertRaises(BatchException):
+            b.run()
+
+    def test_fused_job_failure(self):
+        with tempfile.NamedTemporaryFile('w') as output_file:
+            b = Batch(backend=LocalBackend(), fuse_jobs=True)
+            j1 = b.new_job()
+            j1.command(f'echo a > {j1.ofile}')
+            j2 = b.new_job()
+            j2.command(f'cat {j1.ofile} > {j2.ofile}; false')
+            j3 = b.new_job()
+            j3.command(f'cat {j2.ofile} > {output_file.name}')
+
+            self.assertRaises(Exception, b.run)
+            assert self.read(output_file.name) == ''
+
+    def test_call_cache_resource_group(self):
+        with tempfile.NamedTemporaryFile('w') as output_file, \
+                tempfile.TemporaryDirectory() as cache_dir, \
+                tempfile.TemporaryDirectory() as dir:
+
+            def run():
+                b = Batch(backend=LocalBackend(), call_cache=cache_dir)
+                head = b.new_job()
+                head.declare_resource_group(ofile={'txt': '{root}.txt', 'log': '{root}.log'})
+                head.command(f'echo run >> {dir}/head_runs; echo abc > {head.ofile.txt}; echo log > {head.ofile.log}')
+                tail = b.new_job()
+                tail.command(f'cat {head.ofile}.txt {head.ofile}.log > {tail.ofile}')
+                b.write_output(tail.ofile, output_file.name)
+                b.run()
+
+            run()
+            run()
+            assert self.read(output_file.name) == 'abc\nlog'
+            assert self.read(f'{dir}/head_runs') == 'run'
+
     def test_single_job_w_input(self):
         with tempfile.NamedTemporaryFile('w') as input_file, \
                 tempfile.NamedTemporaryFile('w') as output_file:
@@ -390,6 +523,29 @@ class LocalTests(unittest.TestCase):
             res = b.run()
             assert self.read(output_file.name) == '3\n5\n30\n{\"x\": 3, \"y\": 5}'
 
+    def test_python_job_functions_uploaded_once(self):
+        with tempfile.NamedTemporaryFile('w') as output_file:
+            b = self.batch()
+
+            def add(x, y):
+                return x + y
+
+            results = []
+            for i in range(1, 5):
+                j = b.new_python_job()
+                results.append(j.call(add, i, 1).as_str())
+            # arguments too large to inline in the command
+            j = b.new_python_job()
+            results.append(j.call(add, 'a', 'b' * (10 * 1024)).as_str())
+
+            tail = b.new_job()
+            tail.command(f'cat {" ".join(results)} > {tail.ofile}')
+            b.write_output(tail.ofile, output_file.name)
+            b.run()
+
+            assert len(b._python_functions) == 1
+            assert self.read(output_file.name) == '2\n3\n4\n5\na' + 'b' * (10 * 1024)
+
     def test_backend_context_manager(self):
         with LocalBackend() as backend:
             b = Batch(backend=backend)
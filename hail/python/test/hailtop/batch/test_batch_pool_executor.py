@@ -135,6 +135,48 @@ def test_map_chunksize(backend):
         0,  4,  8, 12, 16]
 
 
+def test_worker_pool_map_and_submit(backend):
+    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE, n_workers=2) as bpe:
+        actual = list(bpe.map(lambda x: x * 3, range(20)))
+        future_twenty_one = bpe.submit(lambda: 7 * 3)
+        assert future_twenty_one.result() == 21
+    assert [x * 3 for x in range(20)] == actual
+
+
+def test_worker_pool_exception_in_result(backend):
+    def raise_value_error():
+        raise ValueError('dead')
+    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE, n_workers=1) as bpe:
+        try:
+            bpe.submit(raise_value_error).result()
+        except ValueError as exc:
+            assert 'ValueError: dead' in exc.args[0]
+        else:
+            assert False
+        assert bpe.submit(lambda: 1).result() == 1
+
+
+def test_worker_pool_restarts_idle_worker(backend):
+    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE, n_workers=1,
+                           worker_idle_timeout=1) as bpe:
+        assert bpe.submit(lambda: 1).result() == 1
+        time.sleep(10)
+        assert bpe.submit(lambda: 2).result() == 2
+        assert bpe._pool.n_started == 2
+
+
+def test_worker_pool_cancel_removes_task(backend):
+    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE, n_workers=1) as bpe:
+        slow = bpe.submit(lambda: time.sleep(30))
+        queued = bpe.submit(lambda: 1)
+        assert queued.cancel()
+        assert queued.cancelled()
+        task = f'{bpe._pool.worker_directories[0]}tasks/{queued.name}'
+        assert not asyncio.get_event_loop().run_until_complete(bpe.fs.exists(task))
+        assert slow.result() is None
+        assert not bpe._pool.outstanding[0]
+
+
 def test_map_timeout(backend):
     with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         def sleep_forever():
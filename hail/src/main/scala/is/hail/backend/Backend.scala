@@ -2,10 +2,12 @@ package is.hail.backend
 
 import is.hail.backend.spark.SparkBackend
 import is.hail.expr.ir.lowering.{TableStage, TableStageDependency}
-import is.hail.expr.ir.{IR, SortField}
+import is.hail.expr.ir.{EncodedLiteral, IR, IRParser, SortField}
+import is.hail.io.{BufferSpec, TypedCodecSpec}
 import is.hail.io.fs.FS
 import is.hail.linalg.BlockMatrix
 import is.hail.types._
+import is.hail.types.encoded.EType
 import is.hail.utils._
 
 import scala.reflect.ClassTag
@@ -43,6 +45,14 @@ abstract class Backend {
   def asSpark(op: String): SparkBackend =
     fatal(s"${ getClass.getSimpleName }: $op requires SparkBackend")
 
+  // `bytes` is a single value encoded the way executeEncode encodes results,
+  // so that Python can ship large literals without rendering them as JSON
+  def encodedLiteral(typeString: String, bytes: Array[Byte], bufferSpecString: String): IR = {
+    val t = IRParser.parseType(typeString)
+    val codec = TypedCodecSpec(EType.fromTypeAllOptional(t), t, BufferSpec.parseOrDefault(bufferSpecString))
+    EncodedLiteral(codec, Array(bytes))
+  }
+
   def lowerDistributedSort(
     ctx: ExecuteContext,
     stage: TableStage,
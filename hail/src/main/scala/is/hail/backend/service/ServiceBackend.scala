@@ -331,7 +331,7 @@ object ServiceBackendSocketAPI {
   private val log = Logger.getLogger(getClass.getName())
 }
 
-class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket) extends Thread {
+class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket, nRequestThreads: Int) extends Thread {
   import ServiceBackendSocketAPI._
 
   private[this] val LOAD_REFERENCES_FROM_DATASET = 1
@@ -347,11 +347,15 @@ class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket) extends T
   private[this] val SET_FLAG = 11
   private[this] val ADD_USER = 12
   private[this] val GOODBYE = 254
+  private[this] val MULTIPLEX = 253
 
   private[this] val in = socket.getInputStream
   private[this] val out = socket.getOutputStream
 
-  private[this] val dummy = new Array[Byte](8)
+  // separate scratch buffers: in multiplexed mode the reader thread decodes
+  // requests while worker threads encode responses
+  private[this] val inDummy = new Array[Byte](8)
+  private[this] val outDummy = new Array[Byte](8)
 
   def read(bytes: Array[Byte], off: Int, n: Int): Unit = {
     assert(off + n <= bytes.length)
@@ -367,13 +371,13 @@ class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket) extends T
   }
 
   def readInt(): Int = {
-    read(dummy, 0, 4)
-    Memory.loadInt(dummy, 0)
+    read(inDummy, 0, 4)
+    Memory.loadInt(inDummy, 0)
   }
 
   def readLong(): Long = {
-    read(dummy, 0, 8)
-    Memory.loadLong(dummy, 0)
+    read(inDummy, 0, 8)
+    Memory.loadLong(inDummy, 0)
   }
 
   def readBytes(): Array[Byte] = {
@@ -390,13 +394,13 @@ class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket) extends T
   }
 
   def writeInt(v: Int): Unit = {
-    Memory.storeInt(dummy, 0, v)
-    out.write(dummy, 0, 4)
+    Memory.storeInt(outDummy, 0, v)
+    out.write(outDummy, 0, 4)
   }
 
   def writeLong(v: Long): Unit = {
-    Memory.storeLong(dummy, 0, v)
-    out.write(dummy)
+    Memory.storeLong(outDummy, 0, v)
+    out.write(outDummy)
   }
 
   def writeBytes(bytes: Array[Byte]): Unit = {
@@ -406,173 +410,147 @@ class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket) extends T
 
   def writeString(s: String): Unit = writeBytes(s.getBytes(StandardCharsets.UTF_8))
 
+  // Reads the arguments of `cmd` off the socket and returns a thunk that runs
+  // the command.  The thunk's result is the response payload, if any.
+  def readRequest(cmd: Int): () => Option[String] = (cmd: @switch) match {
+    case LOAD_REFERENCES_FROM_DATASET =>
+      val username = readString()
+      val billingProject = readString()
+      val bucket = readString()
+      val path = readString()
+      () => Some(backend.loadReferencesFromDataset(username, billingProject, bucket, path))
+
+    case VALUE_TYPE =>
+      val username = readString()
+      val s = readString()
+      () => Some(backend.valueType(username, s))
+
+    case TABLE_TYPE =>
+      val username = readString()
+      val s = readString()
+      () => Some(backend.tableType(username, s))
+
+    case MATRIX_TABLE_TYPE =>
+      val username = readString()
+      val s = readString()
+      () => Some(backend.matrixTableType(username, s))
+
+    case BLOCK_MATRIX_TYPE =>
+      val username = readString()
+      val s = readString()
+      () => Some(backend.blockMatrixType(username, s))
+
+    case REFERENCE_GENOME =>
+      val username = readString()
+      val name = readString()
+      () => Some(backend.referenceGenome(username, name))
+
+    case EXECUTE =>
+      val username = readString()
+      val sessionId = readString()
+      val billingProject = readString()
+      val bucket = readString()
+      val code = readString()
+      val token = readString()
+      () => Some(backend.execute(username, sessionId, billingProject, bucket, code, token))
+
+    case FLAGS =>
+      () => Some(backend.flags())
+
+    case GET_FLAG =>
+      val name = readString()
+      () => Some(backend.getFlag(name))
+
+    case SET_FLAG =>
+      val name = readString()
+      val value = readString()
+      () => Some(backend.setFlag(name, value))
+
+    case UNSET_FLAG =>
+      val name = readString()
+      () => Some(backend.unsetFlag(name))
+
+    case ADD_USER =>
+      val name = readString()
+      val gsaKey = readString()
+      () => {
+        backend.addUser(name, gsaKey)
+        None
+      }
+  }
+
+  def runRequest(f: () => Option[String]): Either[String, Option[String]] = {
+    try {
+      Right(f())
+    } catch {
+      case t: Throwable =>
+        Left(formatException(t))
+    }
+  }
+
+  def writeResponse(response: Either[String, Option[String]]): Unit = response match {
+    case Right(result) =>
+      writeBool(true)
+      result.foreach(writeString)
+    case Left(stackTrace) =>
+      writeBool(false)
+      writeString(stackTrace)
+  }
+
   def eventLoop(): Unit = {
     var continue = true
     while (continue) {
       val cmd = readInt()
 
       (cmd: @switch) match {
-        case LOAD_REFERENCES_FROM_DATASET =>
-          val username = readString()
-          val billingProject = readString()
-          val bucket = readString()
-          val path = readString()
-          try {
-            val result = backend.loadReferencesFromDataset(username, billingProject, bucket, path)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case VALUE_TYPE =>
-          val username = readString()
-          val s = readString()
-          try {
-            val result = backend.valueType(username, s)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case TABLE_TYPE =>
-          val username = readString()
-          val s = readString()
-          try {
-            val result = backend.tableType(username, s)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case MATRIX_TABLE_TYPE =>
-          val username = readString()
-          val s = readString()
-          try {
-            val result = backend.matrixTableType(username, s)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case BLOCK_MATRIX_TYPE =>
-          val username = readString()
-          val s = readString()
-          try {
-            val result = backend.blockMatrixType(username, s)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case REFERENCE_GENOME =>
-          val username = readString()
-          val name = readString()
-          try {
-            val result = backend.referenceGenome(username, name)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case EXECUTE =>
-          val username = readString()
-          val sessionId = readString()
-          val billingProject = readString()
-          val bucket = readString()
-          val code = readString()
-          val token = readString()
-          try {
-            val result = backend.execute(username, sessionId, billingProject, bucket, code, token)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case FLAGS =>
-          try {
-            val result = backend.flags()
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case GET_FLAG =>
-          val name = readString()
-          try {
-            val result = backend.getFlag(name)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
-
-        case SET_FLAG =>
-          val name = readString()
-          val value = readString()
-          try {
-            val result = backend.setFlag(name, value)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
+        case GOODBYE =>
+          continue = false
+          writeInt(GOODBYE)
 
-        case UNSET_FLAG =>
-          val name = readString()
-          try {
-            val result = backend.unsetFlag(name)
-            writeBool(true)
-            writeString(result)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
+        case MULTIPLEX =>
+          continue = false
+          multiplexedEventLoop()
 
-        case ADD_USER =>
-          val name = readString()
-          val gsaKey = readString()
-          try {
-            val result = backend.addUser(name, gsaKey)
-            writeBool(true)
-          } catch {
-            case t: Throwable =>
-              writeBool(false)
-              writeString(formatException(t))
-          }
+        case _ =>
+          writeResponse(runRequest(readRequest(cmd)))
+      }
+    }
+  }
 
-        case GOODBYE =>
+  // After MULTIPLEX, every request is prefixed with a client-chosen request
+  // id and every response with the id of the request it answers.  Requests
+  // run concurrently, at most nRequestThreads at a time, and responses are
+  // written in completion order.
+  def multiplexedEventLoop(): Unit = {
+    val executor = Executors.newFixedThreadPool(nRequestThreads)
+    var continue = true
+    try {
+      while (continue) {
+        val requestId = readInt()
+        val cmd = readInt()
+        if (cmd == GOODBYE) {
           continue = false
-          writeInt(GOODBYE)
+          executor.shutdown()
+          executor.awaitTermination(Long.MaxValue, TimeUnit.MILLISECONDS)
+          out.synchronized {
+            writeInt(requestId)
+            writeInt(GOODBYE)
+          }
+        } else {
+          val f = readRequest(cmd)
+          executor.execute(new Runnable {
+            def run(): Unit = {
+              val response = runRequest(f)
+              out.synchronized {
+                writeInt(requestId)
+                writeResponse(response)
+              }
+            }
+          })
+        }
       }
+    } finally {
+      executor.shutdownNow()
     }
   }
 
@@ -597,6 +575,7 @@ object ServiceBackendMain {
     val queryStorageURI = System.getenv("HAIL_QUERY_STORAGE_UI")
     assert(queryStorageURI != null)
     val queryStorageJarURI = queryStorageURI + "/jars/"
+    val nRequestThreads = Option(System.getenv("HAIL_QUERY_N_REQUEST_THREADS")).map(_.toInt).getOrElse(16)
     val executor = Executors.newCachedThreadPool()
     val backend = new ServiceBackend(queryStorageJarURI)
     HailContext(backend, "hail.log", false, false, 50, skipLoggingConfiguration = true, 3)
@@ -609,7 +588,7 @@ object ServiceBackendMain {
         val sock = ss.accept()
         try {
           log.info(s"accepted")
-          executor.execute(new ServiceBackendSocketAPI(backend, sock))
+          executor.execute(new ServiceBackendSocketAPI(backend, sock, nRequestThreads))
         } catch {
           case e: SocketException => {
             log.info(s"exception while handing socket to thread", e)
@@ -35,11 +35,14 @@ class MemoryClient:
         if 'Authorization' not in self._headers:
             self._headers.update(service_auth_headers(self._deploy_config, 'memory'))
 
-    async def _get_file_if_exists(self, filename):
+    async def _get_file_if_exists(self, filename, start=None, end=None):
         params = {'q': filename}
+        headers = self._headers
+        if start is not None:
+            headers = {**self._headers, 'Range': f'bytes={start}-{"" if end is None else end}'}
         try:
             async with await request_retry_transient_errors(
-                self._session, 'get', self.objects_url, params=params, headers=self._headers
+                self._session, 'get', self.objects_url, params=params, headers=headers
             ) as response:
                 return await response.read()
         except aiohttp.ClientResponseError as e:
@@ -47,11 +50,17 @@ class MemoryClient:
                 return None
             raise e
 
-    async def read_file(self, filename):
-        data = await self._get_file_if_exists(filename)
+    async def read_file(self, filename, start=None, end=None):
+        """Read `filename`, or only bytes `start` through `end` (inclusive) of
+        it if `start` is given.  An `end` of None reads to the end of the file."""
+        data = await self._get_file_if_exists(filename, start, end)
         if data is not None:
             return data
-        return await self._fs.read(filename)
+        if start is None:
+            return await self._fs.read(filename)
+        if end is None:
+            return await self._fs.read_from(filename, start)
+        return await self._fs.read_range(filename, start, end)
 
     async def write_file(self, filename, data):
         params = {'q': filename}
@@ -1,6 +1,8 @@
+from typing import Optional
 import aioredis
 import asyncio
 import base64
+import functools
 import logging
 import json
 import os
@@ -15,7 +17,7 @@ from hailtop.aiotools import AsyncFS
 from hailtop.config import get_deploy_config
 from hailtop.hail_logging import AccessLogger
 from hailtop.tls import internal_server_ssl_context
-from hailtop.utils import retry_transient_errors, dump_all_stacktraces
+from hailtop.utils import retry_transient_errors, dump_all_stacktraces, bounded_gather
 from hailtop import httpx
 from gear import setup_aiohttp_session, rest_authenticated_users_only, monitor_endpoints_middleware
 from gear.clients import get_cloud_async_fs_factory
@@ -30,6 +32,19 @@ socket = '/redis/redis.sock'
 
 ASYNC_FS_FACTORY = get_cloud_async_fs_factory()
 
+# Objects are stored in redis as fixed-size chunks so that ranged reads
+# only fetch the chunks they overlap.  Objects larger than one chunk are
+# read from cloud storage with parallel ranged reads on a cache miss.
+CHUNK_SIZE = 8 * 1024 * 1024
+LOAD_PARALLELISM = 8
+
+# By default, a write is acknowledged once it is in cloud storage.  With
+# write-back, it is acknowledged once it is cached and persisted in the
+# background, so a write that cannot be persisted is lost.
+WRITE_BACK = os.environ.get('HAIL_MEMORY_WRITE_BACK') is not None
+PERSIST_TIMEOUT_SECS = 120
+SHUTDOWN_PERSIST_TIMEOUT_SECS = 20
+
 
 @routes.get('/healthcheck')
 async def healthcheck(request):  # pylint: disable=unused-argument
@@ -40,13 +55,29 @@ async def healthcheck(request):  # pylint: disable=unused-argument
 @rest_authenticated_users_only
 async def get_object(request, userdata):
     filepath = request.query.get('q')
+    try:
+        http_range = request.http_range
+    except ValueError as e:
+        raise web.HTTPRequestRangeNotSatisfiable() from e
     userinfo = await get_or_add_user(request.app, userdata)
     username = userdata['username']
     log.info(f'memory: request for object {filepath} from user {username}')
-    maybe_file = await get_file_or_none(request.app, username, userinfo['fs'], filepath)
-    if maybe_file is None:
+
+    if http_range.start is None and http_range.stop is None:
+        maybe_file = await get_file_or_none(request.app, username, userinfo['fs'], filepath)
+        if maybe_file is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=maybe_file)
+
+    maybe_range = await get_file_range_or_none(request.app, username, userinfo['fs'], filepath, http_range)
+    if maybe_range is None:
         raise web.HTTPNotFound()
-    return web.Response(body=maybe_file)
+    start, data, size = maybe_range
+    if start is None:
+        raise web.HTTPRequestRangeNotSatisfiable(headers={'Content-Range': f'bytes */{size}'})
+    return web.Response(
+        status=206, body=data, headers={'Content-Range': f'bytes {start}-{start + len(data) - 1}/{size}'}
+    )
 
 
 @routes.post('/api/v1alpha/objects')
@@ -60,17 +91,17 @@ async def write_object(request, userdata):
 
     file_key = make_redis_key(username, filepath)
 
-    async def persist_and_cache():
-        try:
-            await persist(userinfo['fs'], file_key, filepath, data)
-            await cache_file(request.app['redis_pool'], file_key, filepath, data)
-            return data
-        finally:
-            del request.app['files_in_progress'][file_key]
-
-    fut = asyncio.ensure_future(persist_and_cache())
-    request.app['files_in_progress'][file_key] = fut
-    await fut
+    # do not let an in-flight load of the previous version overwrite this one
+    load = request.app['files_in_progress'].get(file_key)
+    if load is not None:
+        await asyncio.wait([load])
+
+    if WRITE_BACK:
+        await cache_file(request.app['redis_pool'], file_key, filepath, data)
+        persist_in_background(request.app, userinfo['fs'], file_key, filepath, data)
+    else:
+        await persist_with_retries(userinfo['fs'], file_key, filepath, data)
+        await cache_file(request.app['redis_pool'], file_key, filepath, data)
     return web.Response(status=200)
 
 
@@ -98,20 +129,69 @@ def make_redis_key(username, filepath):
     return f'{ username }_{ filepath }'
 
 
+def chunk_field(i: int) -> str:
+    return f'chunk_{i}'
+
+
+def resolve_range(http_range: slice, size: int):
+    start, stop = http_range.start, http_range.stop
+    if start is None:
+        start = 0
+    elif start < 0:
+        start = max(0, size + start)
+    if stop is None or stop > size:
+        stop = size
+    return (start, stop)
+
+
+async def get_cached_size_or_none(redis: aioredis.ConnectionsPool, file_key: str) -> Optional[int]:
+    (size,) = await redis.execute('HMGET', file_key, 'size')
+    if size is None:
+        return None
+    return int(size)
+
+
+async def get_cached_range_or_none(
+    redis: aioredis.ConnectionsPool, file_key: str, start: int, stop: int
+) -> Optional[bytes]:
+    if start >= stop:
+        return b''
+    first_chunk = start // CHUNK_SIZE
+    last_chunk = (stop - 1) // CHUNK_SIZE
+    chunks = await redis.execute('HMGET', file_key, *[chunk_field(i) for i in range(first_chunk, last_chunk + 1)])
+    if any(chunk is None for chunk in chunks):
+        return None
+    offset = first_chunk * CHUNK_SIZE
+    return b''.join(chunks)[start - offset : stop - offset]
+
+
+async def wait_for_pending_persist(app, file_key: str):
+    # the cloud copy is stale until a write-back of this file completes
+    persist_fut = app['persists_in_progress'].get(file_key)
+    if persist_fut is not None:
+        await asyncio.wait([persist_fut])
+        if not persist_fut.result():
+            raise web.HTTPServiceUnavailable(reason='the latest write of this file could not be persisted')
+
+
 async def get_file_or_none(app, username, fs: AsyncFS, filepath):
     file_key = make_redis_key(username, filepath)
     redis_pool: aioredis.ConnectionsPool = app['redis_pool']
 
-    (body,) = await redis_pool.execute('HMGET', file_key, 'body')
-    if body is not None:
-        log.info(f"memory: Retrieved file {filepath} for user {username}")
-        return body
+    size = await get_cached_size_or_none(redis_pool, file_key)
+    if size is not None:
+        body = await get_cached_range_or_none(redis_pool, file_key, 0, size)
+        if body is not None:
+            log.info(f"memory: Retrieved file {filepath} for user {username}")
+            return body
 
     log.info(f"memory: Couldn't retrieve file {filepath} for user {username}: current version not in cache")
 
     if file_key in app['files_in_progress']:
         return await app['files_in_progress'][file_key]
 
+    await wait_for_pending_persist(app, file_key)
+
     async def load_and_cache():
         try:
             data = await load_file(file_key, fs, filepath)
@@ -122,14 +202,68 @@ async def get_file_or_none(app, username, fs: AsyncFS, filepath):
         finally:
             del app['files_in_progress'][file_key]
 
+    if file_key in app['files_in_progress']:
+        return await app['files_in_progress'][file_key]
+
     fut = asyncio.ensure_future(load_and_cache())
     app['files_in_progress'][file_key] = fut
     return await fut
 
 
+async def get_file_range_or_none(app, username, fs: AsyncFS, filepath, http_range: slice):
+    file_key = make_redis_key(username, filepath)
+    redis_pool: aioredis.ConnectionsPool = app['redis_pool']
+
+    size = await get_cached_size_or_none(redis_pool, file_key)
+    if size is not None:
+        start, stop = resolve_range(http_range, size)
+        if start >= size:
+            return (None, None, size)
+        data = await get_cached_range_or_none(redis_pool, file_key, start, stop)
+        if data is not None:
+            log.info(f"memory: Retrieved bytes {start}-{stop} of file {filepath} for user {username}")
+            return (start, data, size)
+
+    log.info(f"memory: Couldn't retrieve file {filepath} for user {username}: current version not in cache")
+
+    await wait_for_pending_persist(app, file_key)
+
+    # Serve just the requested bytes from cloud storage and cache the
+    # whole object in the background for subsequent reads.
+    try:
+        size = await (await fs.statfile(filepath)).size()
+    except FileNotFoundError:
+        return None
+    if file_key not in app['files_in_progress']:
+        background_loads = app['background_loads']
+        load = asyncio.ensure_future(get_file_or_none(app, username, fs, filepath))
+        background_loads.add(load)
+        load.add_done_callback(background_loads.discard)
+
+    start, stop = resolve_range(http_range, size)
+    if start >= size:
+        return (None, None, size)
+    try:
+        data = await fs.read_range(filepath, start, stop - 1)
+    except FileNotFoundError:
+        return None
+    return (start, data, size)
+
+
 async def load_file(file_key, fs: AsyncFS, filepath):
     log.info(f"memory: {file_key}: reading.")
-    data = await fs.read(filepath)
+    size = await (await fs.statfile(filepath)).size()
+    if size <= CHUNK_SIZE:
+        data = await fs.read(filepath)
+    else:
+        chunks = await bounded_gather(
+            *[
+                functools.partial(fs.read_range, filepath, start, min(start + CHUNK_SIZE, size) - 1)
+                for start in range(0, size, CHUNK_SIZE)
+            ],
+            parallelism=LOAD_PARALLELISM,
+        )
+        data = b''.join(chunks)
     log.info(f"memory: {file_key}: read {filepath}")
     return data
 
@@ -140,14 +274,60 @@ async def persist(fs: AsyncFS, file_key: str, filepath: str, data: bytes):
     log.info(f"memory: {file_key}: persisted {filepath}")
 
 
+async def persist_with_retries(fs: AsyncFS, file_key: str, filepath: str, data: bytes):
+    await asyncio.wait_for(retry_transient_errors(persist, fs, file_key, filepath, data), PERSIST_TIMEOUT_SECS)
+
+
+def persist_in_background(app, fs: AsyncFS, file_key: str, filepath: str, data: bytes):
+    persists_in_progress = app['persists_in_progress']
+    previous = persists_in_progress.get(file_key)
+
+    async def persist_after_previous() -> bool:
+        try:
+            # persist writes to the same file in the order they were received
+            if previous is not None:
+                await asyncio.wait([previous])
+            await persist_with_retries(fs, file_key, filepath, data)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception(f'memory: {file_key}: giving up on persisting {filepath}')
+            if persists_in_progress.get(file_key) is fut:
+                # do not serve a version of the file that was never persisted
+                await app['redis_pool'].execute('DEL', file_key)
+            return False
+        finally:
+            if persists_in_progress.get(file_key) is fut:
+                del persists_in_progress[file_key]
+
+    fut = asyncio.ensure_future(persist_after_previous())
+    persists_in_progress[file_key] = fut
+
+
 async def cache_file(redis: aioredis.ConnectionsPool, file_key: str, filepath: str, data: bytes):
-    await redis.execute('HMSET', file_key, 'body', data)
+    fields = ['size', len(data)]
+    for i, start in enumerate(range(0, len(data), CHUNK_SIZE)):
+        fields.extend([chunk_field(i), data[start : start + CHUNK_SIZE]])
+    async with redis.get() as conn:
+        # drop the chunks of any previous, longer version and store this one
+        # atomically, so readers never see the key missing or half-written;
+        # the commands are sent together, so the transaction cannot be left
+        # open on the connection
+        await asyncio.gather(
+            conn.execute('MULTI'),
+            conn.execute('DEL', file_key),
+            conn.execute('HMSET', file_key, *fields),
+            conn.execute('EXEC'),
+        )
     log.info(f"memory: {file_key}: stored {filepath}")
 
 
 async def on_startup(app):
     app['client_session'] = httpx.client_session()
     app['files_in_progress'] = dict()
+    app['persists_in_progress'] = dict()
+    app['background_loads'] = set()
     app['users'] = {}
     app['userlocks'] = defaultdict(asyncio.Lock)
     kube.config.load_incluster_config()
@@ -158,22 +338,33 @@ async def on_startup(app):
 
 async def on_cleanup(app):
     try:
-        app['redis_pool'].close()
+        # acknowledged writes should reach cloud storage before the file systems are closed
+        persists = list(app['persists_in_progress'].values())
+        if persists:
+            log.info(f'memory: waiting for {len(persists)} writes to persist')
+            _, pending = await asyncio.wait(persists, timeout=SHUTDOWN_PERSIST_TIMEOUT_SECS)
+            if pending:
+                log.error(f'memory: shutting down before {len(pending)} writes persisted')
+                for persist_fut in pending:
+                    persist_fut.cancel()
     finally:
         try:
-            del app['k8s_client']
+            app['redis_pool'].close()
         finally:
             try:
-                await app['client_session'].close()
+                del app['k8s_client']
             finally:
                 try:
-                    for items in app['users'].values():
-                        try:
-                            await items['fs'].close()
-                        except:
-                            pass
+                    await app['client_session'].close()
                 finally:
-                    await asyncio.gather(*(t for t in asyncio.all_tasks() if t is not asyncio.current_task()))
+                    try:
+                        for items in app['users'].values():
+                            try:
+                                await items['fs'].close()
+                            except:
+                                pass
+                    finally:
+                        await asyncio.gather(*(t for t in asyncio.all_tasks() if t is not asyncio.current_task()))
 
 
 def run():
@@ -20,8 +20,8 @@ class BlockingMemoryClient:
     def _get_file_if_exists(self, filename):
         return async_to_blocking(self._client._get_file_if_exists(filename))
 
-    def read_file(self, filename):
-        return async_to_blocking(self._client.read_file(filename))
+    def read_file(self, filename, start=None, end=None):
+        return async_to_blocking(self._client.read_file(filename, start, end))
 
     def write_file(self, filename, data):
         return async_to_blocking(self._client.write_file(filename, data))
@@ -79,3 +79,18 @@ class Tests(unittest.TestCase):
             self.client.write_file(filename, data)
             cached = self.client._get_file_if_exists(filename)
             self.assertEqual(cached, data)
+
+    def test_ranged_read(self):
+        data = bytes(range(256)) * 16
+        filename = f'{self.test_path}/ranged'
+        self.client.write_file(filename, data)
+        cases = [(0, 0), (0, 9), (10, 4095), (4000, None), (100, 100000)]
+        for start, end in cases:
+            expected = data[start:] if end is None else data[start : end + 1]
+            self.assertEqual(self.client.read_file(filename, start, end), expected)
+
+    def test_ranged_read_uncached(self):
+        data = b'hello world'
+        handle = async_to_blocking(self.add_temp_file_from_string('ranged_uncached', data))
+        self.assertEqual(self.client.read_file(handle, 6, 10), b'world')
+        self.assertEqual(self.client.read_file(handle, 6), b'world')
@@ -2,7 +2,6 @@ from typing import Dict
 import traceback
 import os
 import base64
-import concurrent
 import logging
 import uvloop
 import asyncio
@@ -11,7 +10,7 @@ from aiohttp import web
 import kubernetes_asyncio as kube
 from prometheus_async.aio.web import server_stats  # type: ignore
 from collections import defaultdict
-from hailtop.utils import blocking_to_async, retry_transient_errors, dump_all_stacktraces
+from hailtop.utils import retry_transient_errors, dump_all_stacktraces
 from hailtop.config import get_deploy_config
 from hailtop.tls import internal_server_ssl_context
 from hailtop.hail_logging import AccessLogger
@@ -23,11 +22,13 @@ from gear import (
     monitor_endpoints_middleware,
 )
 
-from .sockets import connect_to_java
+from .sockets import ServiceBackendSocketConnectionPool
 
 uvloop.install()
 
 DEFAULT_NAMESPACE = os.environ['HAIL_DEFAULT_NAMESPACE']
+JAVA_CONNECTIONS = 4
+JAVA_MAX_IN_FLIGHT_REQUESTS = int(os.environ.get('HAIL_QUERY_N_REQUEST_THREADS', 16))
 log = logging.getLogger(__name__)
 routes = web.RouteTableDef()
 
@@ -49,8 +50,8 @@ async def add_user(app, userdata):
     if username in users:
         return
     gsa_key = base64.b64decode(gsa_key_secret.data['key.json']).decode()
-    with connect_to_java() as java:
-        java.add_user(username, gsa_key)
+    java = await app['java'].connection()
+    await java.add_user(username, gsa_key)
     users.add(username)
 
 
@@ -59,49 +60,49 @@ async def healthcheck(request):  # pylint: disable=unused-argument
     return web.Response()
 
 
-def blocking_execute(userdata, body):
-    with connect_to_java() as java:
-        log.info(f'executing {body["token"]}')
-        return java.execute(
-            userdata['username'],
-            userdata['session_id'],
-            body['billing_project'],
-            body['bucket'],
-            body['code'],
-            body['token'],
-        )
+async def execute_query(app, userdata, body):
+    java = await app['java'].connection()
+    log.info(f'executing {body["token"]}')
+    return await java.execute(
+        userdata['username'],
+        userdata['session_id'],
+        body['billing_project'],
+        body['bucket'],
+        body['code'],
+        body['token'],
+    )
 
 
-def blocking_load_references_from_dataset(userdata, body):
-    with connect_to_java() as java:
-        return java.load_references_from_dataset(
-            userdata['username'], body['billing_project'], body['bucket'], body['path']
-        )
+async def load_references_from_dataset_query(app, userdata, body):
+    java = await app['java'].connection()
+    return await java.load_references_from_dataset(
+        userdata['username'], body['billing_project'], body['bucket'], body['path']
+    )
 
 
-def blocking_value_type(userdata, body):
-    with connect_to_java() as java:
-        return java.value_type(userdata['username'], body['code'])
+async def value_type_query(app, userdata, body):
+    java = await app['java'].connection()
+    return await java.value_type(userdata['username'], body['code'])
 
 
-def blocking_table_type(userdata, body):
-    with connect_to_java() as java:
-        return java.table_type(userdata['username'], body['code'])
+async def table_type_query(app, userdata, body):
+    java = await app['java'].connection()
+    return await java.table_type(userdata['username'], body['code'])
 
 
-def blocking_matrix_type(userdata, body):
-    with connect_to_java() as java:
-        return java.matrix_table_type(userdata['username'], body['code'])
+async def matrix_type_query(app, userdata, body):
+    java = await app['java'].connection()
+    return await java.matrix_table_type(userdata['username'], body['code'])
 
 
-def blocking_blockmatrix_type(userdata, body):
-    with connect_to_java() as java:
-        return java.block_matrix_type(userdata['username'], body['code'])
+async def blockmatrix_type_query(app, userdata, body):
+    java = await app['java'].connection()
+    return await java.block_matrix_type(userdata['username'], body['code'])
 
 
-def blocking_get_reference(userdata, body):  # pylint: disable=unused-argument
-    with connect_to_java() as java:
-        return java.reference_genome(userdata['username'], body['name'])
+async def get_reference_query(app, userdata, body):
+    java = await app['java'].connection()
+    return await java.reference_genome(userdata['username'], body['name'])
 
 
 async def handle_ws_response(request, userdata, endpoint, f):
@@ -115,7 +116,7 @@ async def handle_ws_response(request, userdata, endpoint, f):
     query = user_queries.get(body['token'])
     if query is None:
         await add_user(app, userdata)
-        query = asyncio.ensure_future(retry_transient_errors(blocking_to_async, app['thread_pool'], f, userdata, body))
+        query = asyncio.ensure_future(retry_transient_errors(f, app, userdata, body))
         user_queries[body['token']] = query
 
     try:
@@ -147,53 +148,53 @@ async def handle_ws_response(request, userdata, endpoint, f):
 @routes.get('/api/v1alpha/execute')
 @rest_authenticated_users_only
 async def execute(request, userdata):
-    return await handle_ws_response(request, userdata, 'execute', blocking_execute)
+    return await handle_ws_response(request, userdata, 'execute', execute_query)
 
 
 @routes.get('/api/v1alpha/load_references_from_dataset')
 @rest_authenticated_users_only
 async def load_references_from_dataset(request, userdata):
     return await handle_ws_response(
-        request, userdata, 'load_references_from_dataset', blocking_load_references_from_dataset
+        request, userdata, 'load_references_from_dataset', load_references_from_dataset_query
     )
 
 
 @routes.get('/api/v1alpha/type/value')
 @rest_authenticated_users_only
 async def value_type(request, userdata):
-    return await handle_ws_response(request, userdata, 'type/value', blocking_value_type)
+    return await handle_ws_response(request, userdata, 'type/value', value_type_query)
 
 
 @routes.get('/api/v1alpha/type/table')
 @rest_authenticated_users_only
 async def table_type(request, userdata):
-    return await handle_ws_response(request, userdata, 'type/table', blocking_table_type)
+    return await handle_ws_response(request, userdata, 'type/table', table_type_query)
 
 
 @routes.get('/api/v1alpha/type/matrix')
 @rest_authenticated_users_only
 async def matrix_type(request, userdata):
-    return await handle_ws_response(request, userdata, 'type/matrix', blocking_matrix_type)
+    return await handle_ws_response(request, userdata, 'type/matrix', matrix_type_query)
 
 
 @routes.get('/api/v1alpha/type/blockmatrix')
 @rest_authenticated_users_only
 async def blockmatrix_type(request, userdata):
-    return await handle_ws_response(request, userdata, 'type/blockmatrix', blocking_blockmatrix_type)
+    return await handle_ws_response(request, userdata, 'type/blockmatrix', blockmatrix_type_query)
 
 
 @routes.get('/api/v1alpha/references/get')
 @rest_authenticated_users_only
 async def get_reference(request, userdata):  # pylint: disable=unused-argument
-    return await handle_ws_response(request, userdata, 'references/get', blocking_get_reference)
+    return await handle_ws_response(request, userdata, 'references/get', get_reference_query)
 
 
 @routes.get('/api/v1alpha/flags/get')
 @rest_authenticated_developers_only
 async def get_flags(request, userdata):  # pylint: disable=unused-argument
     app = request.app
-    with connect_to_java() as java:
-        jresp = await blocking_to_async(app['thread_pool'], java.flags)
+    java = await app['java'].connection()
+    jresp = await java.flags()
     return web.json_response(jresp)
 
 
@@ -202,8 +203,8 @@ async def get_flags(request, userdata):  # pylint: disable=unused-argument
 async def get_flag(request, userdata):  # pylint: disable=unused-argument
     app = request.app
     f = request.match_info['flag']
-    with connect_to_java() as java:
-        jresp = await blocking_to_async(app['thread_pool'], java.get_flag, f)
+    java = await app['java'].connection()
+    jresp = await java.get_flag(f)
     return web.json_response(jresp)
 
 
@@ -213,11 +214,11 @@ async def set_flag(request, userdata):  # pylint: disable=unused-argument
     app = request.app
     f = request.match_info['flag']
     v = request.query.get('value')
-    with connect_to_java() as java:
-        if v is None:
-            jresp = await blocking_to_async(app['thread_pool'], java.unset_flag, f)
-        else:
-            jresp = await blocking_to_async(app['thread_pool'], java.set_flag, f, v)
+    java = await app['java'].connection()
+    if v is None:
+        jresp = await java.unset_flag(f)
+    else:
+        jresp = await java.set_flag(f, v)
     return web.json_response(jresp)
 
 
@@ -227,9 +228,10 @@ async def rest_get_version(request):  # pylint: disable=W0613
 
 
 async def on_startup(app):
-    thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=16)
     app['client_session'] = httpx.client_session()
-    app['thread_pool'] = thread_pool
+    app['java'] = ServiceBackendSocketConnectionPool(
+        n_connections=JAVA_CONNECTIONS, max_in_flight=JAVA_MAX_IN_FLIGHT_REQUESTS
+    )
     app['user_keys'] = dict()
     app['users'] = set()
     app['queries'] = defaultdict(dict)
@@ -241,6 +243,7 @@ async def on_startup(app):
 
 async def on_cleanup(app):
     try:
+        await app['java'].close()
         if 'k8s_client' in app:
             k8s_client: kube.client.CoreV1Api = app['k8s_client']
             await k8s_client.api_client.rest_client.pool_manager.close()
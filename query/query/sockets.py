@@ -1,22 +1,27 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import json
-import socket
 import struct
 import logging
-from hailtop.utils import sync_retry_transient_errors, TransientError
+from hailtop.utils import retry_transient_errors, TransientError
 
 
 log = logging.getLogger('query.sockets')
 
 
-def connect_to_java() -> 'ServiceBackendSocketConnection':
-    return ServiceBackendSocketConnection()
-
-
 class EndOfStream(TransientError):
     pass
 
 
 class ServiceBackendSocketConnection:
+    """A long-lived, multiplexed connection to the JVM.
+
+    After the initial ``MULTIPLEX`` handshake, every request is prefixed with a
+    request id and every response with the id of the request it answers, so
+    many requests may be in flight on one connection at once.  The JVM runs
+    them concurrently and answers in completion order.
+    """
+
     LOAD_REFERENCES_FROM_DATASET = 1
     VALUE_TYPE = 2
     TABLE_TYPE = 3
@@ -29,235 +34,211 @@ class ServiceBackendSocketConnection:
     UNSET_FLAG = 10
     SET_FLAG = 11
     ADD_USER = 12
+    MULTIPLEX = 253
     GOODBYE = 254
 
     FNAME = '/sock/sock'
 
-    def __init__(self):
-        pass
-
-    def __enter__(self) -> 'ServiceBackendSocketConnection':
-        self._conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # pylint: disable=attribute-defined-outside-init
-        sync_retry_transient_errors(self._conn.connect, ServiceBackendSocketConnection.FNAME)
-        return self
-
-    def __exit__(self, type, value, traceback):
-        self.write_int(ServiceBackendSocketConnection.GOODBYE)
-        response = self.read_int()
-        assert response == ServiceBackendSocketConnection.GOODBYE, response
-        self._conn.close()
-
-    def write_int(self, v: int):
-        self._conn.sendall(struct.pack('<i', v))
-
-    def write_long(self, v: int):
-        self._conn.sendall(struct.pack('<q', v))
-
-    def write_bytes(self, b: bytes):
-        n = len(b)
-        self.write_int(n)
-        self._conn.sendall(b)
-
-    def write_str(self, s: str):
-        self.write_bytes(s.encode('utf-8'))
-
-    def read(self, n) -> bytes:
-        b = bytearray()
-        left = n
-        while left > 0:
-            t = self._conn.recv(left)
-            if not t:
-                log.warning('unexpected EOS, Java violated protocol, this will be retried')
-                raise EndOfStream()
-            left -= len(t)
-            b.extend(t)
-        return b
-
-    def read_byte(self) -> int:
-        b = self.read(1)
-        return b[0]
-
-    def read_bool(self) -> bool:
-        return self.read_byte() != 0
-
-    def read_int(self) -> int:
-        b = self.read(4)
-        return struct.unpack('<i', b)[0]
-
-    def read_long(self) -> int:
-        b = self.read(8)
-        return struct.unpack('<q', b)[0]
-
-    def read_bytes(self) -> bytes:
-        n = self.read_int()
-        return self.read(n)
-
-    def read_str(self) -> str:
-        b = self.read_bytes()
-        return b.decode('utf-8')
-
-    def load_references_from_dataset(self, username: str, billing_project: str, bucket: str, path: str):
-        self.write_int(ServiceBackendSocketConnection.LOAD_REFERENCES_FROM_DATASET)
-        self.write_str(username)
-        self.write_str(billing_project)
-        self.write_str(bucket)
-        self.write_str(path)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def value_type(self, username: str, s: str):
-        self.write_int(ServiceBackendSocketConnection.VALUE_TYPE)
-        self.write_str(username)
-        self.write_str(s)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def table_type(self, username: str, s: str):
-        self.write_int(ServiceBackendSocketConnection.TABLE_TYPE)
-        self.write_str(username)
-        self.write_str(s)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def matrix_table_type(self, username: str, s: str):
-        self.write_int(ServiceBackendSocketConnection.MATRIX_TABLE_TYPE)
-        self.write_str(username)
-        self.write_str(s)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def block_matrix_type(self, username: str, s: str):
-        self.write_int(ServiceBackendSocketConnection.BLOCK_MATRIX_TYPE)
-        self.write_str(username)
-        self.write_str(s)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def reference_genome(self, username: str, name: str):
-        self.write_int(ServiceBackendSocketConnection.REFERENCE_GENOME)
-        self.write_str(username)
-        self.write_str(name)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def execute(self, username: str, session_id: str, billing_project: str, bucket: str, code: str, token: str):
-        self.write_int(ServiceBackendSocketConnection.EXECUTE)
-        self.write_str(username)
-        self.write_str(session_id)
-        self.write_str(billing_project)
-        self.write_str(bucket)
-        self.write_str(code)
-        self.write_str(token)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def flags(self):
-        self.write_int(ServiceBackendSocketConnection.FLAGS)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def get_flag(self, name: str):
-        self.write_int(ServiceBackendSocketConnection.GET_FLAG)
-        self.write_str(name)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def unset_flag(self, name: str):
-        self.write_int(ServiceBackendSocketConnection.UNSET_FLAG)
-        self.write_str(name)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def set_flag(self, name: str, value: str):
-        self.write_int(ServiceBackendSocketConnection.SET_FLAG)
-        self.write_str(name)
-        self.write_str(value)
-        success = self.read_bool()
-        if success:
-            s = self.read_str()
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError as err:
-                raise ValueError(f'could not decode {s}') from err
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
-
-    def add_user(self, name: str, gsa_key: str):
-        self.write_int(ServiceBackendSocketConnection.ADD_USER)
-        self.write_str(name)
-        self.write_str(gsa_key)
-        success = self.read_bool()
-        if success:
-            return
-        jstacktrace = self.read_str()
-        raise ValueError(jstacktrace)
+    @staticmethod
+    async def connect(in_flight: Optional[asyncio.Semaphore] = None) -> 'ServiceBackendSocketConnection':
+        reader, writer = await retry_transient_errors(
+            asyncio.open_unix_connection, ServiceBackendSocketConnection.FNAME
+        )
+        writer.write(struct.pack('<i', ServiceBackendSocketConnection.MULTIPLEX))
+        return ServiceBackendSocketConnection(reader, writer, in_flight)
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        in_flight: Optional[asyncio.Semaphore] = None,
+    ):
+        self._reader = reader
+        self._writer = writer
+        # bounds the requests in flight, possibly shared with other connections
+        self._in_flight = in_flight
+        self._next_request_id = 0
+        # request id -> (response future, whether a successful response carries a payload)
+        self._pending: Dict[int, Tuple[asyncio.Future, bool]] = {}
+        self._closed = False
+        self._receive_task = asyncio.ensure_future(self._receive_loop())
+
+    @property
+    def n_pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def _read(self, n: int) -> bytes:
+        try:
+            return await self._reader.readexactly(n)
+        except asyncio.IncompleteReadError as err:
+            log.warning('unexpected EOS, Java violated protocol, this will be retried')
+            raise EndOfStream() from err
+
+    async def _read_int(self) -> int:
+        return struct.unpack('<i', await self._read(4))[0]
+
+    async def _read_bool(self) -> bool:
+        return (await self._read(1))[0] != 0
+
+    async def _read_str(self) -> str:
+        n = await self._read_int()
+        return (await self._read(n)).decode('utf-8')
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                request_id = await self._read_int()
+                f, has_payload = self._pending.pop(request_id)
+                if has_payload is None:
+                    response = await self._read_int()
+                    assert response == ServiceBackendSocketConnection.GOODBYE, response
+                    f.set_result(None)
+                    return
+                success = await self._read_bool()
+                if success:
+                    result = (await self._read_str()) if has_payload else None
+                    if not f.done():
+                        f.set_result(result)
+                else:
+                    jstacktrace = await self._read_str()
+                    if not f.done():
+                        f.set_exception(ValueError(jstacktrace))
+        except Exception as exc:  # pylint: disable=broad-except
+            self._fail_pending(exc)
+        finally:
+            self._closed = True
+            self._writer.close()
+
+    def _fail_pending(self, exc: BaseException):
+        self._closed = True
+        if not isinstance(exc, TransientError):
+            err = EndOfStream()
+            err.__cause__ = exc
+            exc = err
+        pending = self._pending
+        self._pending = {}
+        for f, _ in pending.values():
+            if not f.done():
+                f.set_exception(exc)
+
+    async def _request(self, cmd: int, *args: str, has_payload: Optional[bool] = True) -> Optional[str]:
+        if self._in_flight is None or has_payload is None:
+            return await self._send_request(cmd, *args, has_payload=has_payload)
+        async with self._in_flight:
+            return await self._send_request(cmd, *args, has_payload=has_payload)
+
+    async def _send_request(self, cmd: int, *args: str, has_payload: Optional[bool]) -> Optional[str]:
+        if self._closed:
+            raise EndOfStream()
+        request_id = self._next_request_id
+        self._next_request_id += 1
+
+        parts: List[bytes] = [struct.pack('<ii', request_id, cmd)]
+        for arg in args:
+            b = arg.encode('utf-8')
+            parts.append(struct.pack('<i', len(b)))
+            parts.append(b)
+
+        f = asyncio.get_event_loop().create_future()
+        self._pending[request_id] = (f, has_payload)
+        # a single write per request keeps concurrent requests from interleaving
+        self._writer.write(b''.join(parts))
+        try:
+            await self._writer.drain()
+        except (ConnectionError, OSError) as err:
+            self._fail_pending(err)
+        return await f
+
+    async def _json_request(self, cmd: int, *args: str):
+        s = await self._request(cmd, *args)
+        assert s is not None
+        try:
+            return json.loads(s)
+        except json.decoder.JSONDecodeError as err:
+            raise ValueError(f'could not decode {s}') from err
+
+    async def close(self):
+        try:
+            if not self._closed:
+                await self._request(ServiceBackendSocketConnection.GOODBYE, has_payload=None)
+        except Exception:  # pylint: disable=broad-except
+            log.exception('while saying goodbye to java, ignoring')
+        finally:
+            self._closed = True
+            self._receive_task.cancel()
+            self._writer.close()
+
+    async def load_references_from_dataset(self, username: str, billing_project: str, bucket: str, path: str):
+        return await self._json_request(
+            ServiceBackendSocketConnection.LOAD_REFERENCES_FROM_DATASET, username, billing_project, bucket, path
+        )
+
+    async def value_type(self, username: str, s: str):
+        return await self._json_request(ServiceBackendSocketConnection.VALUE_TYPE, username, s)
+
+    async def table_type(self, username: str, s: str):
+        return await self._json_request(ServiceBackendSocketConnection.TABLE_TYPE, username, s)
+
+    async def matrix_table_type(self, username: str, s: str):
+        return await self._json_request(ServiceBackendSocketConnection.MATRIX_TABLE_TYPE, username, s)
+
+    async def block_matrix_type(self, username: str, s: str):
+        return await self._json_request(ServiceBackendSocketConnection.BLOCK_MATRIX_TYPE, username, s)
+
+    async def reference_genome(self, username: str, name: str):
+        return await self._json_request(ServiceBackendSocketConnection.REFERENCE_GENOME, username, name)
+
+    async def execute(self, username: str, session_id: str, billing_project: str, bucket: str, code: str, token: str):
+        return await self._json_request(
+            ServiceBackendSocketConnection.EXECUTE, username, session_id, billing_project, bucket, code, token
+        )
+
+    async def flags(self):
+        return await self._json_request(ServiceBackendSocketConnection.FLAGS)
+
+    async def get_flag(self, name: str):
+        return await self._json_request(ServiceBackendSocketConnection.GET_FLAG, name)
+
+    async def unset_flag(self, name: str):
+        return await self._json_request(ServiceBackendSocketConnection.UNSET_FLAG, name)
+
+    async def set_flag(self, name: str, value: str):
+        return await self._json_request(ServiceBackendSocketConnection.SET_FLAG, name, value)
+
+    async def add_user(self, name: str, gsa_key: str):
+        await self._request(ServiceBackendSocketConnection.ADD_USER, name, gsa_key, has_payload=False)
+
+
+class ServiceBackendSocketConnectionPool:
+    """A small, fixed number of multiplexed connections shared by all requests.
+
+    Requests go to the connection with the fewest requests in flight.  At
+    most ``max_in_flight`` requests are in flight across all connections;
+    further requests wait for one to finish.  Broken connections are dropped
+    and replaced on next use; the requests that were in flight on them fail
+    with :class:`EndOfStream` and are retried by the caller.
+    """
+
+    def __init__(self, n_connections: int = 4, max_in_flight: int = 16):
+        self._n_connections = n_connections
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._connections: List[ServiceBackendSocketConnection] = []
+        self._connect_lock = asyncio.Lock()
+
+    async def connection(self) -> ServiceBackendSocketConnection:
+        self._connections = [conn for conn in self._connections if not conn.closed]
+        if len(self._connections) < self._n_connections:
+            async with self._connect_lock:
+                self._connections = [conn for conn in self._connections if not conn.closed]
+                if len(self._connections) < self._n_connections:
+                    self._connections.append(await ServiceBackendSocketConnection.connect(self._in_flight))
+        return min(self._connections, key=lambda conn: conn.n_pending)
+
+    async def close(self):
+        connections = self._connections
+        self._connections = []
+        await asyncio.gather(*[conn.close() for conn in connections], return_exceptions=True)